@@ -0,0 +1,228 @@
+"""
+Persistent cache of Gemini analyses.
+
+The analysis prompt is built only from the profile fields, the ten question
+answers and the ML predictions, and those come from small closed sets, so many
+users produce the same prompt. Analyses are stored in a local SQLite file
+under a hash of the normalized inputs and the model name, and survive
+restarts. Entries expire after a TTL; the least recently used entries are
+evicted once the entry or size limit is exceeded.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Profile fields that reach the analysis prompt
+ANALYSIS_PROFILE_FIELDS = (
+    'age', 'gender', 'height', 'weight', 'concerns', 'ethnicity',
+    'question1', 'question2', 'question3', 'question4', 'question5',
+    'question6', 'question7', 'question8', 'question9', 'question10'
+)
+
+
+def _normalize(value):
+    """Canonical form of one input: trimmed strings, stable float precision."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float):
+        # Probabilities differing past 4 decimals give the same analysis
+        value = round(value, 4)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    return value
+
+
+def make_analysis_cache_key(user_assessment, diagnosis_data, model_name, prompt_version=1):
+    """
+    Build the cache key for one analysis.
+
+    Args:
+        user_assessment (dict): Profile fields and question answers
+        diagnosis_data (dict): ML predictions passed to the prompt
+        model_name (str): LLM model generating the analysis
+        prompt_version (int): Bump when the prompt template changes
+
+    Returns:
+        str: Hex digest identifying the prompt inputs
+    """
+    profile = {}
+    for field in ANALYSIS_PROFILE_FIELDS:
+        value = _normalize(user_assessment.get(field, ''))
+        # Form values arrive as strings or numbers, '40' and 40 are one answer
+        profile[field] = str(value) if value is not None else ''
+
+    payload = json.dumps(
+        {'profile': profile, 'predictions': _normalize(diagnosis_data),
+         'model': model_name, 'prompt_version': prompt_version},
+        sort_keys=True, default=str, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed analysis cache with TTL, LRU and size limits."""
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=10000, max_bytes=100 * 1024 * 1024,
+                 clock=time.time):
+        """
+        Args:
+            path (str): SQLite file, empty to disable the cache
+            ttl_seconds (float): Seconds an analysis stays valid, 0 for no expiry
+            max_entries (int): Maximum stored analyses
+            max_bytes (int): Maximum total size of the stored analyses
+            clock (callable): Returns the current time in seconds; stored
+                timestamps outlive the process, so it must be wall-clock time
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connection(self):
+        # One connection per process, forked workers must not share the master's
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS analyses ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed_at)')
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """Return the cached analysis dict, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        now = self._clock()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute('SELECT value, created_at FROM analyses WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                value, created_at = row
+                if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                    conn.execute('DELETE FROM analyses WHERE key = ?', (key,))
+                    conn.commit()
+                    self.expired += 1
+                    self.misses += 1
+                    return None
+
+                conn.execute('UPDATE analyses SET accessed_at = ? WHERE key = ?', (now, key))
+                conn.commit()
+                self.hits += 1
+                return json.loads(value)
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Analysis cache read failed: {e}")
+                self.errors += 1
+                return None
+
+    def put(self, key, value):
+        """Store an analysis and evict expired and least recently used entries."""
+        if not self.enabled:
+            return
+
+        now = self._clock()
+        data = json.dumps(value, default=str)
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO analyses (key, value, size, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, data, len(data), now, now)
+                )
+                self._evict_locked(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Analysis cache write failed: {e}")
+                self.errors += 1
+
+    def _evict_locked(self, conn, now):
+        if self.ttl_seconds:
+            cursor = conn.execute('DELETE FROM analyses WHERE created_at < ?', (now - self.ttl_seconds,))
+            self.expired += max(cursor.rowcount, 0)
+
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Oldest accessed first until both limits hold
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM analyses ORDER BY accessed_at'):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany('DELETE FROM analyses WHERE key = ?', doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        """Drop every cached analysis."""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM analyses')
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'path': self.path,
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+            if self.enabled:
+                try:
+                    count, total = self._connection().execute(
+                        'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses'
+                    ).fetchone()
+                    stats.update(entries=count, bytes=total)
+                except sqlite3.Error:
+                    pass
+            return stats
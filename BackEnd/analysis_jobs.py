@@ -0,0 +1,186 @@
+"""
+Background jobs for LLM analyses.
+
+/diagnose returns the ML predictions right away and hands the Gemini analysis
+to a bounded thread pool; clients poll GET /analysis/<job_id> for the result.
+Job status and results are written to a SQLite file, so under several
+gunicorn workers any worker can answer a poll, not only the one running the
+job. Finished jobs are kept for a limited time and then forgotten.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_JOB_FIELDS = ('job_id', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+
+class AnalysisJobQueue:
+    """Runs analysis callables on a bounded worker pool and tracks their results in SQLite."""
+
+    def __init__(self, path, max_workers=4, max_pending=100, result_ttl=600, orphan_ttl=3600):
+        """
+        Args:
+            path (str): SQLite file shared by the workers, empty to keep jobs
+                in this process only
+            max_workers (int): Concurrent analyses in this process
+            max_pending (int): Queued plus running jobs in this process before
+                submissions are refused
+            result_ttl (float): Seconds a finished job stays retrievable
+            orphan_ttl (float): Seconds after being queued that a job which
+                never finished, e.g. because its worker died, is forgotten;
+                keep it well above the longest analysis so running jobs stay
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.orphan_ttl = orphan_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._pending = 0
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors = 0
+
+    def _connection(self):
+        # One connection per process, forked workers must not share the master's
+        if self._conn is None or self._pid != os.getpid():
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path or ':memory:', timeout=5.0, check_same_thread=False)
+            if self.path:
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS analysis_jobs ('
+                ' job_id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' started_at REAL,'
+                ' finished_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS analysis_jobs_created ON analysis_jobs (created_at)')
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _expire_locked(self, conn, now):
+        conn.execute(
+            'DELETE FROM analysis_jobs WHERE finished_at < ? OR (finished_at IS NULL AND created_at < ?)',
+            (now - self.result_ttl, now - self.orphan_ttl)
+        )
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(f'UPDATE analysis_jobs SET {columns} WHERE job_id = ?', (*fields.values(), job_id))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Analysis job {job_id} could not be updated: {e}")
+                self.errors += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)``.
+
+        Returns:
+            str: Job id, or None when the queue is full
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            try:
+                conn = self._connection()
+                self._expire_locked(conn, now)
+                conn.execute(
+                    'INSERT INTO analysis_jobs (job_id, status, created_at) VALUES (?, ?, ?)',
+                    (job_id, QUEUED, now)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Analysis job could not be queued: {e}")
+                self.errors += 1
+                self.rejected += 1
+                return None
+            self._pending += 1
+            self.submitted += 1
+
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Analysis job {job_id} failed: {e}")
+            with self._lock:
+                self.failed += 1
+                self._pending -= 1
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        else:
+            with self._lock:
+                self.completed += 1
+                self._pending -= 1
+            # Last, so a poll that sees the job finished also sees the counters
+            self._update(job_id, status=DONE, result=json.dumps(result, default=str), finished_at=time.time())
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if it is unknown or expired."""
+        with self._lock:
+            try:
+                conn = self._connection()
+                self._expire_locked(conn, time.time())
+                conn.commit()
+                row = conn.execute(
+                    f'SELECT {", ".join(_JOB_FIELDS)} FROM analysis_jobs WHERE job_id = ?', (job_id,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Analysis job {job_id} could not be read: {e}")
+                self.errors += 1
+                return None
+
+        if row is None:
+            return None
+        job = dict(zip(_JOB_FIELDS, row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'path': self.path,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+                'errors': self.errors
+            }
+            try:
+                stats['tracked_jobs'] = self._connection().execute('SELECT COUNT(*) FROM analysis_jobs').fetchone()[0]
+            except sqlite3.Error:
+                pass
+            return stats
@@ -1,95 +1,175 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import sys
 import os
-import google.generativeai as genai
 import json
-import random
 from datetime import datetime
 
 # Add the parent directory to the path so we can import from ML_Model
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import ML utilities
-from ml_utils import get_available_models, predict_condition_risk, get_all_condition_predictions
-
-# Check for available ML models
-try:
-    available_models = get_available_models()
-    ML_MODEL_AVAILABLE = len(available_models) > 0
-    
-    if ML_MODEL_AVAILABLE:
-        print(f"Found {len(available_models)} trained ML models:")
-        for condition, model_path in available_models.items():
-            model_name = os.path.basename(model_path)
-            print(f"  - {condition}: {model_name}")
-        print("ML models are ready for predictions!")
-    else:
-        print("No trained ML models found. Training new models...")
-        # Try to import and train models if none exist
-        from ML_Model.Model import ChronicConditionPredictor
-        predictor = ChronicConditionPredictor(enable_plotting=False)
-        
-        df = predictor.load_and_preprocess_data()
-        if df is not None:
-            available_cccs = [col for col in predictor.ccc_columns if col in df.columns]
-            if available_cccs:
-                target_condition = available_cccs[0]  # Usually CCC_035
-                print(f"Training model for: {target_condition}")
-                
-                X, y = predictor.prepare_features_and_target(df, target_condition)
-                predictor.train_model(X, y)
-                model_path = predictor.save_model()
-                print(f"Model training completed and saved for {target_condition}")
-                
-                # Re-check available models
-                available_models = get_available_models()
-                ML_MODEL_AVAILABLE = len(available_models) > 0
-        
-        if not ML_MODEL_AVAILABLE:
-            print("Could not train or find any ML models")
-        
-except Exception as e:
-    print(f"Warning: Could not load ML model: {e}")
-    predictor = None
-    ML_MODEL_AVAILABLE = False
+from ml_utils import (get_available_models, predict_condition_risk, get_all_condition_predictions,
+                      get_batch_condition_predictions, get_model_registry, get_prediction_cache,
+                      get_risk_table_service, USE_RISK_TABLE, preload_models_for_fork)
+from memory_report import read_memory_usage
+from model_bootstrap import ModelBootstrap
+from llm_client import get_llm_client, LLM_MAX_CONCURRENCY
+from analysis_jobs import AnalysisJobQueue
+from analysis_cache import AnalysisCache, make_analysis_cache_key
+from question_prefetch import QuestionPrefetcher
+from session_store import SessionStore
+from prompt_builder import encode_predictions, prompt_stats
+from health_detective import HealthDetective, TURN_DEADLINE, get_turn_path_stats
+
+# Largest number of assessments accepted by /diagnose-batch
+MAX_BATCH_SIZE = int(os.getenv('MEDINATOR_MAX_BATCH_SIZE', '10000'))
+# Largest batch that may ask for Gemini analyses, one background job per row
+MAX_BATCH_ANALYSES = int(os.getenv('MEDINATOR_MAX_BATCH_ANALYSES', '20'))
+# Background Gemini analyses for /diagnose
+ANALYSIS_WORKERS = int(os.getenv('MEDINATOR_ANALYSIS_WORKERS', '4'))
+ANALYSIS_MAX_PENDING = int(os.getenv('MEDINATOR_ANALYSIS_MAX_PENDING', '100'))
+ANALYSIS_RESULT_TTL = float(os.getenv('MEDINATOR_ANALYSIS_RESULT_TTL', '600'))
+# Job status and results, shared by the gunicorn workers (empty keeps them per process)
+ANALYSIS_JOBS_PATH = os.getenv('MEDINATOR_ANALYSIS_JOBS',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'analysis_jobs.sqlite3'))
+# Persistent cache of Gemini analyses (empty path disables it)
+ANALYSIS_CACHE_PATH = os.getenv('MEDINATOR_ANALYSIS_CACHE',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'analysis_cache.sqlite3'))
+ANALYSIS_CACHE_TTL = float(os.getenv('MEDINATOR_ANALYSIS_CACHE_TTL', str(7 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('MEDINATOR_ANALYSIS_CACHE_MAX_ENTRIES', '10000'))
+ANALYSIS_CACHE_MAX_MB = float(os.getenv('MEDINATOR_ANALYSIS_CACHE_MAX_MB', '100'))
+# Speculatively generate the next detective question for the likeliest answers
+PREFETCH_QUESTIONS = os.getenv('MEDINATOR_PREFETCH_QUESTIONS', '0') == '1'
+PREFETCH_FAN_OUT = int(os.getenv('MEDINATOR_PREFETCH_FAN_OUT', '2'))
+# Speculative calls in flight, capped below the LLM client's concurrency so
+# they can never take every slot from real turns
+PREFETCH_BUDGET = min(int(os.getenv('MEDINATOR_PREFETCH_BUDGET', str(LLM_MAX_CONCURRENCY // 2))),
+                      LLM_MAX_CONCURRENCY - 1)
+# Detective sessions: idle expiry, caps and background sweep interval
+SESSION_IDLE_TTL = float(os.getenv('MEDINATOR_SESSION_IDLE_TTL', '1800'))
+MAX_SESSIONS = int(os.getenv('MEDINATOR_MAX_SESSIONS', '10000'))
+SESSION_MAX_MB = float(os.getenv('MEDINATOR_SESSION_MAX_MB', '256'))
+SESSION_SWEEP_INTERVAL = float(os.getenv('MEDINATOR_SESSION_SWEEP_INTERVAL', '60'))
+
+# Conditions that must be loaded before /readyz reports ready (comma separated,
+# default: every condition with a trained model)
+REQUIRED_CONDITIONS = [c.strip() for c in os.getenv('MEDINATOR_REQUIRED_CONDITIONS', '').split(',') if c.strip()]
+# Train missing models in the background at startup
+TRAIN_ON_STARTUP = os.getenv('MEDINATOR_TRAIN_ON_STARTUP', '1') == '1'
+# Load every model while importing, before a pre-fork server forks its workers
+# (set by gunicorn.conf.py)
+PRELOAD_MODELS = os.getenv('MEDINATOR_PRELOAD_MODELS', '0') == '1'
+
+def train_missing_models(conditions, progress):
+    """Train the given conditions (None for all) with the batch training script."""
+    from ML_Model.train_and_save_models import train_and_save_all_models
+    return train_and_save_all_models(conditions=conditions, progress=progress)
+
+def ml_models_available():
+    """Whether at least one trained condition model can serve predictions."""
+    try:
+        return len(get_available_models()) > 0
+    except Exception as e:
+        print(f"Warning: Could not check ML models: {e}")
+        return False
+
+model_bootstrap = ModelBootstrap(
+    locate_models=get_available_models,
+    train_models=train_missing_models,
+    load_models=preload_models_for_fork if PRELOAD_MODELS else (
+        lambda conditions: get_model_registry().preload(conditions)
+    ),
+    required_conditions=REQUIRED_CONDITIONS or None,
+    train_missing=TRAIN_ON_STARTUP
+)
+if PRELOAD_MODELS:
+    # Workers inherit the loaded (and gc-frozen) models copy-on-write
+    model_bootstrap.run()
+else:
+    # Train and load models off the import path, startup returns immediately
+    model_bootstrap.start()
 
 app = Flask(__name__)
 CORS(app)
 
+def end_detective_session(detective):
+    """Stop an evicted session's background work"""
+    detective.is_active = False
+    detective.discard_prefetch()
+
 # Store detective sessions
-detective_sessions = {}
-
-def get_full_condition_name(condition):
-    """Convert short condition names to full display names."""
-    condition_mapping = {
-        'cardiovascular': 'Cardiovascular Disease',
-        'respiratory': 'Respiratory Disease',
-        'diabetes': 'Type 2 Diabetes',
-        'kidney': 'Kidney Disease',
-        'arthritis': 'Arthritis',
-        'cancer': 'Cancer',
-        'stroke': 'Stroke History'
-    }
-    return condition_mapping.get(condition, condition.title())
-
-# Configure Gemini AI
-try:
-    api_key = os.getenv('GOOGLE_AI_API_KEY')
-    genai.configure(api_key=api_key)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    GEMINI_AVAILABLE = True
-    print("✅ Gemini AI configured successfully!")
-except Exception as e:
-    print(f"⚠️ Warning: Could not configure Gemini AI: {e}")
-    gemini_model = None
-    GEMINI_AVAILABLE = False
+detective_sessions = SessionStore(
+    idle_ttl=SESSION_IDLE_TTL,
+    max_sessions=MAX_SESSIONS,
+    max_bytes=int(SESSION_MAX_MB * 1024 * 1024),
+    sweep_interval=SESSION_SWEEP_INTERVAL,
+    on_evict=end_detective_session
+)
+
+# Gemini AI, the SDK is imported and configured on the first request that needs it
+gemini_model = get_llm_client()
+GEMINI_AVAILABLE = gemini_model.available
+if not GEMINI_AVAILABLE:
+    print("⚠️ Warning: Gemini AI SDK is not installed, AI analysis is disabled")
+
+analysis_cache = AnalysisCache(
+    ANALYSIS_CACHE_PATH,
+    ttl_seconds=ANALYSIS_CACHE_TTL,
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=int(ANALYSIS_CACHE_MAX_MB * 1024 * 1024)
+)
+
+question_prefetcher = QuestionPrefetcher(
+    # Bounded by the turn budget like the question calls it stands in for
+    lambda prompt: gemini_model.generate_content(prompt, timeout=TURN_DEADLINE).text,
+    fan_out=PREFETCH_FAN_OUT,
+    budget=PREFETCH_BUDGET
+) if PREFETCH_QUESTIONS and GEMINI_AVAILABLE else None
+
+analysis_jobs = AnalysisJobQueue(
+    ANALYSIS_JOBS_PATH,
+    max_workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_MAX_PENDING,
+    result_ttl=ANALYSIS_RESULT_TTL
+)
 
 @app.route('/')
 def home():
     return 'Welcome to the Medinator API!'
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: the models the service needs are trained and loaded"""
+    status = model_bootstrap.status()
+    if not status['ready']:
+        return jsonify({"status": "not_ready", "bootstrap": status}), 503
+    return jsonify({"status": "ready", "bootstrap": status})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Report model registry and cache counters"""
+    return jsonify({
+        "model_bootstrap": model_bootstrap.status(),
+        "model_registry": get_model_registry().stats(),
+        "prediction_cache": get_prediction_cache().stats(),
+        "risk_table": get_risk_table_service().stats() if USE_RISK_TABLE else None,
+        "process_memory": read_memory_usage(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "question_prefetch": question_prefetcher.stats() if question_prefetcher else None,
+        "detective_sessions": detective_sessions.stats(),
+        "prompt_tokens": prompt_stats.stats(),
+        "llm_client": gemini_model.stats(),
+        "detective_turns": get_turn_path_stats()
+    })
+
 @app.route('/initial', methods=['POST'])
 def analyze_data():
     data = request.get_json()
@@ -106,13 +186,20 @@ def analyze_with_gemini(diagnosis_data, user_assessment):
     if not GEMINI_AVAILABLE:
         return {"error": "Gemini AI not available", "analysis": "AI analysis unavailable"}
     
+    # Identical profiles and predictions produce the same prompt, skip Gemini for them
+    cache_key = make_analysis_cache_key(user_assessment, diagnosis_data, gemini_model.model_name,
+                                        prompt_version=2)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
     try:
         # Format the data for Gemini analysis
         prompt = f"""You are a health analysis expert. Analyze the following health assessment and ML diagnosis results to provide personalized insights.
-        Note that this information is from machine learning models and should not be full medical advice.
-        Do acknowledge that this information is from the Canadian Community Health Survey (CCHS)
-        Take this information, and keep it in mind. We provided a quick diagnostic, and this is what we found:
-        Keep in mind that you are going to be like akinator and ask questions to narrow down the possibilities, and find out what the user is going to be of risk of, and a percentage 
+Note that this information is from machine learning models and should not be full medical advice.
+Do acknowledge that this information is from the Canadian Community Health Survey (CCHS)
+Take this information, and keep it in mind. We provided a quick diagnostic, and this is what we found:
+Keep in mind that you are going to be like akinator and ask questions to narrow down the possibilities, and find out what the user is going to be of risk of, and a percentage
 
 USER PROFILE:
 - Age: {user_assessment.get('age', 'Not specified')}
@@ -137,20 +224,22 @@ CURRENT HEALTH STATUS:
 - Blood Pressure: {user_assessment.get('question9', 'Not specified')}
 
 ML MODEL PREDICTIONS:
-{json.dumps(diagnosis_data, indent=2)}
+{encode_predictions(diagnosis_data)}
 
 You are going to take in this information, and return a quick summary about the user. You will be called later to ask questions to narrow down the possibilities, and find out what the user is going to be of risk of, and a percentage.
 You wont stop until they trigger stop, and just keep asking questions until you are certain, and then move onto the next condition.
 """
 
-        response = gemini_model.generate_content(prompt)
+        response = gemini_model.generate_content(prompt_stats.record('analysis', prompt))
         
-        return {
+        result = {
             "analysis": response.text,
             "status": "success",
-            "model": "gemini-1.5-flash",
+            "model": gemini_model.model_name,
             "timestamp": pd.Timestamp.now().isoformat()
         }
+        analysis_cache.put(cache_key, result)
+        return {**result, "cached": False}
         
     except Exception as e:
         print(f"Gemini analysis error: {e}")
@@ -160,415 +249,97 @@ You wont stop until they trigger stop, and just keep asking questions until you
             "status": "error"
         }
 
-class HealthDetective:
-    def __init__(self, session_id):
-        self.session_id = session_id
-        self.conversation_history = []
-        self.questions_asked = 0
-        self.current_condition = None
-        self.conditions_investigated = []
-        self.condition_confidence = {}
-        self.initial_diagnosis = None
-        self.user_profile = None
-        self.is_active = True
-        
-    def start_investigation(self, diagnosis_data, user_assessment):
-        """Start the Akinator-style health detective investigation"""
-        self.initial_diagnosis = diagnosis_data
-        self.user_profile = user_assessment
-        
-        # Extract top risk conditions from ML predictions
-        if isinstance(diagnosis_data, dict):
-            # Sort conditions by risk level to prioritize investigation
-            risk_conditions = []
-            for condition, data in diagnosis_data.items():
-                if isinstance(data, dict) and 'risk_probability' in data:
-                    risk_conditions.append((condition, data['risk_probability']))
-                elif isinstance(data, str) and data in ['high', 'moderate', 'low']:
-                    risk_map = {'high': 0.8, 'moderate': 0.5, 'low': 0.2}
-                    risk_conditions.append((condition, risk_map[data]))
-            
-            # Sort by risk probability but add some randomization
-            risk_conditions.sort(key=lambda x: x[1] + random.uniform(-0.1, 0.1), reverse=True)
-            self.conditions_to_investigate = [cond for cond, _ in risk_conditions]
-            
-            # Ensure we have at least some conditions to investigate
-            if not self.conditions_to_investigate:
-                base_conditions = ['cardiovascular', 'diabetes', 'mental_health', 'respiratory', 'musculoskeletal', 'arthritis', 'kidney']
-                random.shuffle(base_conditions)  # Randomize the order
-                self.conditions_to_investigate = base_conditions[:5]  # Take 5 random conditions
-        else:
-            base_conditions = ['cardiovascular', 'diabetes', 'mental_health', 'respiratory', 'musculoskeletal', 'arthritis', 'kidney']
-            random.shuffle(base_conditions)
-            self.conditions_to_investigate = base_conditions[:5]
-        
-        # Start with the highest risk condition (now with some randomization)
-        if self.conditions_to_investigate:
-            self.current_condition = self.conditions_to_investigate[0]
-        else:
-            # Ultimate fallback
-            self.current_condition = random.choice(['cardiovascular', 'diabetes', 'mental_health'])
-            self.conditions_to_investigate = [self.current_condition]
-        
-        return self.ask_next_question()
+def start_analysis(diagnosis_data, user_assessment, wait=False):
+    """
+    Run the Gemini analysis for /diagnose, in the background unless ``wait``.
     
-    def ask_next_question(self):
-        """Generate the next question using Gemini AI"""
-        if not GEMINI_AVAILABLE:
-            return {"error": "AI detective not available"}
-        
-        try:
-            # Build conversation context
-            conversation_context = "\n".join([
-                f"Q{i+1}: {q['question']}\nA{i+1}: {q['answer']}" 
-                for i, q in enumerate(self.conversation_history[-5:])  # Last 5 Q&As
-            ])
-            
-            # Create dynamic context based on user profile and condition
-            age_group = "young adult" if int(self.user_profile.get('age', 30)) < 30 else "middle-aged" if int(self.user_profile.get('age', 30)) < 60 else "older adult"
-            condition_questions_count = len([q for q in self.conversation_history if q.get('condition') == self.current_condition])
-            
-            # Dynamic question angles based on condition and user profile
-            question_angles = {
-                'cardiovascular': [
-                    'physical activity and energy levels',
-                    'breathing during activities', 
-                    'chest sensations or comfort',
-                    'family patterns and genetics',
-                    'lifestyle and stress factors'
-                ],
-                'diabetes': [
-                    'energy levels throughout the day',
-                    'thirst and bathroom habits',
-                    'healing and recovery patterns',
-                    'family health patterns',
-                    'weight and appetite changes'
-                ],
-                'respiratory': [
-                    'breathing patterns and comfort',
-                    'seasonal or environmental reactions',
-                    'sleep quality and breathing',
-                    'physical activity tolerance',
-                    'coughing or throat comfort'
-                ],
-                'mental_health': [
-                    'daily mood and energy patterns',
-                    'sleep and rest quality',
-                    'social interactions and relationships',
-                    'stress management and coping',
-                    'motivation and interest levels'
-                ],
-                'arthritis': [
-                    'joint comfort and flexibility',
-                    'morning stiffness or mobility',
-                    'weather sensitivity',
-                    'activity limitations',
-                    'pain patterns throughout day'
-                ]
-            }
-            
-            # Get relevant angle for current condition and question number
-            angles = question_angles.get(self.current_condition, ['general health and wellbeing', 'daily activities', 'energy levels'])
-            current_angle = angles[condition_questions_count % len(angles)]
-            
-            prompt = f"""You are a health detective like Akinator discovering this {age_group} person's health patterns.
-
-FOCUS: {self.current_condition} (Question #{condition_questions_count + 1})
-ANGLE: {current_angle}
-TOTAL QUESTIONS: {self.questions_asked}
-EXPLORED: {', '.join(self.conditions_investigated) if self.conditions_investigated else 'Just getting started'}
-
-PERSON:
-- Age: {self.user_profile.get('age', 'Unknown')} ({age_group})
-- Gender: {self.user_profile.get('gender', 'Unknown')}
-- ML Risk Hints: {self.initial_diagnosis.get(self.current_condition, 'No clear pattern')}
-
-PREVIOUS CONVERSATION:
-{conversation_context if conversation_context else 'First question about ' + self.current_condition}
-
-RULES:
-1. Ask about {current_angle} related to {self.current_condition} risk
-2. Personal to {age_group} {self.user_profile.get('gender', 'person')}
-3. Everyday language, not medical terms
-4. Build on previous answers
-5. Short, simple, direct questions
-6. Ask questions that will give CLEAR YES/NO answers to determine HIGH or LOW risk
-7. Avoid questions that lead to "medium" or "sometimes" answers
-
-Dont give them a whole report if you detect something
-Dont say question number, and dont tell user what disease they have when you do detect something
-
-Ask a decisive question that will clearly indicate HIGH RISK or LOW RISK:
-
-IMPORTANT: End with exactly 5 options separated by "|" like this:
-Options: Yes, definitely|Sometimes|Rarely|No, never|I'm not sure"""
+    Returns:
+        dict: Response fields, either the finished 'ai_analysis' or the
+        'analysis_job_id' to poll at GET /analysis/<job_id>
+    """
+    if wait or not GEMINI_AVAILABLE:
+        return {"ai_analysis": analyze_with_gemini(diagnosis_data, user_assessment)}
+    
+    job_id = analysis_jobs.submit(analyze_with_gemini, diagnosis_data, user_assessment)
+    if job_id is None:
+        return {
+            "ai_analysis": {
+                "error": "Analysis queue is full",
+                "analysis": "AI analysis unavailable, please try again later",
+                "status": "rejected"
+            },
+            "analysis_job_id": None
+        }
+    
+    return {
+        "ai_analysis": None,
+        "analysis_job_id": job_id,
+        "analysis_status": "queued",
+        "analysis_url": f"/analysis/{job_id}"
+    }
 
-            response = gemini_model.generate_content(prompt)
-            full_response = response.text.strip()
-            
-            # Parse question and options
-            if "Options:" in full_response:
-                parts = full_response.split("Options:")
-                question = parts[0].strip()
-                options_text = parts[1].strip()
-                options = [opt.strip() for opt in options_text.split("|")]
-            else:
-                question = full_response
-                # Randomize default options occasionally
-                default_option_sets = [
-                    ["Yes, definitely", "Sometimes", "Rarely", "No, never", "I'm not sure"],
-                    ["Always", "Often", "Sometimes", "Rarely", "Never"],
-                    ["Very much", "Moderately", "A little", "Not really", "Not at all"],
-                    ["Frequently", "Occasionally", "Seldom", "Never", "Unsure"]
-                ]
-                options = random.choice(default_option_sets)
-            
-            # Clean up the question
-            if question.startswith('"') and question.endswith('"'):
-                question = question[1:-1]
-            
-            self.questions_asked += 1
-            
-            # Record the current question when asking it
-            question_record = {
-                "question": question,
-                "answer": None,  # Will be filled when user responds
-                "condition": self.current_condition
-            }
-            self.conversation_history.append(question_record)
-            
-            return {
-                "question": question,
-                "options": options,
-                "current_condition": self.current_condition,
-                "questions_asked": self.questions_asked,
-                "session_id": self.session_id,
-                "can_stop": True  # User can always stop after first question
-            }
-            
-        except Exception as e:
-            return {"error": f"Failed to generate question: {str(e)}"}
+@app.route('/analysis/<job_id>', methods=['GET'])
+def get_analysis(job_id):
+    """Poll the Gemini analysis started by /diagnose"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Analysis job not found or expired"}), 404
     
-    def process_answer(self, answer):
-        """Process user's answer and determine next action"""        
-        # Record the conversation
-        if self.conversation_history and len(self.conversation_history) > 0:
-            # Update the last question with the answer
-            self.conversation_history[-1]['answer'] = answer
-        else:
-            # First question
-            self.conversation_history.append({
-                "question": "Initial question",
-                "answer": answer,
-                "condition": self.current_condition
-            })
-        
-        # Check if we should move to next condition
-        condition_questions = [q for q in self.conversation_history if q.get('condition') == self.current_condition]
-        
-        if len(condition_questions) >= 3:  # Asked enough questions about this condition (reduced to 3)
-            return self.assess_condition_and_move_next()
-        else:
-            return self.ask_next_question()
+    response = {
+        "analysis_job_id": job_id,
+        "analysis_status": job['status'],
+        "ai_analysis": job['result']
+    }
+    if job['status'] == 'failed':
+        response["error"] = job['error']
+        return jsonify(response), 500
+    if job['status'] != 'done':
+        return jsonify(response), 202
+    return jsonify(response)
+
+def wants_event_stream(data):
+    """Whether the client asked for server-sent events instead of a JSON body"""
+    return bool(data.get('stream', False)) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def event_stream_response(events, on_close=None, **extra):
+    """
+    Send detective events as server-sent events.
     
-    def assess_condition_and_move_next(self):
-        """Assess current condition confidence and move to next"""
-        if not GEMINI_AVAILABLE:
-            return {"error": "AI detective not available"}
-        
+    Args:
+        events: Iterable of (event, payload) tuples
+        on_close (callable): Called once the stream ends or the client disconnects
+        extra: Fields added to every event except 'token'
+    """
+    def generate():
         try:
-            # Get conversation about current condition
-            condition_conversation = [q for q in self.conversation_history if q.get('condition') == self.current_condition]
-            conversation_text = "\n".join([
-                f"Q: {q['question']}\nA: {q['answer']}" for q in condition_conversation
-            ])
-            
-            # Create more dynamic assessment prompt
-            age_group = "young adult" if int(self.user_profile.get('age', 30)) < 30 else "middle-aged" if int(self.user_profile.get('age', 30)) < 60 else "older adult"
-            question_count = len(condition_conversation)
-            
-            prompt = f"""HEALTH RISK ASSESSMENT for {self.current_condition.upper()}
-
-You are a medical assessment AI analyzing health risk patterns. Be DECISIVE and CLEAR.
-KEEP IT AT 3 MAX ILLNESSES
-
-PERSON: {age_group}, Age {self.user_profile.get('age', 'Unknown')}, {self.user_profile.get('gender', 'Unknown')}
-
-CONVERSATION ABOUT {self.current_condition.upper()}:
-{conversation_text}
-
-INITIAL ML RISK SCORE: {self.initial_diagnosis.get(self.current_condition, 'No initial data')}
-
-ASSESSMENT RULES - BE DECISIVE:
-Dont say question number, and dont tell user what disease they have when you do detect something, unless it's at the very end for the report
-
-
-🔴 HIGH/VERY HIGH RISK if:
-- Multiple "Yes" answers to risk factor questions
-- Strong positive symptoms reported
-- Family history + personal symptoms
-- Age factors + multiple risk indicators
-
-🟡 MEDIUM RISK if:
-- Mixed answers (some yes, some no)
-- "Sometimes" answers to key symptoms
-- Some risk factors present but not severe
-
-🟢 LOW RISK if:
-- Mostly "No, never" answers
-- No significant symptoms reported
-- Healthy lifestyle patterns
-- No family history + no symptoms
-
-STOP DEFAULTING TO MEDIUM! Analyze their actual answers:
-- If they say "Yes" to multiple concerning things → HIGH RISK
-- If they say "No" to most things → LOW RISK
-- Only use MEDIUM for truly mixed results
-
-Required JSON format: {{"risk_level": "low|medium|high|very high", "comment": "Clear assessment based on their answers", "indicators": ["specific answer patterns"]}}
-
-BE DECISIVE - NO MORE AUTOMATIC MEDIUM RATINGS!"""
-
-            response = gemini_model.generate_content(prompt)
-            
-            try:
-                # Try to parse JSON response
-                response_text = response.text.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.replace('```json', '').replace('```', '').strip()
-                assessment = json.loads(response_text)
-                
-                # Validate that risk_level is one of the expected values
-                valid_risk_levels = ['low', 'medium', 'high', 'very high']
-                if assessment.get('risk_level') not in valid_risk_levels:
-                    raise ValueError("Invalid risk level")
-                    
-            except Exception as parse_error:
-                print(f"JSON parsing failed: {parse_error}, Raw response: {response.text}")
-                
-                # Intelligent fallback based on conversation content
-                conversation_lower = conversation_text.lower()
-                yes_count = conversation_lower.count('yes')
-                no_count = conversation_lower.count('no, never') + conversation_lower.count('never')
-                sometimes_count = conversation_lower.count('sometimes')
-                
-                # Determine risk based on answer patterns
-                if yes_count >= 2:
-                    risk_level = "high"
-                    comment = "Multiple concerning indicators identified from your responses."
-                elif no_count >= 2:
-                    risk_level = "low" 
-                    comment = "Your responses suggest healthy patterns in this area."
-                elif sometimes_count >= 1 or yes_count == 1:
-                    risk_level = "medium"
-                    comment = "Some patterns detected that warrant attention."
-                else:
-                    risk_level = "low"
-                    comment = "Limited risk indicators found."
-                
-                assessment = {
-                    "risk_level": risk_level,
-                    "comment": comment,
-                    "indicators": ["Based on response patterns"]
-                }
-            
-            # Record assessment
-            self.condition_confidence[self.current_condition] = assessment
-            if self.current_condition not in self.conditions_investigated:
-                self.conditions_investigated.append(self.current_condition)
-            
-            # Move to next condition - cycle through all conditions continuously
-            remaining_conditions = [c for c in self.conditions_to_investigate if c not in self.conditions_investigated]
-            
-            if remaining_conditions:
-                # Move to next uninvestigated condition
-                self.current_condition = remaining_conditions[0]
-            else:
-                # All conditions investigated once, start over with more detailed questions
-                # Reset and go deeper into conditions
-                if self.conditions_to_investigate:
-                    self.current_condition = self.conditions_to_investigate[0]
-                else:
-                    # Fallback conditions if none available
-                    self.conditions_to_investigate = ['cardiovascular', 'diabetes', 'mental_health', 'respiratory', 'musculoskeletal']
-                    self.current_condition = self.conditions_to_investigate[0]
-                # Don't clear conditions_investigated so we know we're on round 2+
-            
-            next_question = self.ask_next_question()
-            return {
-                "assessment": assessment,
-                "moving_to_next": True,
-                "next_question": next_question,
-                "session_id": self.session_id,
-                "all_assessments": self.condition_confidence,  # Show all current assessments
-                "total_conditions": len(self.conditions_to_investigate),
-                "conditions_completed_once": len(self.conditions_investigated)
-            }
-                
-        except Exception as e:
-            return {"error": f"Assessment failed: {str(e)}"}
+            for event, payload in events:
+                if event != 'token':
+                    payload = {**extra, **payload}
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            if on_close is not None:
+                on_close()
     
-    def generate_final_report(self):
-        """Generate final detective report with all conditions and risk levels"""
-        self.is_active = False
-        
-        # Create a comprehensive report showing all conditions
-        all_conditions_summary = {}
-        
-        # Include assessed conditions with risk levels
-        for condition, assessment in self.condition_confidence.items():
-            full_name = get_full_condition_name(condition)
-            all_conditions_summary[full_name] = {
-                "risk_level": assessment.get("risk_level", "medium"),
-                "status": "assessed",
-                "comment": assessment.get("comment", ""),
-                "indicators": assessment.get("indicators", []),
-                "condition_key": condition  # Keep original key for reference
-            }
-        
-        # Include any remaining conditions from initial diagnosis that weren't fully assessed
-        if self.initial_diagnosis:
-            for condition in self.conditions_to_investigate:
-                full_name = get_full_condition_name(condition)
-                if full_name not in all_conditions_summary:
-                    # Use initial ML prediction if available
-                    initial_data = self.initial_diagnosis.get(condition, {})
-                    if isinstance(initial_data, dict):
-                        risk_prob = initial_data.get('risk_probability', 0.5)
-                        if risk_prob >= 0.8:
-                            risk_level = "very high"
-                        elif risk_prob >= 0.6:
-                            risk_level = "high"
-                        elif risk_prob >= 0.4:
-                            risk_level = "medium"
-                        else:
-                            risk_level = "low"
-                    else:
-                        risk_map = {'high': 'high', 'moderate': 'medium', 'low': 'low'}
-                        risk_level = risk_map.get(initial_data, 'medium')
-                    
-                    all_conditions_summary[full_name] = {
-                        "risk_level": risk_level,
-                        "status": "initial_assessment_only",
-                        "comment": "Based on initial screening",
-                        "indicators": ["Initial health profile analysis"],
-                        "condition_key": condition  # Keep original key for reference
-                    }
-        
-        return {
-            "final_report": True,
-            "total_questions": self.questions_asked,
-            "all_conditions": all_conditions_summary,
-            "detailed_assessments": self.condition_confidence,
-            "conversation_history": self.conversation_history,
-            "session_id": self.session_id,
-            "investigation_complete": True,
-            "stopped_by_user": True
-        }
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def store_detective_session(session_id, detective):
+    """Re-measure a session after a turn, unless it was stopped or evicted meanwhile"""
+    if detective.is_active:
+        detective_sessions.put(session_id, detective)
 
 @app.route('/start-detective', methods=['POST'])
 def start_detective():
-    """Start a new health detective session"""
+    """
+    Start a new health detective session.
+    
+    With "stream": true (or Accept: text/event-stream) the first question is
+    sent as server-sent events: 'token' events with the question text as it is
+    generated, then a 'question' event with the parsed question and options.
+    """
     try:
         data = request.get_json()
         diagnosis_data = data.get('diagnosis_data', {})
@@ -576,11 +347,19 @@ def start_detective():
         
         # Create new session
         session_id = f"detective_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
-        detective = HealthDetective(session_id)
-        detective_sessions[session_id] = detective
+        detective = HealthDetective(session_id, gemini_model if GEMINI_AVAILABLE else None, question_prefetcher)
+        detective_sessions.put(session_id, detective)
+        
+        if wants_event_stream(data):
+            detective.begin_investigation(diagnosis_data, user_assessment)
+            return event_stream_response(detective.stream_next_question(),
+                                         on_close=lambda: store_detective_session(session_id, detective),
+                                         session_id=session_id, detective_started=True)
         
         # Start investigation
         result = detective.start_investigation(diagnosis_data, user_assessment)
+        # Re-measure the session now that it holds the profile and first question
+        store_detective_session(session_id, detective)
         
         return jsonify({
             "session_id": session_id,
@@ -593,21 +372,31 @@ def start_detective():
 
 @app.route('/continue-detective', methods=['POST'])
 def continue_detective():
-    """Continue detective conversation with user's answer"""
+    """
+    Continue detective conversation with user's answer.
+    
+    Streams like /start-detective when requested; when the answer completes
+    the current condition, an 'assessment' event precedes the final 'question'.
+    """
     try:
         data = request.get_json()
         session_id = data.get('session_id')
         answer = data.get('answer', '')
         
-        if session_id not in detective_sessions:
+        detective = detective_sessions.get(session_id)
+        if detective is None:
             return jsonify({"error": "Detective session not found"}), 404
         
-        detective = detective_sessions[session_id]
-        
         if not detective.is_active:
             return jsonify({"error": "Detective session is complete"}), 400
         
+        if wants_event_stream(data):
+            return event_stream_response(detective.stream_answer(answer),
+                                         on_close=lambda: store_detective_session(session_id, detective),
+                                         session_id=session_id)
+        
         result = detective.process_answer(answer)
+        store_detective_session(session_id, detective)
         
         return jsonify({
             "session_id": session_id,
@@ -624,15 +413,13 @@ def stop_detective():
         data = request.get_json()
         session_id = data.get('session_id')
         
-        if session_id not in detective_sessions:
+        # Clean up session
+        detective = detective_sessions.pop(session_id)
+        if detective is None:
             return jsonify({"error": "Detective session not found"}), 404
         
-        detective = detective_sessions[session_id]
         final_report = detective.generate_final_report()
         
-        # Clean up session
-        del detective_sessions[session_id]
-        
         return jsonify({
             "session_id": session_id,
             "stopped_by_user": True,
@@ -642,12 +429,103 @@ def stop_detective():
     except Exception as e:
         return jsonify({"error": f"Failed to stop detective: {str(e)}"}), 500
 
+def build_user_assessment(user_answers):
+    """Create the simplified user input dictionary used for ML prediction."""
+    return {
+        'age': int(user_answers.get('age', 40)),
+        'gender': user_answers.get('gender', 'Male'),
+        'height': user_answers.get('height', ''),
+        'weight': float(user_answers.get('weight', 0)) if user_answers.get('weight') else 0,
+        'concerns': user_answers.get('concerns', ''),
+        'ethnicity': user_answers.get('ethnicity', ''),
+        'question1': user_answers.get('question1', ''),  # Age range
+        'question2': user_answers.get('question2', ''),  # Gender
+        'question3': user_answers.get('question3', ''),  # BMI category
+        'question4': user_answers.get('question4', ''),  # Smoking
+        'question5': user_answers.get('question5', ''),  # Alcohol
+        'question6': user_answers.get('question6', ''),  # Exercise
+        'question7': user_answers.get('question7', ''),  # Family history heart
+        'question8': user_answers.get('question8', ''),  # Family history diabetes
+        'question9': user_answers.get('question9', ''),  # Blood pressure
+        'question10': user_answers.get('question10', '') # Overall health
+    }
+
+@app.route('/diagnose-batch', methods=['POST'])
+def diagnose_batch():
+    """Score many assessments in one request, one predict call per condition model"""
+    try:
+        data = request.get_json() or {}
+        assessments = data.get('assessments')
+        include_analysis = bool(data.get('include_analysis', False))
+        
+        if not isinstance(assessments, list) or not assessments:
+            return jsonify({"error": "Expected a non-empty 'assessments' array"}), 400
+        
+        if len(assessments) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large: {len(assessments)} assessments (max {MAX_BATCH_SIZE})"}), 413
+        
+        if include_analysis and len(assessments) > MAX_BATCH_ANALYSES:
+            return jsonify({
+                "error": f"Batch too large for AI analysis: {len(assessments)} assessments "
+                         f"(max {MAX_BATCH_ANALYSES} with include_analysis)"
+            }), 413
+        
+        if not ml_models_available():
+            return jsonify({"error": "ML models are not available"}), 503
+        
+        # Validate every row up front; invalid rows are reported, not scored
+        user_assessments = []
+        row_errors = {}
+        for index, answers in enumerate(assessments):
+            try:
+                if not isinstance(answers, dict):
+                    raise ValueError("assessment must be an object")
+                answers = answers.get('answers', answers)
+                if not isinstance(answers, dict):
+                    raise ValueError("answers must be an object")
+                user_assessments.append((index, build_user_assessment(answers)))
+            except (TypeError, ValueError) as e:
+                row_errors[index] = f"Invalid assessment: {str(e)}"
+        
+        batch_predictions = get_batch_condition_predictions([assessment for _, assessment in user_assessments])
+        
+        results = [None] * len(assessments)
+        for index, error in row_errors.items():
+            results[index] = {"index": index, "error": error}
+        
+        for (index, user_assessment), predictions in zip(user_assessments, batch_predictions):
+            row = {
+                "index": index,
+                "predictions": predictions,
+                "total_conditions_analyzed": len(predictions)
+            }
+            if include_analysis:
+                # Queued like /diagnose, poll each row's analysis_url
+                row.update(start_analysis(predictions, user_assessment))
+            results[index] = row
+        
+        return jsonify({
+            "message": "Batch diagnostic analysis complete",
+            "results": results,
+            "total_assessments": len(assessments),
+            "scored_assessments": len(user_assessments),
+            "failed_assessments": len(row_errors),
+            "analysis_timestamp": pd.Timestamp.now().isoformat(),
+            "ai_enabled": GEMINI_AVAILABLE and include_analysis
+        })
+        
+    except Exception as e:
+        print(f"Error in batch diagnosis: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/diagnose', methods=['POST'])
 def diagnose():
     try:
         # Get user inputs from the request
         data = request.get_json()
         user_answers = data.get('answers', {})
+        # Block on the Gemini analysis like before instead of returning a job id
+        wait_for_analysis = bool(data.get('wait_for_analysis', False))
         
         print(f"Received answers: {user_answers}")
         
@@ -712,41 +590,24 @@ def diagnose():
             return jsonify({"error": f"Insufficient inputs processed. Expected 16, got {len(ml_inputs)}. Inputs: {ml_inputs}"}), 400
 
         # Use the actual ML models if available
-        if ML_MODEL_AVAILABLE:
+        if ml_models_available():
             try:
                 # Create simplified user input dictionary for ML prediction
-                user_assessment = {
-                    'age': int(user_answers.get('age', 40)),
-                    'gender': user_answers.get('gender', 'Male'),
-                    'height': user_answers.get('height', ''),
-                    'weight': float(user_answers.get('weight', 0)) if user_answers.get('weight') else 0,
-                    'concerns': user_answers.get('concerns', ''),
-                    'ethnicity': user_answers.get('ethnicity', ''),
-                    'question1': user_answers.get('question1', ''),  # Age range
-                    'question2': user_answers.get('question2', ''),  # Gender
-                    'question3': user_answers.get('question3', ''),  # BMI category
-                    'question4': user_answers.get('question4', ''),  # Smoking
-                    'question5': user_answers.get('question5', ''),  # Alcohol
-                    'question6': user_answers.get('question6', ''),  # Exercise
-                    'question7': user_answers.get('question7', ''),  # Family history heart
-                    'question8': user_answers.get('question8', ''),  # Family history diabetes
-                    'question9': user_answers.get('question9', ''),  # Blood pressure
-                    'question10': user_answers.get('question10', '') # Overall health
-                }
+                user_assessment = build_user_assessment(user_answers)
                 
                 print(f"Making predictions for user assessment: {user_assessment}")
                 
                 # Get predictions for all available chronic conditions
                 all_predictions = get_all_condition_predictions(user_assessment)
                 
-                # Get Gemini AI analysis of the diagnosis
-                gemini_analysis = analyze_with_gemini(all_predictions, user_assessment)
+                # Gemini analysis runs in the background, poll GET /analysis/<job_id>
+                analysis = start_analysis(all_predictions, user_assessment, wait=wait_for_analysis)
                 
                 # Format the response with actual ML predictions and AI analysis
                 response = {
                     "message": "Multi-condition diagnostic analysis complete",
                     "predictions": all_predictions,
-                    "ai_analysis": gemini_analysis,
+                    **analysis,
                     "user_assessment": user_assessment,
                     "total_conditions_analyzed": len(all_predictions),
                     "analysis_timestamp": pd.Timestamp.now().isoformat(),
@@ -794,12 +655,12 @@ def diagnose():
             }
             
             # Get Gemini analysis even with mock data
-            gemini_analysis = analyze_with_gemini(mock_predictions, mock_user_assessment)
+            analysis = start_analysis(mock_predictions, mock_user_assessment, wait=wait_for_analysis)
             
             mock_response = {
                 "message": "Diagnostic analysis complete (using mock data - ML model not available)",
                 "risk_factors": mock_predictions,
-                "ai_analysis": gemini_analysis,
+                **analysis,
                 "recommendations": [
                     "Consider increasing physical activity",
                     "Monitor stress levels",
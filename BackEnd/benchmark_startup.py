@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure worker startup cost: import time and resident memory of the modules
+a server process loads.
+
+Every scenario runs in a fresh interpreter, so results are not skewed by
+modules an earlier scenario already imported. Compare the training stack and
+the Gemini SDK (what workers used to import eagerly) against the slim serving
+path.
+
+    python benchmark_startup.py --repeats 5
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+SCENARIOS = [
+    ('interpreter', ''),
+    ('training stack (ML_Model.Model)', 'import ML_Model.Model'),
+    ('gemini sdk', 'import google.generativeai'),
+    ('serving stack (ml_utils)', 'import ml_utils, llm_client'),
+    ('api worker (app)', 'import app'),
+]
+
+CHILD_TEMPLATE = """
+import sys, time, json
+sys.path[:0] = {paths!r}
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = time.perf_counter()
+{imports}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'rss_mb': rss_mb()}}))
+"""
+
+
+def run_scenario(imports, repeats=3):
+    """
+    Import ``imports`` in fresh interpreters.
+
+    Returns:
+        dict: Median import seconds and RSS in MB, or an error message
+    """
+    code = CHILD_TEMPLATE.format(paths=[BACKEND_DIR, REPO_DIR], imports=imports or 'pass')
+    env = dict(os.environ, MEDINATOR_TRAIN_ON_STARTUP='0')
+    samples = []
+
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            return {'error': lines[-1] if lines else f'exit code {proc.returncode}'}
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    return {
+        'seconds': statistics.median(s['seconds'] for s in samples),
+        'rss_mb': statistics.median(s['rss_mb'] for s in samples)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark worker import time and memory')
+    parser.add_argument('--repeats', type=int, default=3, help='Fresh interpreters per scenario')
+    args = parser.parse_args()
+
+    print(f"{'Scenario':<34} {'Import (s)':>11} {'RSS (MB)':>10}")
+    print("-" * 57)
+    for name, imports in SCENARIOS:
+        result = run_scenario(imports, repeats=args.repeats)
+        if 'error' in result:
+            print(f"{name:<34} {'n/a':>11} {'n/a':>10}  ({result['error']})")
+        else:
+            print(f"{name:<34} {result['seconds']:>11.3f} {result['rss_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
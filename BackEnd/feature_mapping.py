@@ -3,164 +3,342 @@ Feature mapping system to convert user inputs to model-expected features.
 This bridges the gap between simple user assessment answers and complex health survey data.
 """
 
+import threading
 import pandas as pd
 import numpy as np
 
-def create_feature_vector_from_user_input(user_data):
+# 6 typically means "not applicable" in the survey
+NOT_APPLICABLE = 6
+
+# Answer option -> survey code mappings for the assessment questions
+AGE_MAPPING = {"18-29": 2, "30-39": 3, "40-49": 4, "50-59": 5, "60+": 6}
+
+GENDER_MAPPING = {"Male": 1, "Female": 2}
+
+# BMI category (question3) and overall health (question10) are collected but
+# not mapped to any survey feature yet
+BMI_MAPPING = {"Underweight": 1, "Normal": 2, "Overweight": 3, "Obese": 4}
+
+SMOKING_MAPPING = {
+    "Never smoked": 3,          # Never smoker
+    "Former smoker": 2,         # Former smoker  
+    "Occasional smoker": 1,     # Current occasional
+    "Regular smoker": 1,        # Current regular
+    "Heavy smoker": 1           # Current heavy
+}
+
+ALCOHOL_MAPPING = {
+    "Never": 2,                           # No
+    "Rarely (1-2 times/month)": 1,       # Yes, infrequently  
+    "Occasionally (1-2 times/week)": 1,   # Yes, occasionally
+    "Regularly (3-4 times/week)": 1,      # Yes, regularly
+    "Daily": 1                            # Yes, daily
+}
+
+ALCOHOL_FREQ_MAPPING = {
+    "Never": 5,
+    "Rarely (1-2 times/month)": 5,
+    "Occasionally (1-2 times/week)": 4,
+    "Regularly (3-4 times/week)": 3, 
+    "Daily": 1
+}
+
+ACTIVITY_MAPPING = {
+    "Sedentary (no exercise)": 2,        # No
+    "Light (1-2 days/week)": 1,          # Yes, light
+    "Moderate (3-4 days/week)": 1,       # Yes, moderate  
+    "Active (5-6 days/week)": 1,         # Yes, active
+    "Very active (daily exercise)": 1    # Yes, very active
+}
+
+FAMILY_HISTORY_MAPPING = {
+    "No family history": 2,
+    "One parent": 1,
+    "Both parents": 1,
+    "Siblings": 1,
+    "Multiple family members": 1
+}
+
+BP_MAPPING = {
+    "No": 2,                            # No hypertension
+    "Borderline": 9,                    # Don't know/borderline
+    "Yes, controlled with medication": 1, # Yes, controlled
+    "Yes, uncontrolled": 1,             # Yes, uncontrolled  
+    "Don't know": 9                     # Don't know
+}
+
+HEALTH_MAPPING = {
+    "Very healthy": 2,      # Good health
+    "Mostly healthy": 2,    # Good health
+    "Mixed": 1,             # Some issues
+    "Somewhat unhealthy": 1, # Health issues
+    "Very unhealthy": 1     # Significant health issues
+}
+
+# Question-driven features: (feature, answer field, answer -> code mapping,
+# code used when the answer is missing or not one of the options)
+ANSWER_FEATURES = [
+    ('DHHGAGE', 'question1', AGE_MAPPING, 4),                                  # Default to 40-49
+    ('DHH_SEX', 'question2', GENDER_MAPPING, 1),
+    ('SMK_005', 'question4', SMOKING_MAPPING, 3),                              # Smoking status
+    ('SMK_010', 'question4', {"Never smoked": 2}, 1),
+    ('SMK_020', 'question4', {"Never smoked": 2, "Former smoker": 2}, 1),
+    ('SMK_025', 'question4', {"Never smoked": 2}, 1),
+    ('SMKG035', 'question4', {"Heavy smoker": 5}, 2),
+    ('ALC_005', 'question5', ALCOHOL_MAPPING, 2),
+    ('ALC_010', 'question5', {"Never": 2}, 1),
+    ('ALC_015', 'question5', ALCOHOL_FREQ_MAPPING, 5),
+    ('ALC_020', 'question5', ALCOHOL_FREQ_MAPPING, 5),
+    ('ALCDVTTM', 'question5', {"Never": 3}, 1),
+    ('PAA_005', 'question6', ACTIVITY_MAPPING, 2),
+    ('PAA_030', 'question6', ACTIVITY_MAPPING, 2),
+    ('CCC_070', 'question7', FAMILY_HISTORY_MAPPING, 2),                       # Family history heart disease
+    ('CCCDGCAR', 'question7', FAMILY_HISTORY_MAPPING, 2),
+    ('CCC_080', 'question8', FAMILY_HISTORY_MAPPING, 2),                       # Family history diabetes
+    ('CCCDGRSP', 'question9', BP_MAPPING, 2),                                  # Blood pressure
+    ('CCCDGSKL', 'question9', BP_MAPPING, 2),
+]
+
+# Age-related feature: capped age value
+AGE_FEATURE = 'PAA_045'
+AGE_CAP = 45
+DEFAULT_AGE = 40
+
+# Features with a fixed value for every user
+CONSTANT_FEATURES = {
+    'DOCCC': 1,      # Has chronic condition screening
+    'SMK_015': 6,    # Age started smoking (not applicable for never smokers)
+    'SMK_030': 6,    # Not applicable
+    'SMK_055': 96, 'SMK_060': 6, 'SMK_080': 6, 'SMKG090': 6, 'SMK_095': 6,
+    'SMK_100': 6, 'SMKG110': 6, 'SMKDVSTY': 6, 'SMKDGYCS': 6, 'SMKDGSTP': 6,
+    'ALW_005': 6, 'ALWDVLTR': 6, 'ALWDVSTR': 6,
+    'PAA_010A': 6, 'PAA_010B': 6, 'PAA_010C': 6, 'PAA_010D': 6, 'PAA_010E': 6,
+    'PAA_010F': 6, 'PAA_010G': 6, 'PAA_035': 6, 'PAA_040A': 6, 'PAA_040B': 6,
+    'PAA_040C': 6, 'PAA_040D': 6, 'PAA_040E': 6, 'PAA_040F': 6, 'PAA_040G': 6,
+    'PAA_060': 6, 'PAA_065': 6, 'PAA_070A': 6, 'PAA_070B': 6, 'PAA_070C': 6,
+    'PAA_070D': 6, 'PAA_070E': 6, 'PAA_070F': 6, 'PAA_070G': 6, 'PAA_095': 6,
+    'FLU_005': 2, 'FLU_010': 6, 'FLU_015': 96, 'FLU_020': 6,
+    'FLU_025A': 2, 'FLU_025B': 2, 'FLU_025C': 2, 'FLU_025D': 2, 'FLU_025E': 2,
+    'FLU_025F': 2, 'FLU_025G': 2, 'FLU_025H': 2, 'FLU_025I': 2, 'FLU_025J': 2,
+    'FLU_025K': 2
+}
+
+# Chronic condition columns are targets, never features
+CHRONIC_CONDITIONS = ['CCC_035', 'CCC_065', 'CCC_075', 'CCC_095', 'CCC_185', 'CCC_195', 'CCC_200']
+
+# Value of every generated feature for a user who left all answers blank
+DEFAULT_FEATURE_VALUES = {feature: default for feature, _, _, default in ANSWER_FEATURES}
+DEFAULT_FEATURE_VALUES[AGE_FEATURE] = min(AGE_CAP, DEFAULT_AGE)
+DEFAULT_FEATURE_VALUES.update(CONSTANT_FEATURES)
+for _condition in CHRONIC_CONDITIONS:
+    DEFAULT_FEATURE_VALUES.pop(_condition, None)
+
+GENERATED_FEATURES = list(DEFAULT_FEATURE_VALUES.keys())
+
+# Answer fields that actually change the generated features
+MODEL_INPUT_FIELDS = sorted({field for _, field, _, _ in ANSWER_FEATURES} | {'age'})
+
+# Recognised answer options per question field, any other answer falls back
+# to the slot defaults
+_FIELD_OPTIONS = {}
+for _feature, _field, _mapping, _default in ANSWER_FEATURES:
+    _FIELD_OPTIONS.setdefault(_field, set()).update(_mapping.keys())
+
+def coerce_age(value):
     """
-    Convert user assessment answers to a feature vector matching the trained models.
+    Age as it reaches PAA_045: a number capped at AGE_CAP, DEFAULT_AGE when
+    the answer is missing or not a number (form values may be strings).
     
     Args:
-        user_data (dict): User responses from the assessment
-        
+        value: Raw 'age' answer
+    
     Returns:
-        pandas.DataFrame: Feature vector ready for model prediction
+        float: Feature value
     """
+    try:
+        age = float(value)
+    except (TypeError, ValueError):
+        age = DEFAULT_AGE
+    if age != age:  # NaN
+        age = DEFAULT_AGE
+    return float(min(AGE_CAP, age))
+
+def canonical_answer_key(user_data):
+    """
+    Reduce a user's answers to the fields that reach the feature vector.
     
-    # Initialize feature vector with default values (mostly missing/not applicable = 6)
-    features = {}
-    
-    # Age mapping: question1 -> DHHGAGE 
-    age_mapping = {"18-29": 2, "30-39": 3, "40-49": 4, "50-59": 5, "60+": 6}
-    features['DHHGAGE'] = age_mapping.get(user_data.get('question1', ''), 4)  # Default to 40-49
-    
-    # Gender mapping: question2 -> DHH_SEX
-    gender_mapping = {"Male": 1, "Female": 2}
-    features['DHH_SEX'] = gender_mapping.get(user_data.get('question2', ''), 1)
-    
-    # BMI mapping: question3 -> calculated from height/weight or BMI category
-    bmi_mapping = {"Underweight": 1, "Normal": 2, "Overweight": 3, "Obese": 4}
-    bmi_value = bmi_mapping.get(user_data.get('question3', ''), 2)
-    # We'll store this as a general health indicator
-    features['DOCCC'] = 1  # Has chronic condition screening
-    
-    # Smoking: question4 -> SMK_005 (smoking status)
-    smoking_mapping = {
-        "Never smoked": 3,          # Never smoker
-        "Former smoker": 2,         # Former smoker  
-        "Occasional smoker": 1,     # Current occasional
-        "Regular smoker": 1,        # Current regular
-        "Heavy smoker": 1           # Current heavy
-    }
-    features['SMK_005'] = smoking_mapping.get(user_data.get('question4', ''), 3)
-    features['SMK_010'] = 2 if user_data.get('question4', '') == "Never smoked" else 1
-    features['SMK_015'] = 6  # Age started smoking (not applicable for never smokers)
-    features['SMK_020'] = 2 if user_data.get('question4', '') in ["Never smoked", "Former smoker"] else 1
-    features['SMK_025'] = 2 if user_data.get('question4', '') == "Never smoked" else 1
-    features['SMK_030'] = 6  # Not applicable
-    features['SMKG035'] = 5 if user_data.get('question4', '') == "Heavy smoker" else 2
-    
-    # Alcohol: question5 -> ALC_005, ALC_010, etc.
-    alcohol_mapping = {
-        "Never": 2,                           # No
-        "Rarely (1-2 times/month)": 1,       # Yes, infrequently  
-        "Occasionally (1-2 times/week)": 1,   # Yes, occasionally
-        "Regularly (3-4 times/week)": 1,      # Yes, regularly
-        "Daily": 1                            # Yes, daily
-    }
-    features['ALC_005'] = alcohol_mapping.get(user_data.get('question5', ''), 2)
-    features['ALC_010'] = 1 if user_data.get('question5', '') != "Never" else 2
-    
-    alcohol_freq_mapping = {
-        "Never": 5,
-        "Rarely (1-2 times/month)": 5,
-        "Occasionally (1-2 times/week)": 4,
-        "Regularly (3-4 times/week)": 3, 
-        "Daily": 1
-    }
-    features['ALC_015'] = alcohol_freq_mapping.get(user_data.get('question5', ''), 5)
-    features['ALC_020'] = alcohol_freq_mapping.get(user_data.get('question5', ''), 5)
-    features['ALCDVTTM'] = 3 if user_data.get('question5', '') == "Never" else 1
-    
-    # Physical Activity: question6 -> PAA_005, PAA_030, etc.
-    activity_mapping = {
-        "Sedentary (no exercise)": 2,        # No
-        "Light (1-2 days/week)": 1,          # Yes, light
-        "Moderate (3-4 days/week)": 1,       # Yes, moderate  
-        "Active (5-6 days/week)": 1,         # Yes, active
-        "Very active (daily exercise)": 1    # Yes, very active
-    }
-    features['PAA_005'] = activity_mapping.get(user_data.get('question6', ''), 2)
-    features['PAA_030'] = activity_mapping.get(user_data.get('question6', ''), 2)
+    Unrecognised answers collapse to None (they all map to the defaults) and
+    the age is capped the same way PAA_045 is, so every pair of inputs that
+    produces the same feature vector gets the same key.
     
-    # Family History Heart Disease: question7 -> multiple fields
-    heart_family_mapping = {
-        "No family history": 2,
-        "One parent": 1,
-        "Both parents": 1,
-        "Siblings": 1,
-        "Multiple family members": 1
-    }
-    features['CCC_070'] = heart_family_mapping.get(user_data.get('question7', ''), 2)
-    features['CCCDGCAR'] = heart_family_mapping.get(user_data.get('question7', ''), 2)
+    Args:
+        user_data (dict): User responses from the assessment
     
-    # Family History Diabetes: question8 -> similar mapping
-    diabetes_family_mapping = {
-        "No family history": 2,
-        "One parent": 1, 
-        "Both parents": 1,
-        "Siblings": 1,
-        "Multiple family members": 1
-    }
-    features['CCC_080'] = diabetes_family_mapping.get(user_data.get('question8', ''), 2)
+    Returns:
+        dict: Canonical field -> value mapping
+    """
+    key = {}
+    for field, options in _FIELD_OPTIONS.items():
+        answer = user_data.get(field, '')
+        key[field] = answer if isinstance(answer, str) and answer in options else None
+    key['age'] = coerce_age(user_data.get('age', DEFAULT_AGE))
+    return key
+
+
+class FeatureTemplate:
+    """
+    Precompiled mapping from assessment answers to one model's feature layout.
     
-    # Blood Pressure: question9 -> related to hypertension indicators
-    bp_mapping = {
-        "No": 2,                            # No hypertension
-        "Borderline": 9,                    # Don't know/borderline
-        "Yes, controlled with medication": 1, # Yes, controlled
-        "Yes, uncontrolled": 1,             # Yes, uncontrolled  
-        "Don't know": 9                     # Don't know
-    }
-    # This affects respiratory and general health indicators
-    features['CCCDGRSP'] = bp_mapping.get(user_data.get('question9', ''), 2)
-    features['CCCDGSKL'] = bp_mapping.get(user_data.get('question9', ''), 2)
+    Holds a preallocated default row for the model's feature_names and the
+    column positions of the question-driven features, so building a row only
+    writes those slots instead of rebuilding dicts and DataFrames.
+    """
     
-    # Overall Health: question10 -> general health indicators
-    health_mapping = {
-        "Very healthy": 2,      # Good health
-        "Mostly healthy": 2,    # Good health
-        "Mixed": 1,             # Some issues
-        "Somewhat unhealthy": 1, # Health issues
-        "Very unhealthy": 1     # Significant health issues
-    }
-    overall_health = health_mapping.get(user_data.get('question10', ''), 2)
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        index = {feature: i for i, feature in enumerate(self.feature_names)}
+        
+        self.default_row = np.full(len(self.feature_names), NOT_APPLICABLE, dtype=np.float64)
+        for feature, value in DEFAULT_FEATURE_VALUES.items():
+            if feature in index:
+                self.default_row[index[feature]] = value
+        
+        self.slots = [
+            (index[feature], field, mapping, default)
+            for feature, field, mapping, default in ANSWER_FEATURES
+            if feature in index and feature not in CHRONIC_CONDITIONS
+        ]
+        self.age_index = index.get(AGE_FEATURE)
+    
+    def build_row(self, user_data):
+        """
+        Build the feature row for one user's answers.
+        
+        Returns:
+            numpy.ndarray: 1-D row in feature_names order
+        """
+        row = self.default_row.copy()
+        for column, field, mapping, default in self.slots:
+            answer = user_data.get(field, '')
+            # Options are strings, anything else (e.g. a list) is unrecognised
+            row[column] = mapping.get(answer, default) if isinstance(answer, str) else default
+        if self.age_index is not None:
+            row[self.age_index] = coerce_age(user_data.get('age', DEFAULT_AGE))
+        return row
+    
+    def build_matrix(self, answers):
+        """
+        Build feature rows for many users in one vectorized pass.
+        
+        Args:
+            answers: Column-oriented answers, either a pandas.DataFrame or a
+                dict of field -> list, or a list of per-user answer dicts
+        
+        Returns:
+            numpy.ndarray: Contiguous matrix with one row per user
+        """
+        if isinstance(answers, list):
+            answers = pd.DataFrame.from_records(answers)
+        elif not isinstance(answers, pd.DataFrame):
+            answers = pd.DataFrame(answers)
+        
+        n_rows = len(answers)
+        matrix = np.tile(self.default_row, (n_rows, 1))
+        
+        mapped_columns = {}
+        for column, field, mapping, default in self.slots:
+            if field not in answers.columns:
+                continue
+            key = (field, id(mapping), default)
+            values = mapped_columns.get(key)
+            if values is None:
+                values = answers[field].map(mapping).fillna(default).to_numpy(dtype=np.float64)
+                mapped_columns[key] = values
+            matrix[:, column] = values
+        
+        if self.age_index is not None and 'age' in answers.columns:
+            # The same coercion as build_row, so batch and single scoring agree
+            matrix[:, self.age_index] = np.fromiter(map(coerce_age, answers['age']), dtype=np.float64, count=n_rows)
+        
+        return np.ascontiguousarray(matrix)
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+def get_feature_template(feature_names):
+    """
+    Get the compiled FeatureTemplate for a model's feature contract.
     
-    # Age-related features
-    features['PAA_045'] = min(45, user_data.get('age', 40))  # Capped age value
+    Args:
+        feature_names (list): Features expected by the model, in order
     
-    # Set default values for remaining features that are commonly not applicable
-    default_features = {
-        'SMK_055': 96, 'SMK_060': 6, 'SMK_080': 6, 'SMKG090': 6, 'SMK_095': 6,
-        'SMK_100': 6, 'SMKG110': 6, 'SMKDVSTY': 6, 'SMKDGYCS': 6, 'SMKDGSTP': 6,
-        'ALW_005': 6, 'ALWDVLTR': 6, 'ALWDVSTR': 6,
-        'PAA_010A': 6, 'PAA_010B': 6, 'PAA_010C': 6, 'PAA_010D': 6, 'PAA_010E': 6,
-        'PAA_010F': 6, 'PAA_010G': 6, 'PAA_035': 6, 'PAA_040A': 6, 'PAA_040B': 6,
-        'PAA_040C': 6, 'PAA_040D': 6, 'PAA_040E': 6, 'PAA_040F': 6, 'PAA_040G': 6,
-        'PAA_060': 6, 'PAA_065': 6, 'PAA_070A': 6, 'PAA_070B': 6, 'PAA_070C': 6,
-        'PAA_070D': 6, 'PAA_070E': 6, 'PAA_070F': 6, 'PAA_070G': 6, 'PAA_095': 6,
-        'FLU_005': 2, 'FLU_010': 6, 'FLU_015': 96, 'FLU_020': 6,
-        'FLU_025A': 2, 'FLU_025B': 2, 'FLU_025C': 2, 'FLU_025D': 2, 'FLU_025E': 2,
-        'FLU_025F': 2, 'FLU_025G': 2, 'FLU_025H': 2, 'FLU_025I': 2, 'FLU_025J': 2,
-        'FLU_025K': 2
-    }
+    Returns:
+        FeatureTemplate: Cached template for this feature layout
+    """
+    key = tuple(feature_names)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            template = FeatureTemplate(key)
+            _templates[key] = template
+    return template
+
+def create_feature_vector_from_user_input(user_data):
+    """
+    Convert user assessment answers to a feature vector matching the trained models.
     
-    # Add default features
-    features.update(default_features)
+    Args:
+        user_data (dict): User responses from the assessment
+        
+    Returns:
+        pandas.DataFrame: Feature vector ready for model prediction
+    """
+    row = get_feature_template(GENERATED_FEATURES).build_row(user_data)
+    return pd.DataFrame([row], columns=GENERATED_FEATURES)
+
+_COLUMN_TYPES = (list, tuple, np.ndarray, pd.Series)
+
+def is_column_table(answers):
+    """
+    Whether ``answers`` is a column-oriented table of many users' answers:
+    a DataFrame, or a dict in which every field holds a sequence. A single
+    user's dict with the odd list-valued answer is not a table.
+    """
+    if isinstance(answers, pd.DataFrame):
+        return True
+    return (isinstance(answers, dict) and bool(answers)
+            and all(isinstance(value, _COLUMN_TYPES) for value in answers.values()))
+
+def build_feature_row(user_data, expected_features):
+    """
+    Map one user's answers to a model-aligned NumPy row.
     
-    # Remove chronic condition columns (they are targets, not features)
-    chronic_conditions = ['CCC_035', 'CCC_065', 'CCC_075', 'CCC_095', 'CCC_185', 'CCC_195', 'CCC_200']
-    for cc in chronic_conditions:
-        if cc in features:
-            del features[cc]
+    Args:
+        user_data (dict): User responses from the assessment
+        expected_features (list): List of features expected by the model
     
-    # Create DataFrame with single row
-    feature_df = pd.DataFrame([features])
+    Returns:
+        numpy.ndarray: Matrix with a single row
+    """
+    if not isinstance(user_data, dict):
+        raise TypeError(f"Expected one user's answers as a dict, got {type(user_data).__name__}")
+    return get_feature_template(expected_features).build_row(user_data).reshape(1, -1)
+
+def build_feature_rows(answers, expected_features):
+    """
+    Map one or many users' answers straight to a model-aligned NumPy matrix.
     
-    # Ensure all missing values are handled
-    feature_df = feature_df.fillna(6)  # 6 typically means "not applicable" in the survey
+    Args:
+        answers: A single user dict, a list of user dicts, or a
+            column-oriented table (see ``is_column_table``)
+        expected_features (list): List of features expected by the model
     
-    return feature_df
+    Returns:
+        numpy.ndarray: Matrix with one row per user
+    """
+    if isinstance(answers, dict) and not is_column_table(answers):
+        return build_feature_row(answers, expected_features)
+    return get_feature_template(expected_features).build_matrix(answers)
 
 def validate_feature_vector(feature_df, expected_features):
     """
@@ -174,16 +352,12 @@ def validate_feature_vector(feature_df, expected_features):
         pandas.DataFrame: Aligned feature vector
     """
     
-    # Add missing features with default value 6 (not applicable)
-    for feature in expected_features:
-        if feature not in feature_df.columns:
-            feature_df[feature] = 6
-    
-    # Remove extra features not expected by model
-    feature_df = feature_df[expected_features]
+    # Add missing features with default value 6 (not applicable) and
+    # remove extra features not expected by model in one reindex
+    feature_df = feature_df.reindex(columns=expected_features, fill_value=NOT_APPLICABLE)
     
     # Replace any remaining NaN values
-    feature_df = feature_df.fillna(6)
+    feature_df = feature_df.fillna(NOT_APPLICABLE)
     
     return feature_df
 
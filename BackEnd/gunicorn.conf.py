@@ -0,0 +1,51 @@
+"""
+Gunicorn configuration for the Medinator API.
+
+The app is imported once in the master (preload_app), which loads every model
+and freezes it out of the garbage collector before the workers are forked, so
+all workers share the forest pages copy-on-write.
+
+    cd BackEnd && gunicorn app:app
+
+Check the per-worker shared/private split with ``python memory_report.py <master_pid>``
+or the ``process_memory`` section of GET /metrics.
+
+One worker with a thread pool is the default, because detective sessions live
+in the worker's memory. The pre-fork sharing above only saves memory with
+MEDINATOR_WORKERS > 1: a single worker still preloads and freezes its models,
+but there is no second process to share the pages with.
+
+To scale out with several workers, the load balancer must route every request
+of a detective session to the same worker (sticky sessions), or
+/continue-detective answers "session not found". Analysis jobs are kept in
+SQLite and work with any number of workers.
+"""
+
+import os
+
+# Must be set before the master imports app.py
+os.environ.setdefault('MEDINATOR_PRELOAD_MODELS', '1')
+
+bind = os.getenv('MEDINATOR_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('MEDINATOR_WORKERS', '1'))
+# Request threads per worker; LLM calls wait on I/O, so threads scale them well
+threads = int(os.getenv('MEDINATOR_THREADS', '8'))
+preload_app = True
+timeout = 120
+
+
+def on_starting(server):
+    if workers > 1:
+        server.log.warning(
+            f"{workers} workers: detective sessions are per worker, "
+            "route each session to one worker (sticky sessions)"
+        )
+    else:
+        server.log.info(
+            "1 worker: preloaded models are not shared with other processes, "
+            "set MEDINATOR_WORKERS > 1 (with sticky sessions) to share them copy-on-write"
+        )
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked with preloaded models")
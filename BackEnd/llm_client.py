@@ -0,0 +1,551 @@
+"""
+LLM backends used for the AI analysis and the health detective.
+
+The Gemini SDK is heavy to import, so it is only loaded and configured on the
+first request that actually needs it. MEDINATOR_LLM_BACKEND=stub swaps in a
+local, deterministic stand-in for tests and offline development.
+
+Every call goes through PooledLLMClient, which bounds concurrency and applies
+deadlines, retries and a circuit breaker in front of whichever backend is
+configured.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+# 'gemini' or 'stub'
+LLM_BACKEND = os.getenv('MEDINATOR_LLM_BACKEND', 'gemini')
+# Simulated response time of the stub backend, in seconds
+STUB_LATENCY = float(os.getenv('MEDINATOR_STUB_LATENCY', '0'))
+# Fraction of stub calls that fail, to exercise retries and the circuit breaker
+STUB_ERROR_RATE = float(os.getenv('MEDINATOR_STUB_ERROR_RATE', '0'))
+
+# Client limits shared by every LLM call
+LLM_MAX_CONCURRENCY = int(os.getenv('MEDINATOR_LLM_MAX_CONCURRENCY', '8'))
+LLM_TIMEOUT = float(os.getenv('MEDINATOR_LLM_TIMEOUT', '30'))
+LLM_RETRIES = int(os.getenv('MEDINATOR_LLM_RETRIES', '2'))
+LLM_BREAKER_THRESHOLD = int(os.getenv('MEDINATOR_LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_RESET = float(os.getenv('MEDINATOR_LLM_BREAKER_RESET', '30'))
+
+
+class LLMError(Exception):
+    """An LLM call failed after the client's retries."""
+
+
+class LLMTimeoutError(LLMError):
+    """An LLM call, or the wait for a free slot, ran past its deadline."""
+
+
+class CircuitOpenError(LLMError):
+    """The upstream is failing, calls are refused until the breaker resets."""
+
+
+class GeminiBackend:
+    """Google Gemini, imported and configured lazily on first use."""
+
+    name = 'gemini'
+
+    def __init__(self, api_key=None, model_name=GEMINI_MODEL_NAME):
+        self.api_key = api_key if api_key is not None else os.getenv('GOOGLE_AI_API_KEY')
+        self.model_name = model_name
+        self._model = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        """Whether the SDK is installed and configuration has not failed."""
+        if self._error is not None:
+            return False
+        try:
+            return importlib.util.find_spec('google.generativeai') is not None
+        except (ImportError, ValueError):
+            return False
+
+    def _get_model(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    print("✅ Gemini AI configured successfully!")
+                except Exception as e:
+                    self._error = str(e)
+                    print(f"⚠️ Warning: Could not configure Gemini AI: {e}")
+                    raise
+        return self._model
+
+    def generate_content(self, prompt, stream=False):
+        """
+        Send a prompt to Gemini.
+
+        Args:
+            prompt (str): Prompt text
+            stream (bool): Return the response incrementally
+
+        Returns:
+            Response object with a ``text`` attribute, or an iterable of
+            chunks with ``text`` attributes when streaming
+        """
+        return self._get_model().generate_content(prompt, stream=stream)
+
+
+class StubResponse:
+    """Mimics the ``text`` attribute of a Gemini response."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubBackend:
+    """
+    Offline stand-in for Gemini.
+
+    Answers in the shape each prompt asks for: a risk-assessment JSON object,
+    a detective question ending in an ``Options:`` line, or a plain analysis.
+    """
+
+    name = 'stub'
+    model_name = 'stub'
+    available = True
+
+    def __init__(self, latency=STUB_LATENCY, error_rate=STUB_ERROR_RATE, fail_next=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self._fail_next = fail_next
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1):
+        """Make the next ``count`` calls raise, e.g. to trip a circuit breaker."""
+        with self._lock:
+            self._fail_next += count
+
+    def respond(self, prompt):
+        """The full text the stub answers ``prompt`` with."""
+        if 'Required JSON format' in prompt:
+            return json.dumps({
+                "risk_level": "low",
+                "comment": "Stub assessment: no concerning patterns in the answers.",
+                "indicators": ["stub response"]
+            })
+        if 'Options:' in prompt:
+            return ("How often do you notice this in your daily routine?\n"
+                    "Options: Yes, definitely|Sometimes|Rarely|No, never|I'm not sure")
+        return "Stub analysis: the ML predictions above summarise this profile's main risks."
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            self.calls += 1
+            fail = self._fail_next > 0 or (self.error_rate and random.random() < self.error_rate)
+            if self._fail_next > 0:
+                self._fail_next -= 1
+        if fail:
+            raise RuntimeError("Stub backend failure")
+        if stream:
+            return self._stream(self.respond(prompt))
+        if self.latency:
+            time.sleep(self.latency)
+        return StubResponse(self.respond(prompt))
+
+    def _stream(self, text):
+        # Word-sized chunks, the latency spread evenly across them
+        chunks = re.findall(r'\S+\s*|\s+', text)
+        delay = self.latency / len(chunks) if chunks else 0
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay)
+            yield StubResponse(chunk)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and refuses calls for
+    ``reset_timeout`` seconds, then lets a single trial call through.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, reset_timeout=LLM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+
+    def allow(self):
+        """Whether a call may go to the upstream now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened
+            }
+
+
+class PooledLLMClient:
+    """
+    The one entry point for LLM calls.
+
+    Wraps a backend with a bounded number of concurrent upstream calls, a
+    deadline per call (covering the wait for a slot and every retry), retries
+    with exponential back-off and full jitter, and a circuit breaker that
+    fails fast while the upstream is unhealthy. Request threads never wait
+    longer than the deadline, however slow the upstream gets.
+    """
+
+    def __init__(self, backend, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_RETRIES, backoff=0.5, breaker=None):
+        """
+        Args:
+            backend: Object with ``generate_content(prompt, stream=False)``
+            max_concurrency (int): Upstream calls in flight at once
+            timeout (float): Default deadline of a call in seconds
+            max_retries (int): Extra attempts after a failed call
+            backoff (float): Base delay before the first retry in seconds
+            breaker (CircuitBreaker): Defaults to one with the module settings
+        """
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        # Runs the blocking generate_content calls of hedged and submitted requests
+        self._background = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm-hedge")
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rejected = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._attempts = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    @property
+    def available(self):
+        return self.backend.available
+
+    def _acquire(self, deadline):
+        started = time.monotonic()
+        acquired = self._slots.acquire(timeout=max(deadline - started, 0))
+        waited = time.monotonic() - started
+        with self._lock:
+            self._queue_wait_total += waited
+            self._queue_wait_max = max(self._queue_wait_max, waited)
+            if acquired:
+                self.in_flight += 1
+        if not acquired:
+            raise LLMTimeoutError(f"No free LLM slot within the deadline ({waited:.1f}s)")
+
+    def _release(self, *_):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _record_latency(self, elapsed):
+        with self._lock:
+            self._attempts += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+
+    def _attempt(self, prompt, deadline):
+        self._acquire(deadline)
+        started = time.monotonic()
+        future = self._executor.submit(self.backend.generate_content, prompt)
+        # The slot is held until the upstream call really ends, even after a timeout
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeoutError("LLM call ran past its deadline")
+        finally:
+            self._record_latency(time.monotonic() - started)
+
+    def _deadline(self, timeout):
+        return time.monotonic() + (timeout if timeout is not None else self.timeout)
+
+    def generate_content(self, prompt, stream=False, timeout=None):
+        """
+        Send a prompt through the pool.
+
+        Args:
+            prompt (str): Prompt text
+            stream (bool): Return an iterator of chunks, see ``_stream``
+            timeout (float): Deadline in seconds, default ``self.timeout``
+
+        Returns:
+            Response object with a ``text`` attribute, or an iterator of
+            chunks when streaming
+
+        Raises:
+            CircuitOpenError: The breaker is open
+            LLMTimeoutError: The deadline passed
+            LLMError: Every attempt failed
+        """
+        deadline = self._deadline(timeout)
+        if stream:
+            with self._lock:
+                self.calls += 1
+            return self._stream(prompt, deadline)
+        return self._call(prompt, deadline)
+
+    def _call(self, prompt, deadline):
+        """
+        One logical call, retried until it succeeds, the retries run out or
+        ``deadline`` passes. The breaker sees the outcome of the logical call,
+        not of each attempt, so one bad request cannot open it on its own.
+        """
+        with self._lock:
+            self.calls += 1
+
+        if time.monotonic() >= deadline:
+            # Queued behind other work until the caller's deadline had passed
+            with self._lock:
+                self.timeouts += 1
+                self.failures += 1
+            raise LLMTimeoutError("LLM call waited past its deadline before it started")
+
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("LLM upstream is unhealthy, try again later")
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._attempt(prompt, deadline)
+            except LLMTimeoutError:
+                # Out of time, a retry could only run past the deadline too
+                self.breaker.record_failure()
+                with self._lock:
+                    self.failures += 1
+                raise
+            except Exception as e:
+                last_error = e
+            else:
+                self.breaker.record_success()
+                with self._lock:
+                    self.successes += 1
+                return response
+
+            # Full jitter: a random delay up to the exponential back-off
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                break
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+        self.breaker.record_failure()
+        with self._lock:
+            self.failures += 1
+        raise LLMError(f"LLM call failed: {last_error}")
+
+    def submit(self, prompt, timeout=None):
+        """
+        Send a prompt without waiting for the response.
+
+        The deadline starts now, not when a background thread picks the call
+        up, so time spent queued counts against it.
+
+        Returns:
+            Future: Resolves to the response, or raises like generate_content
+        """
+        return self._background.submit(self._call, prompt, self._deadline(timeout))
+
+    def generate_hedged(self, prompt, hedge_after, timeout=None):
+        """
+        Send a prompt, and a duplicate if no answer arrived after ``hedge_after``.
+
+        The first successful response wins; the slower call finishes in the
+        background and is ignored.
+
+        Args:
+            prompt (str): Prompt text
+            hedge_after (float): Seconds before the duplicate is sent, 0 to never hedge
+            timeout (float): Deadline for the whole call in seconds
+
+        Returns:
+            tuple: (response, path) where path is 'primary' or 'hedge'
+
+        Raises:
+            LLMError: Neither call succeeded before the deadline
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout
+        # Both calls share the caller's deadline, however long they wait for a thread
+        primary = self._background.submit(self._call, prompt, deadline)
+        pending = {primary: 'primary'}
+
+        if hedge_after and hedge_after < timeout:
+            done, _ = wait([primary], timeout=hedge_after)
+            if not done or primary.exception() is not None:
+                if deadline > time.monotonic():
+                    with self._lock:
+                        self.hedges_sent += 1
+                    hedge = self._background.submit(self._call, prompt, deadline)
+                    pending[hedge] = 'hedge'
+
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                if future.exception() is None:
+                    if path == 'hedge':
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result(), path
+                last_error = future.exception()
+
+        if isinstance(last_error, LLMError):
+            raise last_error
+        if last_error is not None:
+            raise LLMError(f"LLM call failed: {last_error}")
+        raise LLMTimeoutError("LLM call ran past its deadline")
+
+    def _stream(self, prompt, deadline):
+        """
+        Streamed calls hold a slot until the stream ends. The breaker and the
+        deadline are checked before the call and between chunks; a stream is
+        not retried once it has started.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("LLM upstream is unhealthy, try again later")
+        try:
+            self._acquire(deadline)
+        except LLMTimeoutError:
+            self.breaker.record_failure()
+            with self._lock:
+                self.failures += 1
+            raise
+
+        started = time.monotonic()
+        try:
+            for chunk in self.backend.generate_content(prompt, stream=True):
+                yield chunk
+                if time.monotonic() > deadline:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise LLMTimeoutError("LLM stream ran past its deadline")
+        except GeneratorExit:
+            # The reader went away, the upstream itself was answering
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            with self._lock:
+                self.failures += 1
+            raise
+        else:
+            self.breaker.record_success()
+            with self._lock:
+                self.successes += 1
+        finally:
+            self._record_latency(time.monotonic() - started)
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'backend': self.backend.name,
+                'max_concurrency': self.max_concurrency,
+                'timeout_seconds': self.timeout,
+                'in_flight': self.in_flight,
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'retries': self.retries,
+                'rejected_circuit_open': self.rejected,
+                'hedges_sent': self.hedges_sent,
+                'hedge_wins': self.hedge_wins,
+                'avg_queue_wait_ms': round(self._queue_wait_total / self.calls * 1000, 2) if self.calls else None,
+                'max_queue_wait_ms': round(self._queue_wait_max * 1000, 2),
+                'avg_latency_ms': round(self._latency_total / self._attempts * 1000, 2) if self._attempts else None,
+                'max_latency_ms': round(self._latency_max * 1000, 2)
+            }
+        stats['circuit'] = self.breaker.stats()
+        return stats
+
+
+def get_llm_backend():
+    """Create the backend selected by MEDINATOR_LLM_BACKEND."""
+    if LLM_BACKEND == 'stub':
+        print("Using the stub LLM backend")
+        return StubBackend()
+    return GeminiBackend()
+
+
+def get_llm_client():
+    """The configured backend behind a PooledLLMClient."""
+    return PooledLLMClient(get_llm_backend())
@@ -0,0 +1,103 @@
+"""
+Per-process shared versus private memory, read from /proc (Linux only).
+
+Workers forked from a master that preloaded the models share the forest
+pages copy-on-write. RSS counts those pages in every worker, so compare the
+private (unique) and shared totals, or PSS, to see the actual saving.
+
+Report the master and every worker of a running gunicorn:
+
+    python memory_report.py <master_pid>
+"""
+
+import os
+import sys
+
+# smaps_rollup fields reported, values are in kB
+_ROLLUP_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory_usage(pid='self'):
+    """
+    Read a process's memory breakdown from /proc/<pid>/smaps_rollup.
+
+    Args:
+        pid: Process id, or 'self' for the current process
+
+    Returns:
+        dict: rss_mb, pss_mb, shared_mb and private_mb, or None when
+        smaps_rollup is not available
+    """
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].rstrip(':') in _ROLLUP_FIELDS:
+                    values[parts[0].rstrip(':')] = int(parts[1])
+    except (OSError, ValueError):
+        return None
+
+    def mb(*fields):
+        return round(sum(values.get(field, 0) for field in fields) / 1024, 1)
+
+    return {
+        'pid': os.getpid() if pid == 'self' else int(pid),
+        'rss_mb': mb('Rss'),
+        'pss_mb': mb('Pss'),
+        'shared_mb': mb('Shared_Clean', 'Shared_Dirty'),
+        'private_mb': mb('Private_Clean', 'Private_Dirty')
+    }
+
+
+def child_pids(pid):
+    """Direct children of a process, e.g. the workers of a gunicorn master."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, fields after it are fixed
+        fields = stat[stat.rfind(')') + 2:].split()
+        if len(fields) > 1 and int(fields[1]) == int(pid):
+            children.append(int(entry))
+    return sorted(children)
+
+
+def report_process_tree(master_pid):
+    """
+    Memory of a master process and each of its workers, with totals.
+
+    Returns:
+        dict: 'processes' list and 'total' of the summed columns
+    """
+    processes = []
+    for pid in [int(master_pid)] + child_pids(master_pid):
+        usage = read_memory_usage(pid)
+        if usage is not None:
+            processes.append(usage)
+
+    total = {
+        key: round(sum(p[key] for p in processes), 1)
+        for key in ('rss_mb', 'pss_mb', 'shared_mb', 'private_mb')
+    }
+    return {'processes': processes, 'total': total}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python memory_report.py <master_pid>")
+        sys.exit(1)
+
+    report = report_process_tree(sys.argv[1])
+    print(f"{'PID':<10} {'RSS (MB)':>10} {'PSS (MB)':>10} {'Shared (MB)':>12} {'Private (MB)':>13}")
+    print("-" * 58)
+    for p in report['processes']:
+        print(f"{p['pid']:<10} {p['rss_mb']:>10.1f} {p['pss_mb']:>10.1f} {p['shared_mb']:>12.1f} {p['private_mb']:>13.1f}")
+    t = report['total']
+    print("-" * 58)
+    print(f"{'total':<10} {t['rss_mb']:>10.1f} {t['pss_mb']:>10.1f} {t['shared_mb']:>12.1f} {t['private_mb']:>13.1f}")
@@ -3,68 +3,244 @@ Utility functions for loading and using ML models in the web application.
 """
 
 import os
-import glob
+import gc
+import threading
+import weakref
+import numpy as np
 import pandas as pd
-from ML_Model.Model import ChronicConditionPredictor
-from feature_mapping import create_feature_vector_from_user_input, validate_feature_vector
+from ML_Model.serving import MultiConditionServingPredictor, ServingPredictor
+from feature_mapping import (create_feature_vector_from_user_input, validate_feature_vector, build_feature_row,
+                             build_feature_rows)
+from ML_Model.forest_engine import CompiledForest
+from ML_Model.model_manifest import FUSED_MODEL_KEY, get_manifest_path, read_manifest, scan_artifacts
+from ML_Model.model_bundle import get_bundle_path, open_bundle
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, make_prediction_cache_key
+from risk_table import RiskTableService, artifact_fingerprint, build_risk_table
+
+# Memory cap (in MB) for models kept in the registry, 0 keeps every model loaded
+MODEL_CACHE_MAX_MB = float(os.getenv('MEDINATOR_MODEL_CACHE_MB', '0') or 0)
+# Seconds between checks for newer model artifacts on disk
+MODEL_RELOAD_INTERVAL = float(os.getenv('MEDINATOR_MODEL_RELOAD_INTERVAL', '2.0'))
+# 'per_condition' serves one forest per condition, 'fused' serves the
+# multi-label model when one has been trained
+SERVING_MODEL = os.getenv('MEDINATOR_SERVING_MODEL', 'per_condition')
+# 'sklearn' runs the imputer and predict_proba, 'compiled' serves from the
+# flattened NumPy forest engine
+INFERENCE_BACKEND = os.getenv('MEDINATOR_INFERENCE_BACKEND', 'sklearn')
+# Cached prediction results (0 disables the cache) and their lifetime in seconds
+PREDICTION_CACHE_SIZE = int(os.getenv('MEDINATOR_PREDICTION_CACHE_SIZE', '10000'))
+PREDICTION_CACHE_TTL = float(os.getenv('MEDINATOR_PREDICTION_CACHE_TTL', '3600'))
+# Per-condition model storage: 'joblib' artifacts or the memory-mapped 'bundle'
+# written by ML_Model/model_bundle.py (always scored with the compiled engine).
+# Conditions retrained after the bundle was written are served from their
+# .joblib artifact until the bundle is rebuilt.
+MODEL_FORMAT = os.getenv('MEDINATOR_MODEL_FORMAT', 'joblib')
+# Serve per-condition predictions from the precomputed risk table, rebuilt in
+# the background whenever a model artifact changes
+USE_RISK_TABLE = os.getenv('MEDINATOR_RISK_TABLE', '0') == '1'
+
+_model_registries = {}
+_model_registries_lock = threading.Lock()
+_manifest_cache = {}
+_manifest_cache_lock = threading.Lock()
+_inference_engines = weakref.WeakKeyDictionary()
+_prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL)
+_risk_table_services = {}
+_risk_table_services_lock = threading.Lock()
+_inference_engines_lock = threading.Lock()
+# Bundle path -> conditions last served from .joblib because the bundle is stale
+_stale_bundles = {}
+_stale_bundles_lock = threading.Lock()
+
+def get_default_models_dir():
+    """Return the default directory where trained models are saved."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(current_dir), "ML_Model", "saved_models")
 
 def get_available_models(models_dir=None):
     """
     Get a list of all available trained models.
     
+    Looks the current artifacts up in the directory's manifest instead of
+    parsing artifact file names.
+    
     Returns:
         dict: Dictionary mapping condition names to model file paths
     """
     if models_dir is None:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        models_dir = os.path.join(os.path.dirname(current_dir), "ML_Model", "saved_models")
+        models_dir = get_default_models_dir()
+    
+    return {
+        condition: entry['path']
+        for condition, entry in _read_model_index(models_dir).items()
+    }
+
+def _read_model_index(models_dir, section='conditions'):
+    """
+    Read the condition -> artifact index of a models directory.
+    
+    The manifest is parsed once and cached until its mtime changes, so a
+    lookup costs a single stat. Directories without a manifest fall back to
+    scanning the artifacts on disk.
     
-    models = {}
+    Args:
+        models_dir (str): Directory containing saved models
+        section (str): 'conditions' for per-condition models, 'fused' for
+            the multi-label model
     
-    if os.path.exists(models_dir):
-        model_files = glob.glob(os.path.join(models_dir, "*.joblib"))
+    Returns:
+        dict: Condition code -> manifest entry with the artifact 'path' added
+    """
+    manifest_path = get_manifest_path(models_dir)
+    try:
+        manifest_mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        manifest_mtime = None
+    
+    if manifest_mtime is not None:
+        with _manifest_cache_lock:
+            cached = _manifest_cache.get(models_dir)
+        if cached is not None and cached[0] == manifest_mtime:
+            return cached[1].get(section, {})
         
-        for model_file in model_files:
-            filename = os.path.basename(model_file)
-            # Extract condition name from filename (e.g., "chronic_condition_model_CCC_035_timestamp.joblib")
-            if "chronic_condition_model_" in filename:
-                parts = filename.split("_")
-                if len(parts) >= 5:  # Changed from 4 to 5 to account for CCC_XXX format
-                    condition = f"{parts[3]}_{parts[4]}"  # CCC_035, CCC_065, etc.
-                    
-                    # If multiple models for same condition, keep the most recent
-                    if condition not in models:
-                        models[condition] = model_file
-                    else:
-                        # Compare modification times and keep the newest
-                        current_mtime = os.path.getmtime(model_file)
-                        existing_mtime = os.path.getmtime(models[condition])
-                        if current_mtime > existing_mtime:
-                            models[condition] = model_file
-    
-    return models
+        manifest = read_manifest(models_dir)
+        if manifest is not None:
+            sections = {}
+            for name in ('conditions', 'fused'):
+                index = {}
+                for condition, entry in manifest.get(name, {}).items():
+                    entry = dict(entry)
+                    entry.pop('history', None)
+                    entry['path'] = os.path.join(models_dir, entry['artifact'])
+                    index[condition] = entry
+                sections[name] = index
+            with _manifest_cache_lock:
+                _manifest_cache[models_dir] = (manifest_mtime, sections)
+            return sections.get(section, {})
+    
+    # Legacy directory without a manifest
+    if not os.path.exists(models_dir) or section != 'conditions':
+        return {}
+    return {
+        condition: {'artifact': os.path.basename(paths[0]), 'path': paths[0]}
+        for condition, paths in scan_artifacts(models_dir).items()
+    }
+
+def _locate_bundled_models(models_dir, bundle_path):
+    """
+    Map each condition to the bundle, or to its current .joblib artifact when
+    the bundle was built from an older one.
+    
+    Retraining records a new artifact in the manifest without touching the
+    bundle, so a bundle entry is only served while its source artifact is
+    still the manifest's current one.
+    
+    Returns:
+        dict: Condition code -> bundle path or artifact path
+    """
+    bundled = open_bundle(bundle_path)
+    index = _read_model_index(models_dir)
+    if not index:
+        # Bundle deployed without its artifacts
+        return {condition: bundle_path for condition in bundled}
+    
+    located = {}
+    stale = []
+    for condition, entry in index.items():
+        predictor = bundled.get(condition)
+        source = getattr(predictor, 'source_artifact', None)
+        if predictor is not None and source in (None, entry['artifact']):
+            located[condition] = bundle_path
+        else:
+            located[condition] = entry['path']
+            if predictor is not None:
+                stale.append(condition)
+    
+    stale = tuple(sorted(stale))
+    with _stale_bundles_lock:
+        if _stale_bundles.get(bundle_path, ()) != stale:
+            _stale_bundles[bundle_path] = stale
+            if stale:
+                print(f"Model bundle {bundle_path} is stale for {list(stale)}, "
+                      f"serving their .joblib artifacts until it is rebuilt")
+    return located
+
+def get_model_registry(models_dir=None, fused=False):
+    """
+    Get the process-wide model registry for a models directory.
+    
+    Args:
+        models_dir (str): Directory containing saved models
+        fused (bool): Return the registry of the fused multi-label model
+            instead of the per-condition models
+    
+    Returns:
+        ModelRegistry: Shared registry serving loaded models from memory
+    """
+    models_dir = os.path.abspath(models_dir or get_default_models_dir())
+    
+    with _model_registries_lock:
+        registry = _model_registries.get((models_dir, fused))
+        if registry is None:
+            if fused:
+                registry = ModelRegistry(
+                    locate_models=lambda: {
+                        key: entry['path']
+                        for key, entry in _read_model_index(models_dir, 'fused').items()
+                    },
+                    max_memory_mb=MODEL_CACHE_MAX_MB,
+                    check_interval=MODEL_RELOAD_INTERVAL,
+                    loader=lambda path, condition: MultiConditionServingPredictor.load_from_file(path)
+                )
+            elif MODEL_FORMAT == 'bundle':
+                # Every condition lives in one memory-mapped file, which also
+                # makes the memory cap moot
+                bundle_path = get_bundle_path(models_dir)
+                registry = ModelRegistry(
+                    locate_models=lambda: _locate_bundled_models(models_dir, bundle_path),
+                    check_interval=MODEL_RELOAD_INTERVAL,
+                    loader=lambda path, condition: (
+                        open_bundle(path).get(condition) if path == bundle_path
+                        else ServingPredictor.load_from_file(path)
+                    )
+                )
+            else:
+                registry = ModelRegistry(
+                    locate_models=lambda: get_available_models(models_dir),
+                    max_memory_mb=MODEL_CACHE_MAX_MB,
+                    check_interval=MODEL_RELOAD_INTERVAL
+                )
+            # A new artifact makes every cached prediction and the risk table stale
+            registry.add_listener(lambda condition, path: _prediction_cache.clear())
+            if not fused:
+                registry.add_listener(lambda condition, path: get_risk_table_service(models_dir).invalidate())
+            _model_registries[(models_dir, fused)] = registry
+    
+    return registry
 
 def load_model_for_condition(condition, models_dir=None):
     """
     Load a trained model for a specific chronic condition.
     
+    Models are served from the shared registry, so the artifact is only
+    deserialized the first time it is requested or after it changes on disk.
+    
     Args:
         condition (str): Chronic condition code (e.g., 'CCC_035')
         models_dir (str): Directory containing saved models
     
     Returns:
-        ChronicConditionPredictor: Loaded model instance, or None if not found
+        ServingPredictor: Loaded model instance, or None if not found
     """
-    available_models = get_available_models(models_dir)
+    registry = get_model_registry(models_dir)
+    predictor = registry.get(condition)
     
-    if condition in available_models:
-        model_path = available_models[condition]
-        predictor = ChronicConditionPredictor.load_from_file(model_path, enable_plotting=False)
-        return predictor
-    else:
+    if predictor is None:
         print(f"No trained model found for condition: {condition}")
-        print(f"Available models: {list(available_models.keys())}")
-        return None
+        print(f"Available models: {list(registry.available_models().keys())}")
+    
+    return predictor
 
 def get_model_info(condition, models_dir=None):
     """
@@ -77,24 +253,67 @@ def get_model_info(condition, models_dir=None):
     Returns:
         dict: Model information or None if not found
     """
-    available_models = get_available_models(models_dir)
+    if models_dir is None:
+        models_dir = get_default_models_dir()
+    
+    entry = _read_model_index(models_dir).get(condition)
     
-    if condition in available_models:
-        model_path = available_models[condition]
-        filename = os.path.basename(model_path)
-        file_size = os.path.getsize(model_path)
-        modification_time = os.path.getmtime(model_path)
+    if entry is not None:
+        model_path = entry['path']
+        file_size = entry.get('size_bytes')
+        if file_size is None:
+            file_size = os.path.getsize(model_path)
         
         return {
             'condition': condition,
             'model_path': model_path,
-            'filename': filename,
+            'filename': entry['artifact'],
             'file_size_mb': round(file_size / (1024 * 1024), 2),
-            'last_modified': modification_time
+            'last_modified': os.path.getmtime(model_path),
+            'model_version': entry.get('model_version'),
+            'feature_hash': entry.get('feature_hash'),
+            'training_date': entry.get('training_date')
         }
     
     return None
 
+def _error_result(condition, message):
+    """Build the result dict returned when a condition cannot be scored."""
+    return {
+        'error': message,
+        'condition': condition,
+        'prediction': None,
+        'probability': None,
+        'risk_level': None
+    }
+
+def get_risk_level(probability):
+    """Map a predicted probability to a risk level label."""
+    if probability < 0.2:
+        return 'Low'
+    elif probability < 0.5:
+        return 'Moderate'
+    elif probability < 0.8:
+        return 'High'
+    return 'Very High'
+
+def _build_prediction_result(predictor, condition, probability, threshold=None):
+    """Build the result dict for a successfully scored condition."""
+    probability = float(probability)
+    if threshold is None:
+        threshold = predictor.optimal_threshold
+    
+    return {
+        'condition': condition,
+        'prediction': int(probability >= threshold),  # 0 = No condition, 1 = Has condition
+        'probability': probability,
+        'risk_level': get_risk_level(probability),
+        'threshold': threshold,
+        'model_version': predictor.model_version,
+        'training_date': predictor.training_date,
+        'error': None
+    }
+
 def predict_condition_risk(user_inputs, condition='CCC_035', models_dir=None):
     """
     Make a prediction for a specific chronic condition based on user inputs.
@@ -111,13 +330,7 @@ def predict_condition_risk(user_inputs, condition='CCC_035', models_dir=None):
     predictor = load_model_for_condition(condition, models_dir)
     
     if predictor is None:
-        return {
-            'error': f'No model available for condition {condition}',
-            'condition': condition,
-            'prediction': None,
-            'probability': None,
-            'risk_level': None
-        }
+        return _error_result(condition, f'No model available for condition {condition}')
     
     try:
         # Convert user inputs to proper feature vector
@@ -134,47 +347,149 @@ def predict_condition_risk(user_inputs, condition='CCC_035', models_dir=None):
         predictions, probabilities = predictor.predict_new_sample(aligned_features)
         
         if predictions is None or probabilities is None:
-            return {
-                'error': 'Prediction failed - model returned None',
-                'condition': condition,
-                'prediction': None,
-                'probability': None,
-                'risk_level': None
-            }
-        
-        prediction = int(predictions[0])
-        probability = float(probabilities[0])
+            return _error_result(condition, 'Prediction failed - model returned None')
         
-        # Determine risk level based on probability
-        if probability < 0.2:
-            risk_level = 'Low'
-        elif probability < 0.5:
-            risk_level = 'Moderate'
-        elif probability < 0.8:
-            risk_level = 'High'
-        else:
-            risk_level = 'Very High'
-        
-        return {
-            'condition': condition,
-            'prediction': prediction,  # 0 = No condition, 1 = Has condition
-            'probability': probability,
-            'risk_level': risk_level,
-            'threshold': predictor.optimal_threshold,
-            'model_version': predictor.model_version,
-            'training_date': predictor.training_date,
-            'error': None
-        }
+        return _build_prediction_result(predictor, condition, probabilities[0])
         
     except Exception as e:
         print(f"Prediction error for {condition}: {str(e)}")
+        return _error_result(condition, f'Prediction error: {str(e)}')
+
+def _imputer_signature(imputer, row_has_missing):
+    """
+    Key identifying which imputers transform a given row identically.
+    
+    Rows without missing values pass through every median imputer unchanged,
+    apart from the columns the imputer dropped as all-empty during fit, so
+    only that column mask matters. Rows with gaps depend on the medians.
+    """
+    statistics = imputer.statistics_
+    if row_has_missing:
+        return statistics.tobytes()
+    return (np.isnan(statistics).tobytes(), getattr(imputer, 'keep_empty_features', False))
+
+def get_inference_engine(predictor):
+    """
+    Get the compiled NumPy forest engine for a loaded predictor.
+    
+    Engines are compiled on first use and dropped together with the
+    predictor when the registry evicts or replaces it. Bundled predictors
+    already carry their engine.
+    """
+    engine = getattr(predictor, 'engine', None)
+    if engine is not None:
+        return engine
+    
+    with _inference_engines_lock:
+        engine = _inference_engines.get(predictor)
+    if engine is None:
+        engine = CompiledForest.from_predictor(predictor)
+        with _inference_engines_lock:
+            engine = _inference_engines.setdefault(predictor, engine)
+    return engine
+
+def predict_aligned_rows(predictor, rows, imputed_rows=None):
+    """
+    Positive-class probabilities for feature rows aligned to a model.
+    
+    Uses the backend selected by MEDINATOR_INFERENCE_BACKEND. The sklearn
+    backend imputes the rows first and, when ``imputed_rows`` is given, reuses
+    imputed rows across models whose imputers transform them identically.
+    
+    Args:
+        predictor (ServingPredictor): Loaded predictor
+        rows (numpy.ndarray): Raw rows in predictor.feature_names order
+        imputed_rows (dict): Optional cache shared across models for one request
+    
+    Returns:
+        numpy.ndarray: Probabilities, one row per input row
+    """
+    if INFERENCE_BACKEND == 'compiled' or predictor.imputer is None:
+        return get_inference_engine(predictor).predict_proba(rows)
+    
+    imputed = None
+    if imputed_rows is not None:
+        imputer_key = (tuple(predictor.feature_names),
+                       _imputer_signature(predictor.imputer, bool(np.isnan(rows).any())))
+        imputed = imputed_rows.get(imputer_key)
+    if imputed is None:
+        imputed = np.ascontiguousarray(predictor.imputer.transform(rows), dtype=np.float32)
+        if imputed_rows is not None:
+            imputed_rows[imputer_key] = imputed
+    
+    return predictor.predict_proba_imputed(imputed)
+
+def score_conditions(user_inputs, predictors):
+    """
+    Score several condition models against one user's answers in a single pass.
+    
+    Each distinct feature layout is filled once from the compiled feature
+    template, so models sharing the same feature_names reuse one row, and
+    models whose imputers transform that row identically reuse one imputed,
+    contiguous NumPy row.
+    
+    Args:
+        user_inputs (dict): User's assessment answers
+        predictors (dict): Condition code -> loaded predictor
+    
+    Returns:
+        dict: Condition code -> prediction result
+    """
+    results = {}
+    if not predictors:
+        return results
+    
+    aligned_rows = {}
+    imputed_rows = {}
+    
+    for condition, predictor in predictors.items():
+        try:
+            contract = tuple(predictor.feature_names)
+            row = aligned_rows.get(contract)
+            if row is None:
+                row = build_feature_row(user_inputs, predictor.feature_names)
+                aligned_rows[contract] = row
+            
+            probabilities = predict_aligned_rows(predictor, row, imputed_rows)
+            results[condition] = _build_prediction_result(predictor, condition, probabilities[0])
+            
+        except Exception as e:
+            print(f"Prediction error for {condition}: {str(e)}")
+            results[condition] = _error_result(condition, f'Prediction error: {str(e)}')
+    
+    print(f"Scored {len(predictors)} conditions with {len(aligned_rows)} feature layouts "
+          f"and {len(imputed_rows)} imputed rows ({INFERENCE_BACKEND} backend)")
+    
+    return results
+
+def score_fused_model(user_inputs, predictor):
+    """
+    Score every condition with the fused multi-label model.
+    
+    Args:
+        user_inputs (dict): User's assessment answers
+        predictor (MultiConditionServingPredictor): Loaded multi-label model
+    
+    Returns:
+        dict: Condition code -> prediction result
+    """
+    try:
+        row = build_feature_row(user_inputs, predictor.feature_names)
+        probabilities = predict_aligned_rows(predictor, row)[0]
+    except Exception as e:
+        print(f"Prediction error for fused model: {str(e)}")
         return {
-            'error': f'Prediction error: {str(e)}',
-            'condition': condition,
-            'prediction': None,
-            'probability': None,
-            'risk_level': None
+            condition: _error_result(condition, f'Prediction error: {str(e)}')
+            for condition in predictor.target_columns
         }
+    
+    return {
+        condition: _build_prediction_result(
+            predictor, condition, probabilities[i],
+            threshold=predictor.optimal_thresholds[condition]
+        )
+        for i, condition in enumerate(predictor.target_columns)
+    }
 
 # Condition name mappings for user-friendly display
 CONDITION_NAMES = {
@@ -191,10 +506,136 @@ def get_condition_display_name(condition_code):
     """Get user-friendly name for a condition code."""
     return CONDITION_NAMES.get(condition_code, condition_code)
 
+def get_prediction_cache():
+    """Get the process-wide prediction result cache."""
+    return _prediction_cache
+
+def get_model_fingerprint(models_dir=None):
+    """
+    Describe the model artifacts and serving options currently in use.
+    
+    Artifact file names carry their training timestamp, so a new artifact
+    produces a new fingerprint.
+    """
+    fingerprint = {
+        'serving_model': SERVING_MODEL,
+        'backend': INFERENCE_BACKEND,
+        'format': MODEL_FORMAT,
+        'models': sorted(get_model_registry(models_dir).available_models().items())
+    }
+    if SERVING_MODEL == 'fused':
+        fingerprint['fused'] = sorted(get_model_registry(models_dir, fused=True).available_models().items())
+    return fingerprint
+
+def preload_models_for_fork(conditions=None, models_dir=None):
+    """
+    Load everything a worker serves from, then freeze it out of the garbage
+    collector.
+    
+    Meant to run in a pre-fork master (gunicorn ``preload_app``). Objects that
+    survive ``gc.freeze()`` are never touched by later collections, so the
+    workers keep sharing their pages copy-on-write instead of dirtying them.
+    
+    Args:
+        conditions (list): Conditions to load (default: all available)
+        models_dir (str): Directory containing saved models
+    
+    Returns:
+        dict: Condition code -> loaded predictor
+    """
+    loaded = get_model_registry(models_dir).preload(conditions)
+    
+    if INFERENCE_BACKEND == 'compiled':
+        for predictor in loaded.values():
+            get_inference_engine(predictor)
+    
+    if SERVING_MODEL == 'fused':
+        fused = get_model_registry(models_dir, fused=True).preload()
+        if INFERENCE_BACKEND == 'compiled':
+            for predictor in fused.values():
+                get_inference_engine(predictor)
+    
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded {len(loaded)} models for forking, {gc.get_freeze_count()} objects frozen")
+    return loaded
+
+def build_risk_table_for_models(models_dir=None):
+    """
+    Score the whole answer space against every per-condition model and write
+    the risk table next to the models.
+    
+    Returns:
+        str: Path of the table metadata, or None if no models are available
+    """
+    models_dir = os.path.abspath(models_dir or get_default_models_dir())
+    registry = get_model_registry(models_dir)
+    available = registry.available_models(force=True)
+    fingerprint = artifact_fingerprint(available)
+    predictors = registry.preload(list(available.keys()))
+    
+    if not predictors:
+        return None
+    
+    return build_risk_table(predictors, predict_aligned_rows, models_dir, fingerprint)
+
+def get_risk_table_service(models_dir=None):
+    """Get the process-wide risk table service for a models directory."""
+    models_dir = os.path.abspath(models_dir or get_default_models_dir())
+    
+    with _risk_table_services_lock:
+        service = _risk_table_services.get(models_dir)
+        if service is None:
+            service = RiskTableService(
+                models_dir,
+                # What the registry serves, so a bundle-format table is
+                # fingerprinted by the bundle rather than the .joblib artifacts
+                locate_models=lambda: get_model_registry(models_dir).available_models(),
+                build=lambda: build_risk_table_for_models(models_dir),
+                check_interval=MODEL_RELOAD_INTERVAL
+            )
+            _risk_table_services[models_dir] = service
+    
+    return service
+
+def _lookup_risk_table(user_inputs, models_dir=None):
+    """
+    Serve all condition predictions from the risk table.
+    
+    Returns:
+        dict: Predictions for all conditions, or None to fall back to live inference
+    """
+    try:
+        entries = get_risk_table_service(models_dir).lookup(user_inputs)
+    except Exception as e:
+        print(f"Risk table lookup failed: {e}")
+        return None
+    if entries is None:
+        return None
+    
+    results = {}
+    for condition, (probability, info) in entries.items():
+        results[condition] = {
+            'condition': condition,
+            'prediction': int(probability >= info['threshold']),
+            'probability': probability,
+            'risk_level': get_risk_level(probability),
+            'threshold': info['threshold'],
+            'model_version': info['model_version'],
+            'training_date': info['training_date'],
+            'error': None,
+            'display_name': get_condition_display_name(condition)
+        }
+    return results
+
 def get_all_condition_predictions(user_inputs, models_dir=None):
     """
     Get predictions for all available chronic conditions.
     
+    When enabled, results come straight from the precomputed risk table.
+    Otherwise they are served from the prediction cache when the same
+    canonical answers were already scored with the same model artifacts.
+    
     Args:
         user_inputs (dict or pandas.DataFrame): User's assessment answers
         models_dir (str): Directory containing saved models
@@ -202,12 +643,150 @@ def get_all_condition_predictions(user_inputs, models_dir=None):
     Returns:
         dict: Predictions for all conditions
     """
-    available_models = get_available_models(models_dir)
+    if USE_RISK_TABLE and SERVING_MODEL == 'per_condition' and isinstance(user_inputs, dict):
+        results = _lookup_risk_table(user_inputs, models_dir)
+        if results is not None:
+            return results
+    
+    cache = get_prediction_cache()
+    cache_key = None
+    if cache.enabled and isinstance(user_inputs, dict):
+        try:
+            cache_key = make_prediction_cache_key(user_inputs, get_model_fingerprint(models_dir))
+        except TypeError:
+            cache_key = None
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+    
+    results = _predict_all_conditions(user_inputs, models_dir)
+    
+    if cache_key is not None and results and not any(result.get('error') for result in results.values()):
+        cache.put(cache_key, results)
+    
+    return results
+
+def _predict_all_conditions(user_inputs, models_dir=None):
+    """Score every available condition model, bypassing the prediction cache."""
+    if SERVING_MODEL == 'fused':
+        fused_predictor = get_model_registry(models_dir, fused=True).get(FUSED_MODEL_KEY)
+        if fused_predictor is not None:
+            results = score_fused_model(user_inputs, fused_predictor)
+            for condition, result in results.items():
+                result['display_name'] = get_condition_display_name(condition)
+            return results
+        print("No fused model available, falling back to per-condition models")
+    
+    registry = get_model_registry(models_dir)
+    predictors = {}
     results = {}
     
-    for condition in available_models.keys():
-        result = predict_condition_risk(user_inputs, condition, models_dir)
+    for condition in registry.available_models().keys():
+        predictor = registry.get(condition)
+        if predictor is None:
+            results[condition] = _error_result(condition, f'No model available for condition {condition}')
+        else:
+            predictors[condition] = predictor
+    
+    results.update(score_conditions(user_inputs, predictors))
+    
+    for condition, result in results.items():
         result['display_name'] = get_condition_display_name(condition)
-        results[condition] = result
     
     return results
+
+def build_feature_matrix(user_inputs_list, feature_names):
+    """
+    Build one aligned feature matrix for many users' answers.
+    
+    Args:
+        user_inputs_list (list or pandas.DataFrame): User assessment dicts, or
+            a column-oriented table of answers
+        feature_names (list): Feature order expected by the model
+    
+    Returns:
+        numpy.ndarray: Contiguous matrix with one row per user
+    """
+    return build_feature_rows(user_inputs_list, feature_names)
+
+def get_batch_condition_predictions(user_inputs_list, models_dir=None):
+    """
+    Get predictions for all available chronic conditions for many users.
+    
+    The feature matrix is built once per feature layout and every model is
+    scored with a single predict call over all rows.
+    
+    Args:
+        user_inputs_list (list or pandas.DataFrame): User assessment dicts, or
+            a column-oriented table of answers
+        models_dir (str): Directory containing saved models
+    
+    Returns:
+        list: One dict of condition predictions per input row, in input order
+    """
+    n_rows = len(user_inputs_list)
+    rows = [{} for _ in range(n_rows)]
+    if n_rows == 0:
+        return rows
+    
+    # Column-oriented answers table shared by every feature layout
+    if not isinstance(user_inputs_list, pd.DataFrame):
+        user_inputs_list = pd.DataFrame.from_records(list(user_inputs_list))
+    
+    if SERVING_MODEL == 'fused':
+        fused_predictor = get_model_registry(models_dir, fused=True).get(FUSED_MODEL_KEY)
+        if fused_predictor is not None:
+            try:
+                matrix = build_feature_matrix(user_inputs_list, fused_predictor.feature_names)
+                probabilities = predict_aligned_rows(fused_predictor, matrix)
+                for i, condition in enumerate(fused_predictor.target_columns):
+                    threshold = fused_predictor.optimal_thresholds[condition]
+                    for row_index in range(n_rows):
+                        result = _build_prediction_result(
+                            fused_predictor, condition, probabilities[row_index, i], threshold=threshold
+                        )
+                        result['display_name'] = get_condition_display_name(condition)
+                        rows[row_index][condition] = result
+                return rows
+            except Exception as e:
+                print(f"Batch prediction error for fused model: {str(e)}")
+        else:
+            print("No fused model available, falling back to per-condition models")
+    
+    registry = get_model_registry(models_dir)
+    matrices = {}
+    imputed_matrices = {}
+    
+    for condition in registry.available_models().keys():
+        display_name = get_condition_display_name(condition)
+        predictor = registry.get(condition)
+        
+        if predictor is None:
+            probabilities = None
+            error = f'No model available for condition {condition}'
+        else:
+            try:
+                contract = tuple(predictor.feature_names)
+                matrix = matrices.get(contract)
+                if matrix is None:
+                    matrix = build_feature_matrix(user_inputs_list, predictor.feature_names)
+                    matrices[contract] = matrix
+                probabilities = predict_aligned_rows(predictor, matrix, imputed_matrices)
+                error = None
+            except Exception as e:
+                print(f"Batch prediction error for {condition}: {str(e)}")
+                probabilities = None
+                error = f'Prediction error: {str(e)}'
+        
+        for row_index in range(n_rows):
+            if probabilities is None:
+                result = _error_result(condition, error)
+            else:
+                result = _build_prediction_result(predictor, condition, probabilities[row_index])
+            result['display_name'] = display_name
+            rows[row_index][condition] = result
+    
+    print(f"Batch scored {n_rows} rows with {len(matrices)} feature layouts ({INFERENCE_BACKEND} backend)")
+    
+    return rows
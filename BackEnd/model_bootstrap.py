@@ -0,0 +1,140 @@
+"""
+Background model bootstrap for the API server.
+
+Training every chronic condition model takes minutes, so the server must not
+do it while importing. ModelBootstrap runs in a worker thread: it trains the
+conditions that have no artifact yet, loads the models the service needs and
+records per-condition progress for the readiness endpoint.
+"""
+
+import threading
+from datetime import datetime
+
+PENDING = 'pending'
+TRAINING = 'training'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ModelBootstrap:
+    """
+    Trains missing models and preloads the serving models off the request path.
+
+    Phases: 'idle' -> 'checking' -> ('training') -> 'loading' -> 'ready', or
+    'failed' when no required model could be made available.
+    """
+
+    def __init__(self, locate_models, train_models, load_models,
+                 required_conditions=None, train_missing=True):
+        """
+        Args:
+            locate_models (callable): Returns condition -> artifact path
+            train_models (callable): ``train_models(conditions, progress)``
+                trains the given conditions (None for all) and reports
+                ``progress(condition, status, error)``
+            load_models (callable): ``load_models(conditions)`` loads the
+                models into memory and returns condition -> predictor
+            required_conditions (list): Conditions that must be loaded before
+                the service is ready; defaults to every available condition
+            train_missing (bool): Train models that have no artifact yet
+        """
+        self._locate_models = locate_models
+        self._train_models = train_models
+        self._load_models = load_models
+        self.required_conditions = list(required_conditions) if required_conditions else None
+        self.train_missing = train_missing
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self.phase = 'idle'
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._conditions = {}
+        self._loaded = set()
+
+    def start(self):
+        """Start the worker thread once; returns immediately."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = datetime.now().isoformat()
+            self._thread = threading.Thread(target=self.run, name="model-bootstrap", daemon=True)
+        self._thread.start()
+
+    def _set_condition(self, condition, status, error=None):
+        with self._lock:
+            self._conditions[condition] = {
+                'status': status,
+                'error': error,
+                'updated_at': datetime.now().isoformat()
+            }
+
+    def _set_phase(self, phase, error=None):
+        with self._lock:
+            self.phase = phase
+            self.error = error
+            if phase in ('ready', 'failed'):
+                self.finished_at = datetime.now().isoformat()
+
+    def run(self):
+        """Train and load synchronously, e.g. in a pre-fork master."""
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = datetime.now().isoformat()
+        try:
+            self._set_phase('checking')
+            available = self._locate_models()
+            for condition in available:
+                self._set_condition(condition, DONE)
+
+            if self.required_conditions is not None:
+                missing = [c for c in self.required_conditions if c not in available]
+            else:
+                # Without an explicit list, only an empty models directory needs training
+                missing = None if not available else []
+
+            if missing is None or missing:
+                if self.train_missing:
+                    self._set_phase('training')
+                    print(f"Training models: {missing or 'all conditions'}")
+                    self._train_models(missing, self._set_condition)
+                    available = self._locate_models()
+                elif missing:
+                    for condition in missing:
+                        self._set_condition(condition, FAILED, 'No trained model and training is disabled')
+
+            required = self.required_conditions if self.required_conditions is not None else list(available)
+            self._set_phase('loading')
+            loaded = self._load_models([c for c in required if c in available])
+            with self._lock:
+                self._loaded = set(loaded)
+
+            missing_required = [c for c in required if c not in loaded]
+            if not required or missing_required:
+                self._set_phase('failed', f"Models not available: {missing_required or 'none trained'}")
+                print(f"Model bootstrap failed: {self.error}")
+            else:
+                self._set_phase('ready')
+                print(f"Model bootstrap complete: {len(loaded)} models loaded")
+        except Exception as e:
+            self._set_phase('failed', str(e))
+            print(f"Model bootstrap failed: {e}")
+
+    def is_ready(self):
+        with self._lock:
+            return self.phase == 'ready'
+
+    def status(self):
+        """Phase, timestamps and per-condition training progress."""
+        with self._lock:
+            return {
+                'phase': self.phase,
+                'ready': self.phase == 'ready',
+                'error': self.error,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'required_conditions': self.required_conditions,
+                'loaded_conditions': sorted(self._loaded),
+                'conditions': {c: dict(info) for c, info in sorted(self._conditions.items())}
+            }
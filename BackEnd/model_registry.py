@@ -0,0 +1,277 @@
+"""
+Process-wide registry of loaded chronic condition models.
+
+Keeps each condition's predictor in memory between requests, swaps in newer
+artifacts from the models directory when their modification time changes and
+evicts the least recently used conditions when a memory cap is configured.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from ML_Model.serving import ServingPredictor
+
+
+def estimate_predictor_bytes(predictor):
+    """
+    Approximate the in-memory size of a loaded predictor.
+
+    Only the tree node and value arrays are counted, they dominate the
+    footprint of a fitted random forest by several orders of magnitude.
+    Bundled predictors have no sklearn model, their compiled engine's arrays
+    are counted instead.
+
+    Args:
+        predictor (ServingPredictor): Loaded predictor
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    model = getattr(predictor, 'model', None)
+    total = 0
+    for estimator in getattr(model, 'estimators_', []) or []:
+        tree = getattr(estimator, 'tree_', None)
+        if tree is None:
+            continue
+        state = tree.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    if not total:
+        engine = getattr(predictor, 'engine', None)
+        total = int(getattr(engine, 'nbytes', 0) or 0)
+    return total
+
+
+class _RegistryEntry:
+    """A loaded predictor together with the artifact it came from."""
+
+    __slots__ = ('predictor', 'path', 'mtime', 'size_bytes', 'checked_at')
+
+    def __init__(self, predictor, path, mtime, size_bytes, checked_at):
+        self.predictor = predictor
+        self.path = path
+        self.mtime = mtime
+        self.size_bytes = size_bytes
+        self.checked_at = checked_at
+
+
+class ModelRegistry:
+    """
+    Thread-safe, in-memory cache of condition predictors.
+
+    Lookups that hit a fresh entry only take a short lock. When an entry is
+    older than ``check_interval`` seconds the registry re-resolves the newest
+    artifact and compares modification times; a changed artifact is loaded
+    outside the lock and swapped in atomically, so requests that already hold
+    the previous predictor keep using it undisturbed.
+    """
+
+    def __init__(self, locate_models, max_memory_mb=None, check_interval=2.0,
+                 loader=None):
+        """
+        Args:
+            locate_models (callable): Returns a dict mapping condition codes
+                to artifact paths (e.g. ``ml_utils.get_available_models``)
+            max_memory_mb (float): Memory cap for loaded models; ``None`` or
+                0 disables eviction
+            check_interval (float): Seconds between artifact freshness checks
+            loader (callable): ``loader(path, condition)`` loads a predictor,
+                defaults to ``ServingPredictor.load_from_file(path)``
+        """
+        self._locate_models = locate_models
+        self._max_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else 0
+        self._check_interval = check_interval
+        self._loader = loader or (lambda path, condition: ServingPredictor.load_from_file(path))
+
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._entries = OrderedDict()
+        self._available = {}
+        self._available_checked_at = None
+        self._listeners = []
+        self._last_artifacts = {}
+
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def available_models(self, force=False):
+        """
+        Return the condition -> artifact path mapping, rescanning at most once
+        per ``check_interval``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if (not force and self._available_checked_at is not None
+                    and now - self._available_checked_at < self._check_interval):
+                return dict(self._available)
+
+        available = self._locate_models()
+
+        with self._lock:
+            self._available = dict(available)
+            self._available_checked_at = now
+            # A condition dropped from the index must not keep serving its cached predictor
+            removed = [c for c in set(self._entries) | set(self._last_artifacts) if c not in available]
+            for condition in removed:
+                self._entries.pop(condition, None)
+                self._last_artifacts.pop(condition, None)
+            listeners = list(self._listeners)
+
+        for condition in removed:
+            print(f"Model registry dropped {condition}, it is no longer in the models index")
+            self._notify(listeners, condition, None)
+        return dict(available)
+
+    def get(self, condition):
+        """
+        Get the predictor for a condition, loading or reloading it if needed.
+
+        Args:
+            condition (str): Chronic condition code (e.g., 'CCC_035')
+
+        Returns:
+            ServingPredictor: Loaded predictor, or None if no
+            artifact exists for the condition
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(condition)
+            if entry is not None and now - entry.checked_at < self._check_interval:
+                self._entries.move_to_end(condition)
+                self.hits += 1
+                return entry.predictor
+
+        path = self.available_models().get(condition)
+        if path is None:
+            return None
+
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            # Artifact vanished between the scan and the stat, keep serving
+            # whatever we already have and pick the change up next time
+            return entry.predictor if entry is not None else None
+
+        with self._lock:
+            entry = self._entries.get(condition)
+            if entry is not None and entry.path == path and entry.mtime == mtime:
+                entry.checked_at = now
+                self._entries.move_to_end(condition)
+                self.hits += 1
+                return entry.predictor
+            load_lock = self._load_locks.setdefault(condition, threading.Lock())
+
+        # Only one thread loads a given condition, the others wait for it and
+        # then pick up the freshly registered entry
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(condition)
+                if entry is not None and entry.path == path and entry.mtime == mtime:
+                    entry.checked_at = time.monotonic()
+                    self._entries.move_to_end(condition)
+                    self.hits += 1
+                    return entry.predictor
+
+            predictor = self._loader(path, condition)
+            if predictor is None:
+                return entry.predictor if entry is not None else None
+
+            new_entry = _RegistryEntry(
+                predictor, path, mtime,
+                estimate_predictor_bytes(predictor), time.monotonic()
+            )
+            with self._lock:
+                if condition in self._entries:
+                    self.reloads += 1
+                self._entries[condition] = new_entry
+                self._entries.move_to_end(condition)
+                self.loads += 1
+                self._evict_locked(keep=condition)
+                previous_artifact = self._last_artifacts.get(condition)
+                self._last_artifacts[condition] = (path, mtime)
+                listeners = list(self._listeners)
+
+            # Reloading an evicted model from the same artifact changes nothing
+            if previous_artifact is not None and previous_artifact != (path, mtime):
+                self._notify(listeners, condition, path)
+
+        return predictor
+
+    def _notify(self, listeners, condition, path):
+        for listener in listeners:
+            try:
+                listener(condition, path)
+            except Exception as e:
+                print(f"Model registry listener failed for {condition}: {e}")
+
+    def add_listener(self, callback):
+        """
+        Register ``callback(condition, path)`` to run whenever a condition is
+        served from a different artifact than before, or with ``path=None``
+        once it disappears from the models index.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def preload(self, conditions=None):
+        """
+        Load every available (or the given) condition model into memory.
+
+        Returns:
+            dict: Mapping of condition codes to loaded predictors
+        """
+        if conditions is None:
+            conditions = list(self.available_models(force=True).keys())
+        loaded = {}
+        for condition in conditions:
+            predictor = self.get(condition)
+            if predictor is not None:
+                loaded[condition] = predictor
+        return loaded
+
+    def evict(self, condition):
+        """Drop a condition from memory. Returns True if it was loaded."""
+        with self._lock:
+            return self._entries.pop(condition, None) is not None
+
+    def clear(self):
+        """Drop every loaded model and forget the last directory scan."""
+        with self._lock:
+            self._entries.clear()
+            self._available = {}
+            self._available_checked_at = None
+
+    def _evict_locked(self, keep=None):
+        if not self._max_bytes:
+            return
+        total = sum(entry.size_bytes for entry in self._entries.values())
+        for condition in list(self._entries.keys()):
+            if total <= self._max_bytes:
+                break
+            if condition == keep:
+                continue
+            total -= self._entries.pop(condition).size_bytes
+            self.evictions += 1
+            print(f"Model registry evicted {condition} (memory cap {self._max_bytes / (1024 * 1024):.0f} MB)")
+
+    def stats(self):
+        """Return counters and the currently loaded models."""
+        with self._lock:
+            return {
+                'loaded_models': {
+                    condition: {
+                        'path': entry.path,
+                        'size_mb': round(entry.size_bytes / (1024 * 1024), 2)
+                    }
+                    for condition, entry in self._entries.items()
+                },
+                'total_size_mb': round(sum(e.size_bytes for e in self._entries.values()) / (1024 * 1024), 2),
+                'max_memory_mb': round(self._max_bytes / (1024 * 1024), 2) if self._max_bytes else None,
+                'hits': self.hits,
+                'loads': self.loads,
+                'reloads': self.reloads,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,117 @@
+"""
+In-memory cache of multi-condition prediction results.
+
+Assessment answers come from a small closed set of options, so many users
+submit identical profiles. Results are cached under a canonical key built from
+the fields that actually reach the feature vector plus the model artifacts in
+use, with LRU and TTL eviction.
+"""
+
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from feature_mapping import canonical_answer_key
+
+
+def make_prediction_cache_key(user_inputs, model_fingerprint):
+    """
+    Build the cache key for one user's answers.
+
+    Args:
+        user_inputs (dict): User's assessment answers
+        model_fingerprint: JSON-serialisable description of the models in use
+
+    Returns:
+        str: Hex digest identifying the (answers, models) pair
+    """
+    payload = json.dumps(
+        {'answers': canonical_answer_key(user_inputs), 'models': model_fingerprint},
+        sort_keys=True, default=str, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600):
+        """
+        Args:
+            max_entries (int): Maximum cached results, 0 disables the cache
+            ttl_seconds (float): Seconds a result stays valid, 0 for no expiry
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers add fields to the result dicts, never hand out the cached copy
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """Store a result, evicting the least recently used entries if full."""
+        if not self.enabled:
+            return
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result, e.g. after a model artifact changed."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,206 @@
+"""
+Compact, token-budgeted prompt pieces for the Gemini calls.
+
+The prompts used to embed the predictions as indented JSON, with model
+versions and training dates included, and the whole per-condition
+conversation, so their size grew with every turn. This module encodes
+predictions one line per condition, counts tokens locally, and keeps only the
+most recent turns verbatim. Older turns are folded into a running summary,
+so prompt size stays flat however long a session runs.
+"""
+
+import os
+import re
+import math
+import threading
+
+# Verbatim conversation allowed in one prompt before older turns are summarised
+HISTORY_TOKEN_BUDGET = int(os.getenv('MEDINATOR_PROMPT_HISTORY_TOKENS', '300'))
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """
+    Estimate the tokens in a prompt without calling the API.
+
+    Gemini's tokenizer averages about four characters per token on English
+    text; words and punctuation give a floor for short, dense strings.
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), math.ceil(len(_WORD_RE.findall(text)) * 0.75))
+
+
+def encode_predictions(diagnosis_data):
+    """
+    One line per condition instead of indented JSON.
+
+    Args:
+        diagnosis_data (dict): Condition -> prediction dict from ml_utils, or
+            condition -> risk label for the mock predictions
+
+    Returns:
+        str: e.g. "- Type 2 Diabetes: 34% (Moderate), flagged"
+    """
+    if not isinstance(diagnosis_data, dict) or not diagnosis_data:
+        return "- none"
+    return "\n".join(f"- {encode_prediction(condition, data)}" for condition, data in diagnosis_data.items())
+
+
+def encode_prediction(condition, data):
+    """One condition's prediction, e.g. "Type 2 Diabetes: 34% (Moderate)"."""
+    if isinstance(data, dict):
+        name = data.get('display_name') or condition
+        probability = data.get('probability', data.get('risk_probability'))
+        if data.get('error') or probability is None:
+            return f"{name}: unavailable"
+        line = f"{name}: {float(probability):.0%}"
+        if data.get('risk_level'):
+            line += f" ({data['risk_level']})"
+        if data.get('prediction'):
+            line += ", flagged"
+        return line
+    return f"{condition}: {data}"
+
+
+def encode_turn(turn):
+    """One question and answer, e.g. "Q: ... A: ..."."""
+    answer = turn.answer
+    return f"Q: {turn.question} A: {answer if answer is not None else '(awaiting answer)'}"
+
+
+def _answer_kind(answer):
+    text = str(answer or '').lower()
+    if 'not sure' in text or 'unsure' in text:
+        return 'unsure'
+    if text.startswith('no') or 'never' in text or 'not at all' in text or 'not really' in text:
+        return 'no'
+    if any(word in text for word in ('sometimes', 'rarely', 'occasionally', 'moderately', 'a little', 'seldom')):
+        return 'some'
+    if text:
+        return 'yes'
+    return 'unanswered'
+
+
+class ConversationSummary:
+    """
+    Running summary of the turns folded out of the verbatim history.
+
+    Keeps per-condition answer counts and the few most recent clearly
+    positive answers, so its size is bounded by the number of conditions.
+    """
+
+    MAX_NOTABLE = 3
+
+    __slots__ = ('folded', 'counts', 'notable')
+
+    def __init__(self):
+        self.folded = 0
+        self.counts = {}
+        self.notable = []
+
+    def add(self, turn):
+        condition = turn.condition or 'general'
+        kinds = self.counts.setdefault(condition, {})
+        kind = _answer_kind(turn.answer)
+        kinds[kind] = kinds.get(kind, 0) + 1
+        if kind == 'yes':
+            self.notable.append(f"{turn.question[:80]} -> {turn.answer}")
+            del self.notable[:-self.MAX_NOTABLE]
+        self.folded += 1
+
+    def copy(self):
+        """An independent copy, to fold turns into without touching this summary."""
+        clone = ConversationSummary()
+        clone.folded = self.folded
+        clone.counts = {condition: dict(kinds) for condition, kinds in self.counts.items()}
+        clone.notable = list(self.notable)
+        return clone
+
+    def render(self):
+        if not self.folded:
+            return ""
+        parts = []
+        for condition, kinds in self.counts.items():
+            total = sum(kinds.values())
+            detail = ", ".join(f"{n} {kind}" for kind, n in sorted(kinds.items()))
+            parts.append(f"{condition} {total} answers ({detail})")
+        text = f"Earlier ({self.folded} answers): " + "; ".join(parts)
+        if self.notable:
+            text += "\nEarlier positive answers: " + " | ".join(self.notable)
+        return text
+
+
+def build_history(turns, summary, budget_tokens=HISTORY_TOKEN_BUDGET, last=None):
+    """
+    Render a conversation within a token budget.
+
+    The oldest turns that do not fit are folded into ``summary``, which
+    callers keep between turns so each turn is folded only once.
+
+    Args:
+        turns (list): Turn records in order, with question, answer and
+            condition attributes
+        summary (ConversationSummary): Running summary for this conversation
+        budget_tokens (int): Token budget for the verbatim turns
+        last (Turn): Rendered in place of the final turn, e.g. with a
+            speculative answer
+
+    Returns:
+        str: Summary of older turns followed by the recent turns, or an
+        empty string when there is no history
+    """
+    # Turns already folded on an earlier call are never rendered again
+    recent = turns[summary.folded:]
+    if last is not None and recent:
+        recent[-1] = last
+    lines = [encode_turn(turn) for turn in recent]
+    sizes = [count_tokens(line) for line in lines]
+    total = sum(sizes)
+
+    # Always keep the latest turn, fold from the front until the rest fits
+    fold = 0
+    while total > budget_tokens and fold < len(lines) - 1:
+        total -= sizes[fold]
+        fold += 1
+    for turn in recent[:fold]:
+        summary.add(turn)
+
+    parts = [summary.render()] if summary.folded else []
+    parts.extend(lines[fold:])
+    return "\n".join(parts)
+
+
+class PromptStats:
+    """Token counts of the prompts sent, per prompt kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def record(self, kind, prompt):
+        """Count a prompt's tokens and return the prompt unchanged."""
+        tokens = count_tokens(prompt)
+        with self._lock:
+            entry = self._kinds.setdefault(kind, {'prompts': 0, 'tokens': 0, 'max_tokens': 0, 'last_tokens': 0})
+            entry['prompts'] += 1
+            entry['tokens'] += tokens
+            entry['max_tokens'] = max(entry['max_tokens'], tokens)
+            entry['last_tokens'] = tokens
+        return prompt
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {
+                    'prompts': entry['prompts'],
+                    'avg_tokens': round(entry['tokens'] / entry['prompts'], 1),
+                    'max_tokens': entry['max_tokens'],
+                    'last_tokens': entry['last_tokens']
+                }
+                for kind, entry in self._kinds.items()
+            }
+
+
+prompt_stats = PromptStats()
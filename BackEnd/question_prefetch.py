@@ -0,0 +1,166 @@
+"""
+Speculative prefetch of the next detective question.
+
+While the user reads a question, the follow-up question for the most likely
+answers is generated in the background. When the real answer matches one of
+them, the prefetched text is served instead of a fresh Gemini call; the other
+speculative calls are cancelled if they have not started yet, or counted as
+wasted once they finish.
+"""
+
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class PrefetchedQuestions:
+    """The speculative calls made for one question, keyed by answer."""
+
+    __slots__ = ('futures',)
+
+    def __init__(self, futures):
+        self.futures = futures
+
+
+class QuestionPrefetcher:
+    """Runs speculative question generations on a bounded pool."""
+
+    def __init__(self, generate, fan_out=2, budget=8):
+        """
+        Args:
+            generate (callable): ``generate(prompt)`` returns the response text
+            fan_out (int): Answers speculated on per question
+            budget (int): Speculative calls allowed in flight across all sessions
+        """
+        self._generate = generate
+        self.fan_out = fan_out
+        self.budget = budget
+        self._executor = ThreadPoolExecutor(max_workers=max(budget, 1), thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._answer_counts = Counter()
+
+        self.started = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.wasted = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    def likely_answers(self, options):
+        """Options ordered by how often users picked them, then by position."""
+        with self._lock:
+            counts = dict(self._answer_counts)
+        ranked = sorted(enumerate(options), key=lambda item: (-counts.get(item[1], 0), item[0]))
+        return [option for _, option in ranked[:self.fan_out]]
+
+    def start(self, options, build_prompt):
+        """
+        Speculate on the most likely answers to a question.
+
+        Args:
+            options (list): Answer options shown to the user
+            build_prompt (callable): ``build_prompt(answer)`` returns the prompt
+                for the next question if the user answers ``answer``
+
+        Returns:
+            PrefetchedQuestions: Pass to ``claim`` with the real answer
+        """
+        futures = {}
+        for answer in self.likely_answers(options):
+            with self._lock:
+                if self._in_flight >= self.budget:
+                    self.skipped += 1
+                    continue
+                self._in_flight += 1
+                self.started += 1
+            future = self._executor.submit(self._generate, build_prompt(answer))
+            future.add_done_callback(self._finished)
+            futures[answer] = future
+        return PrefetchedQuestions(futures)
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and future.exception() is not None:
+                self.failed += 1
+
+    def _count_wasted(self, future):
+        if not future.cancelled():
+            with self._lock:
+                self.wasted += 1
+
+    def claim(self, prefetched, answer, timeout=None):
+        """
+        Take the prefetched response for the real answer and drop the rest.
+
+        Args:
+            prefetched (PrefetchedQuestions): Returned by ``start``
+            answer (str): The user's real answer
+            timeout (float): Seconds to wait for a call still running, None to
+                wait until it ends
+
+        Returns:
+            str: Response text, or None when the answer was not speculated on,
+            its call failed or it did not finish within ``timeout``
+        """
+        with self._lock:
+            self._answer_counts[answer] += 1
+
+        future = prefetched.futures.pop(answer, None)
+        self.discard(prefetched)
+        if future is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # A call still running is closer to done than a new one
+            text = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            print(f"Prefetched question not ready within {timeout}s")
+            future.add_done_callback(self._count_wasted)
+            with self._lock:
+                self.timeouts += 1
+                self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Prefetched question failed: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def discard(self, prefetched):
+        """Cancel speculative calls that are no longer needed."""
+        futures = list(prefetched.futures.values())
+        prefetched.futures.clear()
+        for future in futures:
+            if future.cancel():
+                with self._lock:
+                    self.cancelled += 1
+            else:
+                future.add_done_callback(self._count_wasted)
+
+    def stats(self):
+        with self._lock:
+            claims = self.hits + self.misses
+            return {
+                'fan_out': self.fan_out,
+                'budget': self.budget,
+                'in_flight': self._in_flight,
+                'started': self.started,
+                'skipped_over_budget': self.skipped,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / claims, 4) if claims else None,
+                'cancelled': self.cancelled,
+                'wasted_calls': self.wasted,
+                'failed': self.failed,
+                'timeouts': self.timeouts
+            }
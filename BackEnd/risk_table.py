@@ -0,0 +1,478 @@
+"""
+Precomputed risk table over the finite assessment answer space.
+
+The ML path only depends on the discrete options of the assessment questions
+and the capped age (PAA_045 = min(45, age)). Answers that produce the same
+feature values are merged, every remaining combination is encoded as a
+mixed-radix integer, and the probabilities of every condition model are
+scored offline into a memory-mapped table. Serving a prediction is then a
+single row lookup with no sklearn in the request path.
+
+Build the table for the default models directory with:
+
+    python risk_table.py
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, single worker assumed
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from feature_mapping import (ANSWER_FEATURES, CONSTANT_FEATURES, AGE_CAP, DEFAULT_AGE, coerce_age,
+                             get_feature_template)
+
+RISK_TABLE_DIRNAME = "risk_table"
+RISK_TABLE_META = "risk_table.json"
+# Held by the one process building the table; the others wait and then map it
+RISK_TABLE_BUILD_LOCK = ".build.lock"
+RISK_TABLE_FORMAT_VERSION = 1
+# Rows scored per predict call while building the table
+BUILD_CHUNK_SIZE = 50000
+
+
+class AnswerSpace:
+    """
+    Mixed-radix encoding of every distinct feature-relevant answer profile.
+
+    Each question contributes one digit whose radix is the number of distinct
+    feature tuples its options produce (unrecognised answers share the digit
+    of the defaults). The capped age contributes the last digit.
+    """
+
+    def __init__(self):
+        slots_by_field = {}
+        for feature, field, mapping, default in ANSWER_FEATURES:
+            slots_by_field.setdefault(field, []).append((mapping, default))
+
+        self.fields = list(slots_by_field.keys())
+        self.answer_digits = {}
+        self.default_digits = {}
+        self.representatives = {}
+
+        for field, slots in slots_by_field.items():
+            options = []
+            for mapping, _ in slots:
+                options.extend(answer for answer in mapping if answer not in options)
+
+            tuples = {}
+            representatives = []
+            digits = {}
+            # None stands for a missing or unrecognised answer
+            for answer in [None] + options:
+                values = tuple(mapping.get(answer, default) for mapping, default in slots)
+                if values not in tuples:
+                    tuples[values] = len(representatives)
+                    representatives.append(answer)
+                digits[answer] = tuples[values]
+
+            self.default_digits[field] = digits.pop(None)
+            self.answer_digits[field] = digits
+            self.representatives[field] = representatives
+
+        self.radices = [len(self.representatives[field]) for field in self.fields] + [AGE_CAP + 1]
+        self.size = int(np.prod(self.radices, dtype=np.int64))
+
+    def signature(self):
+        """Hash of everything that decides how answers map to table rows."""
+        payload = json.dumps({
+            'answer_features': [
+                (feature, field, sorted(mapping.items()), default)
+                for feature, field, mapping, default in ANSWER_FEATURES
+            ],
+            'constant_features': sorted(CONSTANT_FEATURES.items()),
+            'age_cap': AGE_CAP,
+            'radices': self.radices
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def encode(self, user_data):
+        """
+        Encode one user's answers as a table row index.
+
+        Returns:
+            int: Row index, or None if the answers fall outside the table
+            (e.g. a non-integer or negative age)
+        """
+        code = 0
+        for field, radix in zip(self.fields, self.radices):
+            answer = user_data.get(field, '')
+            digit = self.answer_digits[field].get(answer) if isinstance(answer, str) else None
+            if digit is None:
+                digit = self.default_digits[field]
+            code = code * radix + digit
+
+        # Coerced like the feature row, so a table hit equals a model call
+        age = coerce_age(user_data.get('age', DEFAULT_AGE))
+        if age < 0 or age != int(age):
+            return None
+        return code * self.radices[-1] + int(age)
+
+    def decode_range(self, start, stop):
+        """
+        Representative answers for a range of row indices.
+
+        Returns:
+            pandas.DataFrame: Column-oriented answers, one row per code
+        """
+        codes = np.arange(start, stop, dtype=np.int64)
+        digits = np.unravel_index(codes, self.radices)
+
+        columns = {}
+        for field, field_digits in zip(self.fields, digits[:-1]):
+            options = np.array(
+                [answer if answer is not None else '' for answer in self.representatives[field]],
+                dtype=object
+            )
+            columns[field] = options[field_digits]
+        columns['age'] = digits[-1]
+        return pd.DataFrame(columns)
+
+
+def artifact_fingerprint(available_models):
+    """
+    Fingerprint of the artifacts a table was built from.
+
+    Conditions served from a model bundle all map to the bundle file, so
+    rebuilding the bundle changes the fingerprint through its mtime.
+
+    Args:
+        available_models (dict): Condition code -> artifact path
+
+    Returns:
+        list: Sorted [condition, artifact file name, mtime_ns] triples
+    """
+    fingerprint = []
+    for condition, path in sorted(available_models.items()):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        fingerprint.append([condition, os.path.basename(path), mtime])
+    return fingerprint
+
+
+def get_risk_table_dir(models_dir):
+    return os.path.join(models_dir, RISK_TABLE_DIRNAME)
+
+
+@contextlib.contextmanager
+def risk_table_build_lock(models_dir):
+    """
+    Exclusive lock over building a models directory's risk table.
+
+    Every worker of a pre-forked server notices a stale table at about the
+    same time; the lock lets one of them build it while the rest wait.
+    """
+    table_dir = get_risk_table_dir(models_dir)
+    os.makedirs(table_dir, exist_ok=True)
+    with open(os.path.join(table_dir, RISK_TABLE_BUILD_LOCK), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def build_risk_table(predictors, score_rows, models_dir, fingerprint):
+    """
+    Score the whole answer space against every condition model and write
+    the memory-mappable table.
+
+    Args:
+        predictors (dict): Condition code -> loaded predictor
+        score_rows (callable): ``score_rows(predictor, matrix)`` returning
+            positive-class probabilities for aligned raw feature rows
+        models_dir (str): Models directory; the table goes in its
+            ``risk_table`` subdirectory
+        fingerprint (list): artifact_fingerprint() of the predictors' artifacts
+
+    Returns:
+        str: Path of the written metadata file
+    """
+    space = AnswerSpace()
+    conditions = sorted(predictors.keys())
+    table_dir = get_risk_table_dir(models_dir)
+    os.makedirs(table_dir, exist_ok=True)
+
+    print(f"Building risk table: {space.size} answer profiles x {len(conditions)} conditions")
+    started = datetime.now()
+
+    table_id = hashlib.sha256(json.dumps([space.signature(), fingerprint]).encode('utf-8')).hexdigest()[:16]
+    table_name = f"risk_table_{table_id}.npy"
+    fd, tmp_table = tempfile.mkstemp(prefix=".risk_table_", suffix=".npy", dir=table_dir)
+    os.close(fd)
+
+    try:
+        table = np.lib.format.open_memmap(
+            tmp_table, mode='w+', dtype=np.float32, shape=(space.size, len(conditions))
+        )
+        for start in range(0, space.size, BUILD_CHUNK_SIZE):
+            stop = min(start + BUILD_CHUNK_SIZE, space.size)
+            answers = space.decode_range(start, stop)
+            matrices = {}
+            for column, condition in enumerate(conditions):
+                predictor = predictors[condition]
+                contract = tuple(predictor.feature_names)
+                matrix = matrices.get(contract)
+                if matrix is None:
+                    matrix = get_feature_template(contract).build_matrix(answers)
+                    matrices[contract] = matrix
+                table[start:stop, column] = score_rows(predictor, matrix)
+        table.flush()
+        del table
+        os.replace(tmp_table, os.path.join(table_dir, table_name))
+    except Exception:
+        if os.path.exists(tmp_table):
+            os.remove(tmp_table)
+        raise
+
+    meta = {
+        'format_version': RISK_TABLE_FORMAT_VERSION,
+        'table': table_name,
+        'space_signature': space.signature(),
+        'radices': space.radices,
+        'fingerprint': fingerprint,
+        'conditions': [
+            {
+                'condition': condition,
+                'threshold': float(predictors[condition].optimal_threshold),
+                'model_version': predictors[condition].model_version,
+                'training_date': predictors[condition].training_date
+            }
+            for condition in conditions
+        ],
+        'built_at': datetime.now().isoformat()
+    }
+    meta_path = os.path.join(table_dir, RISK_TABLE_META)
+    fd, tmp_meta = tempfile.mkstemp(prefix=".risk_table_", suffix=".json", dir=table_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+    # Readers that still map an older table keep their pages until they swap
+    for filename in os.listdir(table_dir):
+        if filename.startswith("risk_table_") and filename.endswith(".npy") and filename != table_name:
+            try:
+                os.remove(os.path.join(table_dir, filename))
+            except OSError:
+                pass
+
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"Risk table written to {table_dir} ({space.size * len(conditions) * 4 / (1024 * 1024):.1f} MB, {elapsed:.1f}s)")
+    return meta_path
+
+
+class RiskTable:
+    """A loaded, memory-mapped risk table."""
+
+    def __init__(self, meta, table, space):
+        self.meta = meta
+        self.table = table
+        self.space = space
+        self.fingerprint = meta['fingerprint']
+        self.conditions = meta['conditions']
+
+    @classmethod
+    def load(cls, models_dir):
+        """
+        Open the risk table of a models directory.
+
+        Returns:
+            RiskTable: Loaded table, or None if it is missing or was built
+            for a different answer space
+        """
+        table_dir = get_risk_table_dir(models_dir)
+        try:
+            with open(os.path.join(table_dir, RISK_TABLE_META), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get('format_version') != RISK_TABLE_FORMAT_VERSION:
+                return None
+            space = AnswerSpace()
+            if meta.get('space_signature') != space.signature():
+                print("Risk table was built for a different feature mapping, ignoring it")
+                return None
+            table = np.load(os.path.join(table_dir, meta['table']), mmap_mode='r')
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Warning: Could not load risk table: {e}")
+            return None
+        return cls(meta, table, space)
+
+    def lookup(self, user_data):
+        """
+        Probabilities for every condition in the table.
+
+        Returns:
+            dict: Condition code -> (probability, condition metadata), or
+            None if the answers fall outside the table
+        """
+        code = self.space.encode(user_data)
+        if code is None:
+            return None
+        row = self.table[code]
+        return {
+            info['condition']: (float(row[column]), info)
+            for column, info in enumerate(self.conditions)
+        }
+
+
+class RiskTableService:
+    """
+    Serves lookups from the current risk table and keeps it in sync with the
+    model artifacts.
+
+    Whenever the artifacts' fingerprint no longer matches the loaded table,
+    lookups return None (so callers fall back to live inference) and a
+    background rebuild is started. Rebuilds run under a file lock: the first
+    process builds the table, the others find it fresh on disk once the lock
+    is released and only map it. The fresh table is swapped in once loaded.
+    """
+
+    def __init__(self, models_dir, locate_models, build, check_interval=2.0,
+                 retry_interval=300.0):
+        """
+        Args:
+            models_dir (str): Models directory holding the table
+            locate_models (callable): Returns condition -> artifact path
+            build (callable): Builds the table, returns the metadata path
+            check_interval (float): Seconds between fingerprint checks
+            retry_interval (float): Seconds to wait after a failed build
+        """
+        self.models_dir = models_dir
+        self._locate_models = locate_models
+        self._build = build
+        self._check_interval = check_interval
+        self._retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._table = None
+        self._loaded = False
+        self._fresh = False
+        self._checked_at = None
+        self._rebuilding = False
+        self._rebuild_pid = None
+        self._failed_at = None
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def invalidate(self):
+        """Mark the table stale, e.g. after a model artifact changed."""
+        with self._lock:
+            self._fresh = False
+            self._checked_at = None
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if not self._loaded:
+                self._table = RiskTable.load(self.models_dir)
+                self._loaded = True
+            if self._checked_at is not None and now - self._checked_at < self._check_interval:
+                return self._table if self._fresh else None
+            table = self._table
+
+        available = self._locate_models()
+        fingerprint = artifact_fingerprint(available)
+        fresh = table is not None and table.fingerprint == fingerprint
+
+        with self._lock:
+            self._fresh = fresh
+            self._checked_at = now
+        if not fresh and available:
+            self._start_rebuild()
+        return table if fresh else None
+
+    def _start_rebuild(self):
+        with self._lock:
+            # A rebuild thread started before a fork does not exist in the child
+            if self._rebuilding and self._rebuild_pid == os.getpid():
+                return
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self._retry_interval:
+                return
+            self._rebuilding = True
+            self._rebuild_pid = os.getpid()
+
+        thread = threading.Thread(target=self._rebuild, name="risk-table-rebuild", daemon=True)
+        thread.start()
+
+    def _rebuild(self):
+        try:
+            with risk_table_build_lock(self.models_dir):
+                # Another worker may have built the table while this one waited
+                table = RiskTable.load(self.models_dir)
+                built = table is None or table.fingerprint != artifact_fingerprint(self._locate_models())
+                if built:
+                    self._build()
+                    table = RiskTable.load(self.models_dir)
+            with self._lock:
+                self._table = table
+                self._checked_at = None
+                self._failed_at = None
+                if built:
+                    self.rebuilds += 1
+        except Exception as e:
+            print(f"Risk table rebuild failed: {e}")
+            with self._lock:
+                self._failed_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def lookup(self, user_data):
+        """
+        Look one user's answers up in the current table.
+
+        Returns:
+            dict: Condition code -> (probability, condition metadata), or
+            None when the table is missing, stale or does not cover the input
+        """
+        table = self._ensure_fresh()
+        result = table.lookup(user_data) if table is not None else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            table = self._table
+            return {
+                'loaded': table is not None,
+                'fresh': self._fresh,
+                'rebuilding': self._rebuilding,
+                'rows': table.space.size if table is not None else None,
+                'built_at': table.meta.get('built_at') if table is not None else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'rebuilds': self.rebuilds
+            }
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from ml_utils import build_risk_table_for_models, get_default_models_dir
+
+    with risk_table_build_lock(get_default_models_dir()):
+        meta_path = build_risk_table_for_models()
+    if meta_path is None:
+        print("No trained models found, nothing to build")
@@ -0,0 +1,229 @@
+"""
+Bounded in-memory store for detective sessions.
+
+Sessions used to live in a plain dict that only /stop-detective cleaned up,
+so abandoned conversations stayed in memory forever. The store expires
+sessions idle for longer than a TTL and evicts the least recently used ones
+once the session count or the approximate total size exceeds its cap. A
+background sweeper applies the TTL even when no requests arrive.
+"""
+
+import os
+import sys
+import time
+import types
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+
+# Runtime machinery rather than session data: counted shallowly, never followed
+# into executors, threads and whatever else they reference
+_OPAQUE_TYPES = (
+    Future, Executor, threading.Thread, threading.Event, threading.Condition,
+    type(threading.Lock()), type(threading.RLock()), type, types.ModuleType,
+    types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.GeneratorType
+)
+
+
+def approximate_size(obj, _seen=None):
+    """
+    Approximate memory footprint of an object graph in bytes.
+
+    Follows dicts, lists, tuples, sets and instance attributes, including
+    ``__slots__``; shared objects are counted once. Futures, executors, locks,
+    threads and callables are not followed, nor are the attributes a class
+    lists in ``shared_attributes`` (e.g. a client shared by every session).
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _OPAQUE_TYPES):
+        return size
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, _seen) + approximate_size(v, _seen) for k, v in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, _seen) for item in list(obj))
+    else:
+        shared = getattr(type(obj), 'shared_attributes', ())
+        if hasattr(obj, '__dict__'):
+            attributes = vars(obj)
+            _seen.add(id(attributes))
+            size += sys.getsizeof(attributes) + sum(
+                approximate_size(name, _seen) + approximate_size(value, _seen)
+                for name, value in list(attributes.items()) if name not in shared
+            )
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name != '__dict__' and name not in shared and hasattr(obj, name):
+                    size += approximate_size(getattr(obj, name), _seen)
+    return size
+
+
+class SessionStore:
+    """Thread-safe LRU session store with idle expiry and size accounting."""
+
+    def __init__(self, idle_ttl=1800, max_sessions=10000, max_bytes=256 * 1024 * 1024,
+                 sweep_interval=60, on_evict=None, sizeof=approximate_size):
+        """
+        Args:
+            idle_ttl (float): Seconds without access before a session expires, 0 to disable
+            max_sessions (int): Maximum stored sessions
+            max_bytes (int): Maximum approximate total size of the sessions
+            sweep_interval (float): Seconds between background sweeps, 0 disables the sweeper
+            on_evict (callable): Called with each session that expires or is evicted
+            sizeof (callable): Returns a session's approximate size in bytes
+        """
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._on_evict = on_evict
+        self._sizeof = sizeof
+
+        self._lock = threading.Lock()
+        # session_id -> [session, last_access, size]
+        self._sessions = OrderedDict()
+        self._total_bytes = 0
+        self._sweeper = None
+        self._sweeper_pid = None
+
+        self.created = 0
+        self.removed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.sweeps = 0
+
+    def _measure(self, session, previous=0):
+        try:
+            return self._sizeof(session)
+        except RuntimeError:
+            # The session changed while it was measured, keep the last size
+            return previous
+
+    def _ensure_sweeper(self):
+        # Threads do not survive fork, start one per process on first use
+        if not self.sweep_interval or (self._sweeper is not None and self._sweeper_pid == os.getpid()):
+            return
+        self._sweeper_pid = os.getpid()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Session sweep failed: {e}")
+
+    def put(self, session_id, session):
+        """Store or refresh a session, evicting others if the store is over its caps."""
+        size = self._measure(session)
+        with self._lock:
+            self._ensure_sweeper()
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+            else:
+                self.created += 1
+            self._sessions[session_id] = [session, time.monotonic(), size]
+            self._total_bytes += size
+            evicted = self._enforce_caps_locked()
+        self._notify(evicted)
+
+    def get(self, session_id):
+        """Return the session and mark it recently used, or None if unknown or expired."""
+        now = time.monotonic()
+        expired = None
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if self.idle_ttl and now - entry[1] > self.idle_ttl:
+                expired = self._remove_locked(session_id)
+                self.expired += 1
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+                return entry[0]
+        self._notify([expired])
+        return None
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def pop(self, session_id):
+        """Remove a session and return it, or None if unknown."""
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            self.removed += 1
+            return self._remove_locked(session_id)
+
+    def _remove_locked(self, session_id):
+        session, _, size = self._sessions.pop(session_id)
+        self._total_bytes -= size
+        return session
+
+    def _enforce_caps_locked(self):
+        evicted = []
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            evicted.append(self._remove_locked(session_id))
+            self.evicted += 1
+        return evicted
+
+    def _notify(self, sessions):
+        if self._on_evict is None:
+            return
+        for session in sessions:
+            try:
+                self._on_evict(session)
+            except Exception as e:
+                print(f"Session eviction callback failed: {e}")
+
+    def sweep(self):
+        """Expire idle sessions, re-measure the rest and enforce the caps."""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._sessions.items())
+
+        # Sessions grow as conversations continue, measure outside the lock
+        sizes = {session_id: self._measure(entry[0], entry[2]) for session_id, entry in entries}
+
+        removed = []
+        with self._lock:
+            for session_id, entry in list(self._sessions.items()):
+                if self.idle_ttl and now - entry[1] > self.idle_ttl:
+                    removed.append(self._remove_locked(session_id))
+                    self.expired += 1
+                elif session_id in sizes:
+                    self._total_bytes += sizes[session_id] - entry[2]
+                    entry[2] = sizes[session_id]
+            removed.extend(self._enforce_caps_locked())
+            self.sweeps += 1
+        self._notify(removed)
+        return len(removed)
+
+    def stats(self):
+        with self._lock:
+            active = len(self._sessions)
+            sizes = [entry[2] for entry in self._sessions.values()]
+            return {
+                'active_sessions': active,
+                'max_sessions': self.max_sessions,
+                'idle_ttl_seconds': self.idle_ttl,
+                'approx_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'avg_bytes_per_session': round(self._total_bytes / active) if active else 0,
+                'max_bytes_per_session': max(sizes) if sizes else 0,
+                'created': self.created,
+                'removed': self.removed,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'sweeps': self.sweeps
+            }
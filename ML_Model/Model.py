@@ -1,9 +1,5 @@
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import joblib
 from datetime import datetime
@@ -18,6 +14,34 @@ from sklearn.utils.class_weight import compute_class_weight
 import warnings
 warnings.filterwarnings('ignore')
 
+def _pyplot():
+    """Import pyplot on first use so loading this module does not pull in matplotlib."""
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+    return plt
+
+def search_optimal_threshold(y_true, y_proba):
+    """
+    Find the decision threshold that maximises F1 on a validation set.
+    
+    Returns:
+        tuple: (best threshold, best F1-score)
+    """
+    thresholds = np.linspace(0.1, 0.9, 50)
+    f1_scores = []
+    
+    for threshold in thresholds:
+        y_pred = (y_proba >= threshold).astype(int)
+        if len(np.unique(y_pred)) > 1:
+            f1 = f1_score(y_true, y_pred)
+            f1_scores.append(f1)
+        else:
+            f1_scores.append(0)
+    
+    best_idx = np.argmax(f1_scores)
+    return thresholds[best_idx], f1_scores[best_idx]
+
 class ChronicConditionPredictor:
     
     def __init__(self, enable_plotting=True):
@@ -114,54 +138,89 @@ class ChronicConditionPredictor:
     
     def find_optimal_threshold(self, X_val, y_val):
         y_proba = self.model.predict_proba(X_val)[:, 1]
-        thresholds = np.linspace(0.1, 0.9, 50)
-        f1_scores = []
-        
-        for threshold in thresholds:
-            y_pred = (y_proba >= threshold).astype(int)
-            if len(np.unique(y_pred)) > 1:
-                f1 = f1_score(y_val, y_pred)
-                f1_scores.append(f1)
-            else:
-                f1_scores.append(0)
-        
-        best_idx = np.argmax(f1_scores)
-        self.optimal_threshold = thresholds[best_idx]
+        self.optimal_threshold, best_f1 = search_optimal_threshold(y_val, y_proba)
         
         print(f"Optimal threshold found: {self.optimal_threshold:.3f}")
-        print(f"Best F1-score: {f1_scores[best_idx]:.3f}")
+        print(f"Best F1-score: {best_f1:.3f}")
         
         return self.optimal_threshold
     
-    def train_model(self, X, y, test_size=0.2, random_state=42):
-        if not self.analyze_class_balance(y):
-            return None
+    def find_oob_threshold(self, y_train):
+        """
+        Tune the threshold on the forest's out-of-bag probabilities.
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, 
-            stratify=y if len(np.unique(y)) > 1 else None
+        Each training row is scored only by the trees that did not sample it,
+        so no rows have to be held out of training and the test split stays
+        untouched.
+        """
+        positive = np.flatnonzero(self.model.classes_ == 1)[0]
+        y_proba = self.model.oob_decision_function_[:, positive]
+        # Rows that every tree sampled have no out-of-bag vote
+        scored = np.isfinite(y_proba)
+        self.optimal_threshold, best_f1 = search_optimal_threshold(
+            np.asarray(y_train)[scored], y_proba[scored]
         )
         
-        X_train_imputed = self.imputer.fit_transform(X_train)
-        X_test_imputed = self.imputer.transform(X_test)
+        print(f"Optimal threshold found: {self.optimal_threshold:.3f}")
+        print(f"Best out-of-bag F1-score: {best_f1:.3f}")
         
-        self.model = RandomForestClassifier(
-            n_estimators=200,
-            max_depth=15,
+        return self.optimal_threshold
+    
+    def build_forest(self, class_weight, random_state=42, n_estimators=200, max_depth=15):
+        """Create the Random Forest used for every chronic condition model."""
+        return RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
             min_samples_split=5,
             min_samples_leaf=2,
-            class_weight=self.class_weights,
+            class_weight=class_weight,
             random_state=random_state,
             n_jobs=-1,
             bootstrap=True,
             oob_score=True
         )
+    
+    def _stratified_split(self, X, y, test_size, random_state):
+        return train_test_split(
+            X, y, test_size=test_size, random_state=random_state,
+            stratify=y if len(np.unique(y)) > 1 else None
+        )
+    
+    def split_data(self, X, y, test_size=0.2, validation_size=0.2, random_state=42):
+        """
+        Deterministic, stratified train/validation/test split.
+        
+        The test split is the one train_model reports on, and the validation
+        rows are carved from its training rows for forest compression (see
+        tune_forest_size). Calling it again with the same arguments returns
+        the same rows.
+        
+        Returns:
+            tuple: (X_train, X_val, X_test, y_train, y_val, y_test)
+        """
+        X_train, X_test, y_train, y_test = self._stratified_split(X, y, test_size, random_state)
+        X_train, X_val, y_train, y_val = self._stratified_split(
+            X_train, y_train, validation_size, random_state
+        )
+        return X_train, X_val, X_test, y_train, y_val, y_test
+    
+    def train_model(self, X, y, test_size=0.2, random_state=42, n_estimators=200, max_depth=15):
+        if not self.analyze_class_balance(y):
+            return None
+        
+        X_train, X_test, y_train, y_test = self._stratified_split(X, y, test_size, random_state)
+        
+        X_train_imputed = self.imputer.fit_transform(X_train)
+        X_test_imputed = self.imputer.transform(X_test)
+        
+        self.model = self.build_forest(self.class_weights, random_state=random_state,
+                                       n_estimators=n_estimators, max_depth=max_depth)
         
         print("Training Random Forest model...")
         self.model.fit(X_train_imputed, y_train)
         self.training_date = datetime.now().isoformat()
         
-        self.find_optimal_threshold(X_test_imputed, y_test)
+        self.find_oob_threshold(y_train)
         self.evaluate_model(X_test_imputed, y_test)
         self.cross_validate(X, y)
         
@@ -209,6 +268,7 @@ class ChronicConditionPredictor:
         print(f"   Individual scores: {[f'{score:.3f}' for score in cv_scores]}")
     
     def plot_feature_importance(self, top_n=15):
+        plt = _pyplot()
         importances = self.model.feature_importances_
         indices = np.argsort(importances)[::-1]
         
@@ -235,6 +295,8 @@ class ChronicConditionPredictor:
             print(f"   {i+1}. {top_features[i]}: {top_importances[i]:.4f}")
     
     def plot_confusion_matrix(self, y_true, y_pred):
+        import seaborn as sns
+        plt = _pyplot()
         cm = confusion_matrix(y_true, y_pred)
         
         plt.figure(figsize=(8, 6))
@@ -249,6 +311,7 @@ class ChronicConditionPredictor:
             plt.close()  # Close figure to free memory
     
     def plot_roc_curve(self, y_true, y_proba):
+        plt = _pyplot()
         fpr, tpr, _ = roc_curve(y_true, y_proba)
         auc = roc_auc_score(y_true, y_proba)
         
@@ -272,18 +335,34 @@ class ChronicConditionPredictor:
             return None
         
         new_data_imputed = self.imputer.transform(new_data)
-        proba = self.model.predict_proba(new_data_imputed)[:, 1]
+        proba = self.predict_proba_imputed(new_data_imputed)
         predictions = (proba >= self.optimal_threshold).astype(int)
         
         return predictions, proba
     
-    def save_model(self, model_dir=None, model_name=None):
+    def predict_proba_imputed(self, X_imputed):
+        """
+        Positive-class probabilities for rows that already went through the imputer.
+        
+        Args:
+            X_imputed (numpy.ndarray): Imputed feature rows
+        
+        Returns:
+            numpy.ndarray: Probability of the condition for each row
+        """
+        return self.model.predict_proba(X_imputed)[:, 1]
+    
+    def save_model(self, model_dir=None, model_name=None, keep_versions=2):
         """
         Save the trained model and all necessary components to disk using joblib.
         
+        The artifact is also registered in the directory's manifest, and older
+        artifacts for the same condition beyond ``keep_versions`` are deleted.
+        
         Args:
             model_dir (str): Directory to save the model. If None, saves to ML_Model/saved_models/
             model_name (str): Name for the model file. If None, uses target_column name.
+            keep_versions (int): Artifacts to keep per condition (0 keeps all)
         
         Returns:
             str: Path to the saved model file
@@ -302,10 +381,51 @@ class ChronicConditionPredictor:
         # Set default model name
         if model_name is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            model_name = f"chronic_condition_model_{self.target_column}_{timestamp}.joblib"
+            model_name = self._default_model_name(timestamp)
+        
+        saved_at = datetime.now().isoformat()
+        
+        # Save the model
+        model_path = os.path.join(model_dir, model_name)
+        joblib.dump(self._get_model_data(saved_at), model_path, compress=3)
+        
+        # Register the artifact so readers can find it without scanning the directory
+        from ML_Model.model_manifest import record_artifact
+        removed = record_artifact(
+            model_dir, self._manifest_key(), model_path,
+            model_version=self.model_version,
+            feature_names=self.feature_names,
+            training_date=saved_at,
+            keep_versions=keep_versions,
+            section=self._manifest_section()
+        )
+        
+        print(f"Model saved successfully to: {model_path}")
+        print(f"Model details:")
+        self._print_model_details()
+        if removed:
+            print(f"  - Removed superseded artifacts: {', '.join(removed)}")
         
-        # Prepare model data to save
-        model_data = {
+        return model_path
+    
+    def _default_model_name(self, timestamp):
+        return f"chronic_condition_model_{self.target_column}_{timestamp}.joblib"
+    
+    def _manifest_section(self):
+        return 'conditions'
+    
+    def _manifest_key(self):
+        return self.target_column
+    
+    def _print_model_details(self):
+        print(f"  - Target condition: {self.target_column}")
+        print(f"  - Features: {len(self.feature_names)} columns")
+        print(f"  - Optimal threshold: {self.optimal_threshold:.3f}")
+        print(f"  - Model version: {self.model_version}")
+    
+    def _get_model_data(self, saved_at):
+        """Collect everything needed to restore this predictor from disk."""
+        return {
             'model': self.model,
             'imputer': self.imputer,
             'scaler': self.scaler,
@@ -316,22 +436,24 @@ class ChronicConditionPredictor:
             'missing_codes': self.missing_codes,
             'ccc_columns': self.ccc_columns,
             'model_version': self.model_version,
-            'training_date': datetime.now().isoformat(),
+            'training_date': saved_at,
             'enable_plotting': self.enable_plotting
         }
-        
-        # Save the model
-        model_path = os.path.join(model_dir, model_name)
-        joblib.dump(model_data, model_path, compress=3)
-        
-        print(f"Model saved successfully to: {model_path}")
-        print(f"Model details:")
-        print(f"  - Target condition: {self.target_column}")
-        print(f"  - Features: {len(self.feature_names)} columns")
-        print(f"  - Optimal threshold: {self.optimal_threshold:.3f}")
-        print(f"  - Model version: {self.model_version}")
-        
-        return model_path
+    
+    def _restore_model_data(self, model_data):
+        """Restore predictor state from a loaded model data dict."""
+        self.model = model_data['model']
+        self.imputer = model_data['imputer']
+        self.scaler = model_data['scaler']
+        self.feature_names = model_data['feature_names']
+        self.target_column = model_data['target_column']
+        self.optimal_threshold = model_data['optimal_threshold']
+        self.class_weights = model_data['class_weights']
+        self.missing_codes = model_data['missing_codes']
+        self.ccc_columns = model_data['ccc_columns']
+        self.model_version = model_data.get('model_version', '1.0')
+        self.training_date = model_data.get('training_date', 'Unknown')
+        self.enable_plotting = model_data.get('enable_plotting', True)
     
     def load_model(self, model_path):
         """
@@ -352,25 +474,11 @@ class ChronicConditionPredictor:
             model_data = joblib.load(model_path)
             
             # Restore all components
-            self.model = model_data['model']
-            self.imputer = model_data['imputer']
-            self.scaler = model_data['scaler']
-            self.feature_names = model_data['feature_names']
-            self.target_column = model_data['target_column']
-            self.optimal_threshold = model_data['optimal_threshold']
-            self.class_weights = model_data['class_weights']
-            self.missing_codes = model_data['missing_codes']
-            self.ccc_columns = model_data['ccc_columns']
-            self.model_version = model_data.get('model_version', '1.0')
-            self.training_date = model_data.get('training_date', 'Unknown')
-            self.enable_plotting = model_data.get('enable_plotting', True)
+            self._restore_model_data(model_data)
             
             print(f"Model loaded successfully from: {model_path}")
             print(f"Model details:")
-            print(f"  - Target condition: {self.target_column}")
-            print(f"  - Features: {len(self.feature_names)} columns")
-            print(f"  - Optimal threshold: {self.optimal_threshold:.3f}")
-            print(f"  - Model version: {self.model_version}")
+            self._print_model_details()
             print(f"  - Training date: {self.training_date}")
             
             return True
@@ -397,6 +505,153 @@ class ChronicConditionPredictor:
         else:
             return None
 
+class MultiConditionPredictor(ChronicConditionPredictor):
+    """
+    One multi-output Random Forest covering every chronic condition target.
+    
+    All targets share the feature matrix, so a single forest traversal scores
+    every condition at once. Each condition keeps its own F1-optimal threshold,
+    chosen on a validation split of the training data so the test split stays
+    untouched for reporting.
+    """
+    
+    def __init__(self, enable_plotting=False):
+        super().__init__(enable_plotting=enable_plotting)
+        self.target_columns = []
+        self.optimal_thresholds = {}
+        self.target_column = 'MULTILABEL'
+    
+    def prepare_features_and_targets(self, df, target_columns=None):
+        if target_columns is None:
+            target_columns = [col for col in self.ccc_columns if col in df.columns]
+        if not target_columns:
+            raise ValueError("No target columns found in dataset")
+        
+        X = df.drop(columns=[col for col in self.ccc_columns if col in df.columns])
+        Y = pd.DataFrame({col: (df[col] == 1).astype(int) for col in target_columns})
+        
+        self.feature_names = X.columns.tolist()
+        self.target_columns = list(target_columns)
+        
+        print(f"Predicting: {', '.join(self.target_columns)}")
+        print(f"Features: {len(self.feature_names)} columns")
+        print(f"Samples: {len(Y)} rows")
+        
+        return X, Y
+    
+    def compute_target_class_weights(self, Y):
+        """Per-target class weights in the list-of-dicts form multi-output forests need."""
+        weights = []
+        for col in self.target_columns:
+            if not self.analyze_class_balance(Y[col].values):
+                raise ValueError(f"Only one class present for target {col}")
+            if self.class_weights == 'balanced':
+                classes = np.unique(Y[col].values)
+                balanced = compute_class_weight('balanced', classes=classes, y=Y[col].values)
+                weights.append(dict(zip(classes, balanced)))
+            else:
+                weights.append(dict(self.class_weights))
+        self.class_weights = weights
+        return weights
+    
+    def split_data(self, X, Y, test_size=0.2, validation_size=0.2, random_state=42):
+        """
+        Deterministic train/validation/test split shared with the comparison report.
+        
+        Not stratified, there is no single target to stratify on. The test
+        split is taken first, so it does not depend on validation_size; the
+        validation split is then carved from the remaining training rows.
+        
+        Returns:
+            tuple: (X_train, X_val, X_test, Y_train, Y_val, Y_test)
+        """
+        X_train, X_test, Y_train, Y_test = train_test_split(
+            X, Y, test_size=test_size, random_state=random_state
+        )
+        X_train, X_val, Y_train, Y_val = train_test_split(
+            X_train, Y_train, test_size=validation_size, random_state=random_state
+        )
+        return X_train, X_val, X_test, Y_train, Y_val, Y_test
+    
+    def train_model(self, X, Y, test_size=0.2, validation_size=0.2, random_state=42):
+        self.compute_target_class_weights(Y)
+        
+        X_train, X_val, X_test, Y_train, Y_val, Y_test = self.split_data(
+            X, Y, test_size, validation_size, random_state
+        )
+        
+        X_train_imputed = self.imputer.fit_transform(X_train)
+        X_val_imputed = self.imputer.transform(X_val)
+        X_test_imputed = self.imputer.transform(X_test)
+        
+        self.model = self.build_forest(self.class_weights, random_state=random_state)
+        
+        print(f"Training multi-label Random Forest for {len(self.target_columns)} conditions...")
+        self.model.fit(X_train_imputed, Y_train.values)
+        self.training_date = datetime.now().isoformat()
+        
+        probabilities = self.predict_proba_imputed(X_val_imputed)
+        for i, col in enumerate(self.target_columns):
+            threshold, best_f1 = search_optimal_threshold(Y_val[col].values, probabilities[:, i])
+            self.optimal_thresholds[col] = threshold
+            print(f"{col}: optimal threshold {threshold:.3f}, validation F1-score {best_f1:.3f}")
+        
+        return X_test_imputed, Y_test
+    
+    def predict_proba_imputed(self, X_imputed):
+        """
+        Positive-class probabilities for every target.
+        
+        Returns:
+            numpy.ndarray: Array of shape (n_rows, n_targets)
+        """
+        per_target = self.model.predict_proba(X_imputed)
+        columns = []
+        for classes, proba in zip(self.model.classes_, per_target):
+            positive = np.flatnonzero(classes == 1)
+            columns.append(proba[:, positive[0]] if len(positive) else np.zeros(len(proba)))
+        return np.column_stack(columns)
+    
+    def predict_new_sample(self, new_data):
+        if self.model is None:
+            print("Model not trained yet.")
+            return None
+        
+        new_data_imputed = self.imputer.transform(new_data)
+        proba = self.predict_proba_imputed(new_data_imputed)
+        thresholds = np.array([self.optimal_thresholds[col] for col in self.target_columns])
+        predictions = (proba >= thresholds).astype(int)
+        
+        return predictions, proba
+    
+    def _default_model_name(self, timestamp):
+        return f"chronic_condition_multilabel_{timestamp}.joblib"
+    
+    def _manifest_section(self):
+        return 'fused'
+    
+    def _manifest_key(self):
+        from ML_Model.model_manifest import FUSED_MODEL_KEY
+        return FUSED_MODEL_KEY
+    
+    def _print_model_details(self):
+        print(f"  - Target conditions: {', '.join(self.target_columns)}")
+        print(f"  - Features: {len(self.feature_names)} columns")
+        print(f"  - Optimal thresholds: " + ", ".join(
+            f"{col}={threshold:.3f}" for col, threshold in self.optimal_thresholds.items()))
+        print(f"  - Model version: {self.model_version}")
+    
+    def _get_model_data(self, saved_at):
+        model_data = super()._get_model_data(saved_at)
+        model_data['target_columns'] = self.target_columns
+        model_data['optimal_thresholds'] = self.optimal_thresholds
+        return model_data
+    
+    def _restore_model_data(self, model_data):
+        super()._restore_model_data(model_data)
+        self.target_columns = model_data['target_columns']
+        self.optimal_thresholds = model_data['optimal_thresholds']
+
 if __name__ == "__main__":
     print("Chronic Conditions ML Predictor")
     print("=" * 40)
@@ -0,0 +1,136 @@
+"""
+Latency-aware compression of trained Random Forests.
+
+Every condition is trained with the same 200 trees of depth 15, yet many
+conditions reach the same holdout F1/AUC with far fewer or shallower trees.
+The holdout curves of every (tree count, depth) pair are read off the already
+trained forest in one pass: truncating a tree at depth d predicts with the
+class distribution of the node it stops at, which the tree already stores.
+The curves come from a probe forest scored on a validation split, and the
+served forest is then trained at the cheapest size within tolerance on every
+training row.
+"""
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score, roc_auc_score
+
+from ML_Model.forest_engine import CompiledForest
+
+DEFAULT_TREE_COUNTS = (10, 25, 50, 75, 100, 150, 200)
+DEFAULT_DEPTHS = (4, 6, 8, 10, 12, 15)
+DEFAULT_F1_TOLERANCE = 0.01
+DEFAULT_AUC_TOLERANCE = 0.005
+
+
+def _score(y_true, proba):
+    """F1 at the F1-optimal threshold and ROC-AUC, like train_model reports."""
+    from ML_Model.Model import search_optimal_threshold
+
+    threshold, _ = search_optimal_threshold(y_true, proba)
+    y_pred = (proba >= threshold).astype(int)
+    f1 = f1_score(y_true, y_pred, zero_division=0)
+    auc = roc_auc_score(y_true, proba) if len(np.unique(y_true)) > 1 else 0.0
+    return f1, auc, threshold
+
+
+def holdout_curves(forest, X_holdout, y_holdout, tree_counts=DEFAULT_TREE_COUNTS,
+                   depths=DEFAULT_DEPTHS):
+    """
+    Holdout F1 and AUC of every truncated (tree count, depth) forest.
+
+    Args:
+        forest (RandomForestClassifier): Fitted binary forest
+        X_holdout (numpy.ndarray): Imputed holdout rows
+        y_holdout (array-like): Holdout labels
+
+    Returns:
+        list: One dict per candidate with n_trees, max_depth, f1, auc and
+        threshold
+    """
+    engine = CompiledForest.from_forest(forest)
+    X = engine.prepare(X_holdout)
+    y_holdout = np.asarray(y_holdout)
+
+    n_trees = engine.n_trees
+    counts = sorted({min(k, n_trees) for k in tree_counts} | {n_trees})
+    depth_limits = sorted({min(d, engine.depth) for d in depths} | {engine.depth})
+
+    row_index = np.arange(X.shape[0])[:, None]
+    nodes = np.broadcast_to(engine.roots, (X.shape[0], n_trees))
+    curves = []
+
+    for step in range(1, engine.depth + 1):
+        go_left = X[row_index, engine.feature[nodes]] <= engine.threshold[nodes]
+        nodes = np.where(go_left, engine.left[nodes], engine.right[nodes])
+        if step not in depth_limits:
+            continue
+
+        # Mean over the first k trees for every k at once
+        cumulative = np.cumsum(engine.value[nodes, 0], axis=1)
+        for k in counts:
+            f1, auc, threshold = _score(y_holdout, cumulative[:, k - 1] / k)
+            curves.append({'n_trees': k, 'max_depth': step, 'f1': f1, 'auc': auc,
+                           'threshold': threshold})
+    return curves
+
+
+def choose_forest_size(curves, f1_tolerance=DEFAULT_F1_TOLERANCE,
+                       auc_tolerance=DEFAULT_AUC_TOLERANCE):
+    """
+    Pick the cheapest candidate within tolerance of the full forest.
+
+    Single-row latency grows with trees x depth (one gather per tree and
+    level), so that product is the cost; fewer trees breaks ties.
+
+    Returns:
+        tuple: (chosen candidate, full-forest candidate)
+    """
+    baseline = max(curves, key=lambda c: (c['n_trees'], c['max_depth']))
+    accepted = [
+        c for c in curves
+        if c['f1'] >= baseline['f1'] - f1_tolerance and c['auc'] >= baseline['auc'] - auc_tolerance
+    ]
+    chosen = min(accepted, key=lambda c: (c['n_trees'] * c['max_depth'], c['n_trees']))
+    return chosen, baseline
+
+
+def tune_forest_size(predictor, X, y, f1_tolerance=DEFAULT_F1_TOLERANCE,
+                     auc_tolerance=DEFAULT_AUC_TOLERANCE, tree_counts=DEFAULT_TREE_COUNTS,
+                     depths=DEFAULT_DEPTHS, random_state=42):
+    """
+    Choose the forest size for a condition before its served model is trained.
+
+    A probe forest with the full hyperparameters is fit on the training rows
+    minus the validation split (see split_data) and scored on that split. The
+    test rows are never used, and the served model still trains on every
+    training row: pass the result to train_model.
+
+    Args:
+        predictor (ChronicConditionPredictor): Predictor the condition is trained with
+        X (pandas.DataFrame): Features, as given to train_model
+        y (pandas.Series): Target, as given to train_model
+        f1_tolerance (float): Largest accepted F1 loss against the full forest
+        auc_tolerance (float): Largest accepted AUC loss against the full forest
+
+    Returns:
+        dict: ``n_estimators`` and ``max_depth`` for train_model, empty when
+        the full forest is kept or the target has a single class
+    """
+    if not predictor.analyze_class_balance(y):
+        return {}
+
+    X_fit, X_val, _, y_fit, y_val, _ = predictor.split_data(X, y, random_state=random_state)
+    imputer = clone(predictor.imputer)
+    probe = predictor.build_forest(predictor.class_weights, random_state=random_state)
+    probe.fit(imputer.fit_transform(X_fit), y_fit)
+
+    curves = holdout_curves(probe, imputer.transform(X_val), y_val, tree_counts, depths)
+    chosen, baseline = choose_forest_size(curves, f1_tolerance, auc_tolerance)
+    print(f"Forest size: {chosen['n_trees']} trees, depth {chosen['max_depth']} "
+          f"(validation F1 {chosen['f1']:.3f} vs {baseline['f1']:.3f}, "
+          f"AUC {chosen['auc']:.3f} vs {baseline['auc']:.3f})")
+
+    if (chosen['n_trees'], chosen['max_depth']) == (baseline['n_trees'], baseline['max_depth']):
+        return {}
+    return {'n_estimators': chosen['n_trees'], 'max_depth': chosen['max_depth']}
@@ -0,0 +1,349 @@
+"""
+Flattened NumPy inference engine for trained Random Forest predictors.
+
+A fitted forest is compiled into flat node arrays (feature, threshold,
+children, leaf value) shared by all trees, with the median imputer folded in
+as a fill-value vector. Rows are scored by walking every tree at once with
+vectorized NumPy indexing, which avoids sklearn's per-call validation and
+Python overhead when scoring a single row.
+"""
+
+import numpy as np
+
+# Rows scored per traversal chunk, keeps the (rows x trees) index arrays small
+DEFAULT_CHUNK_SIZE = 4096
+# Largest acceptable probability drift of a compacted engine
+DEFAULT_MAX_DRIFT = 1e-3
+
+
+def _imputer_fill_plan(imputer, n_features):
+    """
+    Turn a fitted SimpleImputer into a fill vector and column mapping.
+
+    Returns:
+        tuple: (fill values for every raw column, indices of the raw columns
+        the model sees, in model column order)
+    """
+    if imputer is None:
+        return np.zeros(n_features, dtype=np.float64), np.arange(n_features)
+
+    statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+    empty = np.isnan(statistics)
+    fill_values = np.where(empty, 0.0, statistics)
+
+    if getattr(imputer, 'keep_empty_features', False):
+        kept_columns = np.arange(len(statistics))
+    else:
+        # Columns that were entirely missing during fit are dropped by the imputer
+        kept_columns = np.flatnonzero(~empty)
+    return fill_values, kept_columns
+
+
+def _positive_class_index(classes):
+    positive = np.flatnonzero(np.asarray(classes) == 1)
+    return int(positive[0]) if len(positive) else None
+
+
+class CompiledForest:
+    """
+    A Random Forest compiled into flat arrays for vectorized traversal.
+
+    Leaves point to themselves as both children, so every row can take the
+    same number of steps (the deepest tree's depth) without branching.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth,
+                 fill_values, n_outputs, threshold_scale=1):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.fill_values = fill_values
+        self.n_outputs = int(n_outputs)
+        # Rows are multiplied by this before comparing, so half-integer
+        # thresholds can be stored exactly as scaled integers
+        self.threshold_scale = int(threshold_scale)
+
+    @classmethod
+    def from_forest(cls, forest, imputer=None):
+        """
+        Compile a fitted RandomForestClassifier (and optionally its imputer).
+
+        Args:
+            forest (RandomForestClassifier): Fitted binary or multi-output forest
+            imputer (SimpleImputer): Imputer applied before the forest
+
+        Returns:
+            CompiledForest: Engine producing positive-class probabilities
+        """
+        n_outputs = getattr(forest, 'n_outputs_', 1)
+        classes = forest.classes_ if n_outputs > 1 else [forest.classes_]
+        positive_indices = [_positive_class_index(c) for c in classes]
+
+        n_features = imputer.statistics_.shape[0] if imputer is not None else forest.n_features_in_
+        fill_values, kept_columns = _imputer_fill_plan(imputer, n_features)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            features.append(kept_columns[feature])
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # value has shape (n_nodes, n_outputs, n_classes), normalise it to
+            # class probabilities the same way DecisionTreeClassifier does
+            tree_value = tree.value
+            totals = tree_value.sum(axis=2)
+            totals[totals == 0] = 1.0
+            leaf_value = np.zeros((n_nodes, n_outputs), dtype=np.float64)
+            for k, positive in enumerate(positive_indices):
+                if positive is not None:
+                    leaf_value[:, k] = tree_value[:, k, positive] / totals[:, k]
+            values.append(leaf_value)
+
+            roots.append(offset)
+            offset += n_nodes
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            fill_values=fill_values,
+            n_outputs=n_outputs
+        )
+
+    @classmethod
+    def from_predictor(cls, predictor):
+        """Compile a loaded ChronicConditionPredictor or MultiConditionPredictor."""
+        return cls.from_forest(predictor.model, predictor.imputer)
+
+    # Array attributes written to and restored from model bundles
+    ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'fill_values')
+
+    def to_arrays(self):
+        """Plain dict of the engine's arrays and scalars, for serialization."""
+        data = {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+        data['depth'] = self.depth
+        data['n_outputs'] = self.n_outputs
+        data['threshold_scale'] = self.threshold_scale
+        return data
+
+    @classmethod
+    def from_arrays(cls, data):
+        """Rebuild an engine from ``to_arrays()`` output (arrays may be memory-mapped)."""
+        return cls(**{name: data[name] for name in cls.ARRAY_FIELDS},
+                   depth=data['depth'], n_outputs=data['n_outputs'],
+                   threshold_scale=data.get('threshold_scale', 1))
+
+    def compact(self, threshold_dtype='float32', leaf_dtype='float32'):
+        """
+        Copy of the engine with reduced-precision node storage.
+
+        Features become uint16 and children int32. Thresholds are stored as
+        float32, or as int16 when every threshold is a half-integer in range
+        (CCHS features are small integer codes, so sklearn's midpoints are
+        x.5). Leaf probabilities are stored as float32 or float16.
+
+        Args:
+            threshold_dtype (str): 'float32' or 'int16'; int16 falls back to
+                float32 when the thresholds do not allow it
+            leaf_dtype (str): 'float32' or 'float16'
+
+        Returns:
+            CompiledForest: Compacted engine, check it with max_drift()
+        """
+        if len(self.fill_values) > np.iinfo(np.uint16).max + 1:
+            raise ValueError("Too many features for uint16 feature indices")
+        if self.n_nodes > np.iinfo(np.int32).max:
+            raise ValueError("Too many nodes for int32 child indices")
+
+        threshold = np.asarray(self.threshold, dtype=np.float64) / self.threshold_scale
+        scale = 1
+        if threshold_dtype == 'int16':
+            doubled = threshold * 2
+            limits = np.iinfo(np.int16)
+            if (np.all(doubled == np.round(doubled))
+                    and doubled.min() >= limits.min and doubled.max() <= limits.max):
+                threshold = doubled.astype(np.int16)
+                scale = 2
+            else:
+                print("Thresholds are not half-integers in int16 range, keeping float32")
+                threshold_dtype = 'float32'
+        if threshold_dtype == 'float32':
+            threshold = threshold.astype(np.float32)
+        elif scale == 1:
+            raise ValueError(f"Unsupported threshold dtype: {threshold_dtype}")
+
+        if leaf_dtype not in ('float32', 'float16'):
+            raise ValueError(f"Unsupported leaf dtype: {leaf_dtype}")
+
+        return CompiledForest(
+            feature=np.asarray(self.feature).astype(np.uint16),
+            threshold=threshold,
+            left=np.asarray(self.left).astype(np.int32),
+            right=np.asarray(self.right).astype(np.int32),
+            value=np.asarray(self.value).astype(leaf_dtype),
+            roots=np.asarray(self.roots).astype(np.int32),
+            depth=self.depth,
+            fill_values=np.asarray(self.fill_values, dtype=np.float64),
+            n_outputs=self.n_outputs,
+            threshold_scale=scale
+        )
+
+    def sample_rows(self, n_rows=2000, missing_rate=0.05, seed=0):
+        """
+        Synthetic raw rows that land on both sides of the forest's splits.
+
+        Each column draws from its split thresholds +/- 0.5 (plus the fill
+        value and occasional NaN), which exercises every branch direction
+        without needing the training data.
+
+        Returns:
+            numpy.ndarray: Array of shape (n_rows, n_features)
+        """
+        rng = np.random.default_rng(seed)
+        n_features = len(self.fill_values)
+        threshold = np.asarray(self.threshold, dtype=np.float64) / self.threshold_scale
+        feature = np.asarray(self.feature)
+        is_split = np.asarray(self.left) != np.arange(self.n_nodes)
+
+        rows = np.empty((n_rows, n_features), dtype=np.float64)
+        for column in range(n_features):
+            splits = np.unique(threshold[is_split & (feature == column)])
+            candidates = np.concatenate([splits - 0.5, splits + 0.5, [self.fill_values[column]]])
+            rows[:, column] = rng.choice(candidates, size=n_rows)
+        rows[rng.random(rows.shape) < missing_rate] = np.nan
+        return rows
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def is_compact(self):
+        """Whether node storage has reduced precision (see compact())."""
+        return self.threshold.dtype != np.float64 or self.value.dtype != np.float64
+
+    @property
+    def dtypes(self):
+        return {name: str(getattr(self, name).dtype) for name in self.ARRAY_FIELDS}
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_FIELDS)
+
+    def prepare(self, X):
+        """
+        Apply the folded imputer and cast to the float32 precision sklearn
+        trees compare in.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        missing = np.isnan(X)
+        if missing.any():
+            X = np.where(missing, self.fill_values, X)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self.threshold_scale != 1:
+            X = X * np.float32(self.threshold_scale)
+        return X
+
+    def _leaf_nodes(self, X):
+        n_rows = X.shape[0]
+        row_index = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+
+        for _ in range(self.depth):
+            go_left = X[row_index, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Positive-class probabilities for raw (un-imputed) feature rows.
+
+        Args:
+            X (array-like): Rows in the model's feature_names order, NaN for
+                missing values
+            chunk_size (int): Rows traversed at once
+
+        Returns:
+            numpy.ndarray: Shape (n_rows,) for binary forests, or
+            (n_rows, n_outputs) for multi-output forests
+        """
+        X = self.prepare(X)
+        n_rows = X.shape[0]
+        result = np.empty((n_rows, self.n_outputs), dtype=np.float64)
+
+        for start in range(0, n_rows, chunk_size):
+            chunk = X[start:start + chunk_size]
+            leaves = self._leaf_nodes(chunk)
+            result[start:start + len(chunk)] = self.value[leaves].astype(np.float64).mean(axis=1)
+
+        return result[:, 0] if self.n_outputs == 1 else result
+
+    def max_drift(self, predictor, X):
+        """
+        Largest absolute probability difference against the sklearn predictor.
+
+        Args:
+            predictor (ChronicConditionPredictor): Predictor the engine came from
+            X (array-like): Raw feature rows to compare on
+
+        Returns:
+            float: Maximum absolute difference
+        """
+        expected = predictor.predict_proba_imputed(predictor.imputer.transform(np.asarray(X, dtype=np.float64)))
+        actual = self.predict_proba(X)
+        return float(np.max(np.abs(np.asarray(expected).reshape(actual.shape) - actual)))
+
+
+def compact_verified(predictor, threshold_dtype='int16', leaf_dtype='float32',
+                     max_drift=DEFAULT_MAX_DRIFT, rows=None, engine=None):
+    """
+    Compile a predictor, compact it and verify it against sklearn.
+
+    Args:
+        predictor: Loaded predictor (with ``model`` and ``imputer``)
+        threshold_dtype (str): See CompiledForest.compact
+        leaf_dtype (str): See CompiledForest.compact
+        max_drift (float): Largest acceptable probability difference
+        rows (numpy.ndarray): Raw rows to verify on, defaults to sample_rows()
+        engine (CompiledForest): Already compiled full-precision engine
+
+    Returns:
+        tuple: (engine, measured drift, whether the compact form was kept).
+        The full-precision engine is returned when the drift is too large.
+    """
+    if engine is None:
+        engine = CompiledForest.from_predictor(predictor)
+    compacted = engine.compact(threshold_dtype=threshold_dtype, leaf_dtype=leaf_dtype)
+    if rows is None:
+        rows = engine.sample_rows()
+    drift = compacted.max_drift(predictor, rows)
+
+    if drift > max_drift:
+        print(f"Compacted forest drifts by {drift:.2e} (> {max_drift:.0e}), keeping full precision")
+        return engine, engine.max_drift(predictor, rows), False
+    return compacted, drift, True
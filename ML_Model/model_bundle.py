@@ -0,0 +1,269 @@
+"""
+Memory-mappable bundle of every condition model.
+
+A bundle stores each condition's compiled forest arrays (see forest_engine),
+imputer fill values, decision threshold and feature names in one
+uncompressed joblib file. Loading it with ``mmap_mode='r'`` maps the arrays
+straight from the page cache instead of decompressing and copying every tree,
+so worker processes on one host share the same physical pages. The
+StandardScaler and the sklearn estimator objects are not stored.
+
+Convert the current ``.joblib`` artifacts of the default models directory:
+
+    python model_bundle.py
+"""
+
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+BUNDLE_FILENAME = "model_bundle.joblib"
+BUNDLE_FORMAT_VERSION = 1
+
+
+def get_bundle_path(model_dir):
+    """Return the bundle path for a models directory."""
+    return os.path.join(model_dir, BUNDLE_FILENAME)
+
+
+class BundledPredictor:
+    """
+    One condition served from a bundle.
+
+    Mirrors the attributes ml_utils reads from a loaded predictor; scoring
+    goes through the compiled engine, which already folds in the imputer.
+    """
+
+    model = None
+    imputer = None
+
+    def __init__(self, condition, engine, feature_names, optimal_threshold,
+                 model_version, training_date, source_artifact=None):
+        self.target_column = condition
+        self.engine = engine
+        self.feature_names = feature_names
+        self.optimal_threshold = optimal_threshold
+        self.model_version = model_version
+        self.training_date = training_date
+        self.source_artifact = source_artifact
+
+    def predict_new_sample(self, new_data):
+        proba = self.engine.predict_proba(np.asarray(new_data, dtype=np.float64))
+        predictions = (proba >= self.optimal_threshold).astype(int)
+        return predictions, proba
+
+
+def write_bundle(predictors, bundle_path, sources=None, compact=True,
+                 threshold_dtype='int16', leaf_dtype='float32', max_drift=None):
+    """
+    Compile loaded predictors and write them to one uncompressed bundle.
+
+    Args:
+        predictors (dict): Condition code -> loaded per-condition predictor
+        bundle_path (str): Output file, replaced atomically
+        sources (dict): Optional condition code -> source artifact file name
+        compact (bool): Store reduced-precision node arrays (see
+            CompiledForest.compact), verified against each sklearn forest
+        threshold_dtype (str): 'int16' or 'float32' compact thresholds
+        leaf_dtype (str): 'float32' or 'float16' compact leaf probabilities
+        max_drift (float): Largest accepted probability drift of a compacted
+            forest, conditions above it are stored at full precision
+
+    Returns:
+        str: Path of the written bundle
+    """
+    from ML_Model.forest_engine import CompiledForest, compact_verified, DEFAULT_MAX_DRIFT
+
+    sources = sources or {}
+    conditions = {}
+    for condition, predictor in sorted(predictors.items()):
+        engine = CompiledForest.from_predictor(predictor)
+        drift = None
+        if compact:
+            full_bytes = engine.nbytes
+            engine, drift, _ = compact_verified(
+                predictor, threshold_dtype=threshold_dtype, leaf_dtype=leaf_dtype,
+                max_drift=max_drift if max_drift is not None else DEFAULT_MAX_DRIFT,
+                engine=engine
+            )
+            print(f"  {condition}: {full_bytes / (1024 * 1024):.1f} MB -> {engine.nbytes / (1024 * 1024):.1f} MB, "
+                  f"max drift {drift:.2e}")
+        conditions[condition] = {
+            'engine': engine.to_arrays(),
+            'max_drift': drift,
+            'feature_names': list(predictor.feature_names),
+            'optimal_threshold': float(predictor.optimal_threshold),
+            'model_version': predictor.model_version,
+            'training_date': predictor.training_date,
+            'source_artifact': sources.get(condition)
+        }
+
+    bundle = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'conditions': conditions
+    }
+
+    bundle_dir = os.path.dirname(os.path.abspath(bundle_path))
+    os.makedirs(bundle_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".model_bundle_", suffix=".joblib", dir=bundle_dir)
+    os.close(fd)
+    try:
+        # compress=0 keeps every array as a raw, page-aligned block that
+        # joblib can memory-map on load
+        joblib.dump(bundle, tmp_path, compress=0)
+        os.replace(tmp_path, bundle_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    size_mb = os.path.getsize(bundle_path) / (1024 * 1024)
+    print(f"Model bundle written to {bundle_path} ({len(conditions)} conditions, {size_mb:.1f} MB)")
+    return bundle_path
+
+
+def load_bundle(bundle_path, mmap_mode='r', max_drift=None):
+    """
+    Load every condition of a bundle.
+
+    A compacted forest is only served when the drift measured against its
+    sklearn forest at write time is recorded and within ``max_drift``; other
+    compacted conditions are left out, so callers fall back to the
+    full-precision .joblib artifact.
+
+    Args:
+        bundle_path (str): Bundle file
+        mmap_mode (str): joblib mmap mode, None reads the arrays into memory
+        max_drift (float): Largest accepted recorded drift of a compacted
+            forest, defaults to forest_engine.DEFAULT_MAX_DRIFT
+
+    Returns:
+        dict: Condition code -> BundledPredictor, or None if the bundle is
+        missing or unreadable
+    """
+    from ML_Model.forest_engine import CompiledForest, DEFAULT_MAX_DRIFT
+
+    if max_drift is None:
+        max_drift = DEFAULT_MAX_DRIFT
+
+    try:
+        bundle = joblib.load(bundle_path, mmap_mode=mmap_mode)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading model bundle {bundle_path}: {str(e)}")
+        return None
+
+    if bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+        print(f"Warning: Unsupported model bundle format in {bundle_path}")
+        return None
+
+    predictors = {}
+    for condition, entry in bundle['conditions'].items():
+        engine = CompiledForest.from_arrays(entry['engine'])
+        drift = entry.get('max_drift')
+        if engine.is_compact and (drift is None or drift > max_drift):
+            recorded = "unrecorded" if drift is None else f"{drift:.2e}"
+            print(f"Warning: Bundled {condition} is compacted with {recorded} drift "
+                  f"(max {max_drift:.0e}), not serving it from {bundle_path}")
+            continue
+        predictors[condition] = BundledPredictor(
+            condition,
+            engine,
+            entry['feature_names'],
+            entry['optimal_threshold'],
+            entry['model_version'],
+            entry['training_date'],
+            entry.get('source_artifact')
+        )
+    return predictors
+
+
+_open_bundles = {}
+_open_bundles_lock = threading.Lock()
+
+
+def open_bundle(bundle_path):
+    """
+    Load a bundle once per file version and share it between callers.
+
+    Returns:
+        dict: Condition code -> BundledPredictor ({} if there is no bundle)
+    """
+    try:
+        mtime = os.stat(bundle_path).st_mtime_ns
+    except OSError:
+        return {}
+
+    with _open_bundles_lock:
+        cached = _open_bundles.get(bundle_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        predictors = load_bundle(bundle_path) or {}
+        # Only the current version stays referenced, older mappings are
+        # released once the last predictor using them is dropped
+        _open_bundles[bundle_path] = (mtime, predictors)
+    return predictors
+
+
+def convert_artifacts(model_dir, bundle_path=None, **bundle_options):
+    """
+    Build a bundle from the current ``.joblib`` artifacts of a models directory.
+
+    Extra keyword arguments are passed on to write_bundle().
+
+    Returns:
+        str: Path of the written bundle, or None if there are no artifacts
+    """
+    from ML_Model.model_manifest import get_current_artifacts, scan_artifacts
+    from ML_Model.serving import ServingPredictor
+
+    artifacts = get_current_artifacts(model_dir)
+    if artifacts is None:
+        artifacts = {condition: paths[0] for condition, paths in scan_artifacts(model_dir).items()}
+    if not artifacts:
+        print(f"No model artifacts found in {model_dir}")
+        return None
+
+    predictors = {}
+    for condition, path in sorted(artifacts.items()):
+        predictor = ServingPredictor.load_from_file(path)
+        if predictor is not None:
+            predictors[condition] = predictor
+
+    return write_bundle(
+        predictors, bundle_path or get_bundle_path(model_dir),
+        sources={condition: os.path.basename(artifacts[condition]) for condition in predictors},
+        **bundle_options
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description='Convert saved .joblib models into a memory-mappable bundle')
+    parser.add_argument('--model-dir', type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_models"),
+                        help='Directory with the saved models')
+    parser.add_argument('--output', type=str, help='Bundle path (default: <model-dir>/model_bundle.joblib)')
+    parser.add_argument('--no-compact', action='store_true',
+                        help='Store full-precision node arrays')
+    parser.add_argument('--threshold-dtype', choices=['int16', 'float32'], default='int16',
+                        help='Compact threshold storage')
+    parser.add_argument('--leaf-dtype', choices=['float32', 'float16'], default='float32',
+                        help='Compact leaf probability storage')
+    parser.add_argument('--max-drift', type=float, default=None,
+                        help='Largest accepted probability drift of a compacted forest; '
+                             'the server only serves compacted forests within DEFAULT_MAX_DRIFT')
+    args = parser.parse_args()
+
+    convert_artifacts(args.model_dir, args.output, compact=not args.no_compact,
+                      threshold_dtype=args.threshold_dtype, leaf_dtype=args.leaf_dtype,
+                      max_drift=args.max_drift)
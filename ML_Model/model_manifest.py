@@ -0,0 +1,333 @@
+"""
+Manifest index for saved chronic condition model artifacts.
+
+The manifest lives next to the artifacts as ``manifest.json`` and maps every
+condition to its current artifact, so readers can find a model with a single
+file read instead of globbing and parsing file names. It also keeps a short
+history of superseded artifacts per condition and garbage-collects anything
+older than the retention policy.
+"""
+
+import os
+import json
+import glob
+import hashlib
+import tempfile
+import contextlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, single writer assumed
+    fcntl = None
+
+MANIFEST_FILENAME = "manifest.json"
+# Held while the manifest is read, modified and written back
+MANIFEST_LOCK_FILENAME = ".manifest.lock"
+MANIFEST_FORMAT_VERSION = 1
+ARTIFACT_PREFIX = "chronic_condition_model_"
+FUSED_ARTIFACT_PREFIX = "chronic_condition_multilabel_"
+# Manifest key of the fused multi-label model in the 'fused' section
+FUSED_MODEL_KEY = "multilabel"
+# Current artifact plus one previous version kept around for rollback
+DEFAULT_KEEP_VERSIONS = 2
+
+
+def get_manifest_path(model_dir):
+    """Return the manifest path for a models directory."""
+    return os.path.join(model_dir, MANIFEST_FILENAME)
+
+
+@contextlib.contextmanager
+def manifest_lock(model_dir):
+    """
+    Exclusive lock over a models directory's manifest.
+
+    Training runs for different conditions may finish at the same time; each
+    update reads the manifest, changes one entry and writes it back, so
+    without the lock one run could drop the other's entry.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, MANIFEST_LOCK_FILENAME), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def compute_feature_hash(feature_names):
+    """
+    Hash an ordered feature list so models with the same input contract can
+    be recognised without comparing the full lists.
+    """
+    payload = "\x1f".join(str(name) for name in feature_names).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def parse_condition_from_filename(filename):
+    """
+    Extract the condition code from an artifact file name.
+
+    e.g. "chronic_condition_model_CCC_035_20240101_120000.joblib" -> "CCC_035"
+
+    Returns:
+        str: Condition code, or None if the name does not match
+    """
+    if not filename.startswith(ARTIFACT_PREFIX) or not filename.endswith(".joblib"):
+        return None
+    parts = filename.split("_")
+    if len(parts) < 5:
+        return None
+    return f"{parts[3]}_{parts[4]}"
+
+
+def scan_artifacts(model_dir):
+    """
+    Scan a directory for artifacts without using the manifest.
+
+    Returns:
+        dict: Condition code -> list of artifact paths, newest first
+    """
+    artifacts = {}
+    for path in glob.glob(os.path.join(model_dir, f"{ARTIFACT_PREFIX}*.joblib")):
+        condition = parse_condition_from_filename(os.path.basename(path))
+        if condition is None:
+            continue
+        artifacts.setdefault(condition, []).append((os.path.getmtime(path), path))
+
+    return {
+        condition: [path for _, path in sorted(entries, reverse=True)]
+        for condition, entries in artifacts.items()
+    }
+
+
+def _empty_manifest():
+    return {
+        'format_version': MANIFEST_FORMAT_VERSION,
+        'updated_at': None,
+        'conditions': {},
+        'fused': {}
+    }
+
+
+def _artifact_record(model_dir, artifact, model_version=None, feature_hash=None,
+                     training_date=None):
+    path = os.path.join(model_dir, artifact)
+    return {
+        'artifact': artifact,
+        'model_version': model_version,
+        'feature_hash': feature_hash,
+        'size_bytes': os.path.getsize(path) if os.path.exists(path) else None,
+        'training_date': training_date
+    }
+
+
+def read_manifest(model_dir):
+    """
+    Read the manifest of a models directory.
+
+    Returns:
+        dict: Manifest contents, or None if there is no (readable) manifest
+    """
+    manifest_path = get_manifest_path(model_dir)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read model manifest {manifest_path}: {e}")
+        return None
+
+    if manifest.get('format_version') != MANIFEST_FORMAT_VERSION:
+        print(f"Warning: Unsupported model manifest format in {manifest_path}")
+        return None
+    manifest.setdefault('conditions', {})
+    manifest.setdefault('fused', {})
+    return manifest
+
+
+def write_manifest(model_dir, manifest):
+    """Atomically replace the manifest of a models directory."""
+    os.makedirs(model_dir, exist_ok=True)
+    manifest['updated_at'] = datetime.now().isoformat()
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest_", suffix=".json", dir=model_dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, get_manifest_path(model_dir))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def rebuild_manifest(model_dir, write=True):
+    """
+    Build a manifest from the artifacts currently on disk.
+
+    Used to index directories created before the manifest existed. Version and
+    feature metadata are unknown for those artifacts and left empty.
+
+    Returns:
+        dict: The rebuilt manifest
+    """
+    manifest = _empty_manifest()
+    for condition, paths in scan_artifacts(model_dir).items():
+        records = [
+            _artifact_record(
+                model_dir, os.path.basename(path),
+                training_date=datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            )
+            for path in paths
+        ]
+        entry = records[0]
+        entry['history'] = records[1:]
+        manifest['conditions'][condition] = entry
+
+    fused_paths = sorted(
+        glob.glob(os.path.join(model_dir, f"{FUSED_ARTIFACT_PREFIX}*.joblib")),
+        key=os.path.getmtime, reverse=True
+    )
+    if fused_paths:
+        records = [
+            _artifact_record(
+                model_dir, os.path.basename(path),
+                training_date=datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            )
+            for path in fused_paths
+        ]
+        entry = records[0]
+        entry['history'] = records[1:]
+        manifest['fused'][FUSED_MODEL_KEY] = entry
+
+    if write:
+        with manifest_lock(model_dir):
+            write_manifest(model_dir, manifest)
+    return manifest
+
+
+def _collect_garbage(model_dir, entry, keep_versions):
+    """Delete superseded artifacts beyond the retention policy."""
+    keep_history = max(keep_versions - 1, 0)
+    history = entry.get('history', [])
+    removed = []
+
+    for record in history[keep_history:]:
+        path = os.path.join(model_dir, record['artifact'])
+        if record['artifact'] == entry['artifact']:
+            continue
+        try:
+            os.remove(path)
+            removed.append(record['artifact'])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not remove superseded model {path}: {e}")
+
+    entry['history'] = history[:keep_history]
+    return removed
+
+
+def record_artifact(model_dir, condition, artifact_path, model_version=None,
+                    feature_names=None, training_date=None,
+                    keep_versions=DEFAULT_KEEP_VERSIONS, section='conditions'):
+    """
+    Register a freshly saved artifact as the current model for a condition.
+
+    The previous artifact moves into the condition's history and anything
+    beyond ``keep_versions`` artifacts is deleted from disk.
+
+    Args:
+        model_dir (str): Models directory holding the manifest
+        condition (str): Chronic condition code
+        artifact_path (str): Path of the saved artifact
+        model_version (str): Model version string
+        feature_names (list): Ordered feature names the model expects
+        training_date (str): ISO training timestamp
+        keep_versions (int): Artifacts to keep per condition, including the
+            current one. 0 or None disables garbage collection.
+        section (str): Manifest section, 'conditions' for per-condition
+            models or 'fused' for multi-label models
+
+    Returns:
+        list: File names of artifacts removed by garbage collection
+    """
+    with manifest_lock(model_dir):
+        return _record_artifact_locked(
+            model_dir, condition, artifact_path, model_version, feature_names,
+            training_date, keep_versions, section
+        )
+
+
+def _record_artifact_locked(model_dir, condition, artifact_path, model_version,
+                            feature_names, training_date, keep_versions, section):
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        # First manifest for this directory: index the artifacts that are
+        # already there so other conditions stay visible to readers
+        manifest = rebuild_manifest(model_dir, write=False)
+
+    artifact = os.path.basename(artifact_path)
+    new_entry = _artifact_record(
+        model_dir, artifact,
+        model_version=model_version,
+        feature_hash=compute_feature_hash(feature_names) if feature_names is not None else None,
+        training_date=training_date
+    )
+
+    entries = manifest.setdefault(section, {})
+    previous = entries.get(condition)
+    history = []
+    if previous is not None:
+        previous_history = previous.pop('history', [])
+        if previous['artifact'] != artifact:
+            history.append(previous)
+        history.extend(r for r in previous_history if r['artifact'] != artifact)
+    new_entry['history'] = history
+
+    removed = []
+    if keep_versions:
+        removed = _collect_garbage(model_dir, new_entry, keep_versions)
+
+    entries[condition] = new_entry
+    write_manifest(model_dir, manifest)
+    return removed
+
+
+def get_current_artifacts(model_dir, manifest=None):
+    """
+    Map each condition to the path of its current artifact.
+
+    Returns:
+        dict: Condition code -> artifact path, or None if there is no manifest
+    """
+    if manifest is None:
+        manifest = read_manifest(model_dir)
+    if manifest is None:
+        return None
+    return {
+        condition: os.path.join(model_dir, entry['artifact'])
+        for condition, entry in manifest.get('conditions', {}).items()
+    }
+
+
+def get_fused_artifact(model_dir, manifest=None):
+    """
+    Return the path of the current fused multi-label artifact.
+
+    Returns:
+        str: Artifact path, or None if no fused model is registered
+    """
+    if manifest is None:
+        manifest = read_manifest(model_dir)
+    if manifest is None:
+        return None
+    entry = manifest.get('fused', {}).get(FUSED_MODEL_KEY)
+    if entry is None:
+        return None
+    return os.path.join(model_dir, entry['artifact'])
@@ -0,0 +1,119 @@
+"""
+Inference-only predictors for the web application.
+
+Restores the artifacts written by ``ChronicConditionPredictor.save_model`` and
+``MultiConditionPredictor.save_model`` without importing the training module,
+so serving processes never load matplotlib, seaborn or the sklearn
+metrics/model-selection stack. Unpickling the forest still imports the
+sklearn estimator classes it references, nothing more.
+"""
+
+import os
+import joblib
+import numpy as np
+
+
+class ServingPredictor:
+    """Loaded per-condition model with only what prediction needs."""
+
+    def __init__(self):
+        self.model = None
+        self.imputer = None
+        self.feature_names = None
+        self.target_column = None
+        self.optimal_threshold = 0.5
+        self.model_version = "1.0"
+        self.training_date = None
+
+    def _restore_model_data(self, model_data):
+        self.model = model_data['model']
+        self.imputer = model_data['imputer']
+        self.feature_names = model_data['feature_names']
+        self.target_column = model_data['target_column']
+        self.optimal_threshold = model_data['optimal_threshold']
+        self.model_version = model_data.get('model_version', '1.0')
+        self.training_date = model_data.get('training_date', 'Unknown')
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        predictor = cls()
+        predictor._restore_model_data(model_data)
+        return predictor
+
+    @classmethod
+    def load_from_file(cls, model_path):
+        """
+        Load a saved model artifact for serving.
+
+        Args:
+            model_path (str): Path to the saved model file
+
+        Returns:
+            ServingPredictor: Loaded predictor, or None if loading failed
+        """
+        try:
+            if not os.path.exists(model_path):
+                print(f"Error: Model file not found at {model_path}")
+                return None
+            predictor = cls.from_model_data(joblib.load(model_path))
+            print(f"Model loaded for serving from: {model_path}")
+            return predictor
+        except Exception as e:
+            print(f"Error loading model: {str(e)}")
+            return None
+
+    def predict_proba_imputed(self, X_imputed):
+        """Positive-class probabilities for rows that already went through the imputer."""
+        return self.model.predict_proba(X_imputed)[:, 1]
+
+    def predict_new_sample(self, new_data):
+        if self.model is None:
+            print("Model not loaded.")
+            return None
+
+        new_data_imputed = self.imputer.transform(new_data)
+        proba = self.predict_proba_imputed(new_data_imputed)
+        predictions = (proba >= self.optimal_threshold).astype(int)
+
+        return predictions, proba
+
+
+class MultiConditionServingPredictor(ServingPredictor):
+    """Loaded fused multi-label model with per-condition thresholds."""
+
+    def __init__(self):
+        super().__init__()
+        self.target_columns = []
+        self.optimal_thresholds = {}
+
+    def _restore_model_data(self, model_data):
+        super()._restore_model_data(model_data)
+        self.target_columns = model_data['target_columns']
+        self.optimal_thresholds = model_data['optimal_thresholds']
+
+    def predict_proba_imputed(self, X_imputed):
+        """
+        Positive-class probabilities for every target.
+
+        Returns:
+            numpy.ndarray: Array of shape (n_rows, n_targets)
+        """
+        per_target = self.model.predict_proba(X_imputed)
+        columns = []
+        for classes, proba in zip(self.model.classes_, per_target):
+            positive = np.flatnonzero(classes == 1)
+            columns.append(proba[:, positive[0]] if len(positive) else np.zeros(len(proba)))
+        return np.column_stack(columns)
+
+    def predict_new_sample(self, new_data):
+        if self.model is None:
+            print("Model not loaded.")
+            return None
+
+        new_data_imputed = self.imputer.transform(new_data)
+        proba = self.predict_proba_imputed(new_data_imputed)
+        thresholds = np.array([self.optimal_thresholds[col] for col in self.target_columns])
+        predictions = (proba >= thresholds).astype(int)
+
+        return predictions, proba
+
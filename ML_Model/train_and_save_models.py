@@ -6,15 +6,35 @@ This creates joblib files that can be quickly loaded in the web application.
 
 import os
 import sys
+import time
 from datetime import datetime
 
+from sklearn.metrics import f1_score, accuracy_score, roc_auc_score
+
 # Add the parent directory to the path so we can import from ML_Model
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ML_Model.Model import ChronicConditionPredictor
+from ML_Model.Model import ChronicConditionPredictor, MultiConditionPredictor, search_optimal_threshold
+from ML_Model.forest_compression import tune_forest_size, DEFAULT_F1_TOLERANCE, DEFAULT_AUC_TOLERANCE
 
-def train_and_save_all_models():
-    """Train and save models for all available chronic conditions."""
+def train_and_save_all_models(keep_versions=2, conditions=None, progress=None, compress=True,
+                              f1_tolerance=DEFAULT_F1_TOLERANCE, auc_tolerance=DEFAULT_AUC_TOLERANCE):
+    """
+    Train and save models for all available chronic conditions.
+    
+    Args:
+        keep_versions (int): Artifacts to keep per condition (0 keeps all)
+        conditions (list): Only train these condition codes (default: all)
+        progress (callable): ``progress(condition, status, error)`` called with
+            'pending', 'training', 'done' or 'failed' as each model advances
+        compress (bool): Train each forest with the fewest trees and shallowest
+            depth that keep validation F1/AUC within tolerance
+        f1_tolerance (float): Largest accepted F1 loss from compression
+        auc_tolerance (float): Largest accepted AUC loss from compression
+    """
+    def report(condition, status, error=None):
+        if progress is not None:
+            progress(condition, status, error)
     
     print("=== Chronic Conditions ML Model Training & Saving ===")
     print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -29,11 +49,20 @@ def train_and_save_all_models():
     
     if df is None:
         print("ERROR: Could not load data. Please check the file path.")
+        for ccc in conditions or []:
+            report(ccc, 'failed', 'Could not load training data')
         return False
     
     # Get available chronic conditions
     available_cccs = [col for col in predictor.ccc_columns if col in df.columns]
+    if conditions is not None:
+        for ccc in conditions:
+            if ccc not in available_cccs:
+                report(ccc, 'failed', 'Condition not found in training data')
+        available_cccs = [ccc for ccc in available_cccs if ccc in conditions]
     print(f"\nFound {len(available_cccs)} chronic conditions to train: {available_cccs}")
+    for ccc in available_cccs:
+        report(ccc, 'pending')
     
     results = []
     saved_models = []
@@ -43,38 +72,54 @@ def train_and_save_all_models():
         print(f"TRAINING MODEL {i}/{len(available_cccs)}: {ccc}")
         print(f"{'='*60}")
         
+        report(ccc, 'training')
         try:
             # Prepare features and target for this condition
             X, y = predictor.prepare_features_and_target(df, ccc)
             
+            # Pick the smallest forest within the accuracy tolerance on a
+            # validation split, then train it on every training row
+            forest_size = {}
+            if compress:
+                forest_size = tune_forest_size(predictor, X, y, f1_tolerance=f1_tolerance,
+                                               auc_tolerance=auc_tolerance)
+            
             # Train the model
-            X_test, y_test = predictor.train_model(X, y)
+            X_test, y_test = predictor.train_model(X, y, **forest_size)
             
             if X_test is not None:
                 # Save the trained model
-                model_path = predictor.save_model()
+                model_path = predictor.save_model(keep_versions=keep_versions)
                 saved_models.append(model_path)
                 
                 # Get model performance
                 y_proba = predictor.model.predict_proba(X_test)[:, 1]
                 y_pred = (y_proba >= predictor.optimal_threshold).astype(int)
                 
-                from sklearn.metrics import f1_score, accuracy_score, roc_auc_score
                 f1 = f1_score(y_test, y_pred, zero_division=0)
                 accuracy = accuracy_score(y_test, y_pred)
                 auc = roc_auc_score(y_test, y_proba) if len(set(y_test)) > 1 else 0
                 
+                latency = measure_predict_latency(
+                    lambda row: predictor.model.predict_proba(row), X_test[:1]
+                )
+                
                 results.append({
                     'condition': ccc,
                     'f1_score': f1,
                     'accuracy': accuracy,
                     'auc': auc,
                     'threshold': predictor.optimal_threshold,
+                    'n_trees': len(predictor.model.estimators_),
+                    'max_depth': max(e.tree_.max_depth for e in predictor.model.estimators_),
+                    'artifact_mb': os.path.getsize(model_path) / (1024 * 1024),
+                    'latency_ms': latency,
                     'model_path': model_path,
                     'status': 'SUCCESS'
                 })
                 
                 print(f"✅ SUCCESS: Model saved for {ccc}")
+                report(ccc, 'done')
                 
             else:
                 results.append({
@@ -83,35 +128,48 @@ def train_and_save_all_models():
                     'accuracy': 0,
                     'auc': 0,
                     'threshold': 0.5,
+                    'n_trees': 0,
+                    'max_depth': 0,
+                    'artifact_mb': 0,
+                    'latency_ms': 0,
                     'model_path': None,
                     'status': 'FAILED - Training failed'
                 })
                 print(f"❌ FAILED: Could not train model for {ccc}")
+                report(ccc, 'failed', 'Training failed')
                 
         except Exception as e:
             print(f"❌ ERROR training {ccc}: {str(e)}")
+            report(ccc, 'failed', str(e))
             results.append({
                 'condition': ccc,
                 'f1_score': 0,
                 'accuracy': 0,
                 'auc': 0,
                 'threshold': 0.5,
+                'n_trees': 0,
+                'max_depth': 0,
+                'artifact_mb': 0,
+                'latency_ms': 0,
                 'model_path': None,
                 'status': f'ERROR: {str(e)}'
             })
     
     # Print summary
-    print(f"\n{'='*80}")
+    print(f"\n{'='*120}")
     print("TRAINING SUMMARY")
-    print(f"{'='*80}")
-    print(f"{'Condition':<12} {'Status':<20} {'F1':<8} {'Accuracy':<10} {'AUC':<8} {'Threshold':<10}")
-    print(f"{'-'*80}")
+    print(f"{'='*120}")
+    print(f"{'Condition':<12} {'Status':<20} {'F1':<8} {'Accuracy':<10} {'AUC':<8} {'Threshold':<10} "
+          f"{'Trees':<7} {'Depth':<7} {'Size(MB)':<10} {'Latency(ms)':<12}")
+    print(f"{'-'*120}")
     
     successful_models = 0
     for result in results:
         status_display = result['status'][:18] + ".." if len(result['status']) > 20 else result['status']
         print(f"{result['condition']:<12} {status_display:<20} {result['f1_score']:<8.3f} "
-              f"{result['accuracy']:<10.3f} {result['auc']:<8.3f} {result['threshold']:<10.3f}")
+              f"{result['accuracy']:<10.3f} {result['auc']:<8.3f} {result['threshold']:<10.3f} "
+              f"{result['n_trees']:<7} {result['max_depth']:<7} {result['artifact_mb']:<10.2f} "
+              f"{result['latency_ms']:<12.2f}")
         if result['status'] == 'SUCCESS':
             successful_models += 1
     
@@ -128,6 +186,115 @@ def train_and_save_all_models():
     
     return successful_models > 0
 
+def measure_predict_latency(predict_fn, X_row, repeats=50):
+    """Median wall-clock latency in milliseconds of one single-row prediction."""
+    predict_fn(X_row)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_fn(X_row)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def train_and_save_multilabel_model(keep_versions=2, compare=True):
+    """
+    Train and save one multi-label model covering every chronic condition.
+    
+    With ``compare`` enabled, per-condition forests are fitted on the same
+    train split and both approaches are reported side by side (F1, accuracy,
+    AUC and single-row predict latency) to decide which one to deploy.
+    
+    Args:
+        keep_versions (int): Artifacts to keep (0 keeps all)
+        compare (bool): Also fit per-condition models for the comparison report
+    """
+    print("=== Fused Multi-Label Model Training & Saving ===")
+    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+    
+    predictor = MultiConditionPredictor(enable_plotting=False)
+    
+    print("Loading and preprocessing data...")
+    df = predictor.load_and_preprocess_data()
+    
+    if df is None:
+        print("ERROR: Could not load data. Please check the file path.")
+        return False
+    
+    X, Y = predictor.prepare_features_and_targets(df)
+    
+    try:
+        X_test, Y_test = predictor.train_model(X, Y)
+    except ValueError as e:
+        print(f"❌ ERROR training fused model: {str(e)}")
+        return False
+    
+    model_path = predictor.save_model(keep_versions=keep_versions)
+    print(f"✅ SUCCESS: Fused model saved to {os.path.basename(model_path)}")
+    
+    fused_proba = predictor.predict_proba_imputed(X_test)
+    fused_latency = measure_predict_latency(predictor.predict_proba_imputed, X_test[:1])
+    
+    per_condition = {}
+    per_condition_latency = None
+    if compare:
+        # Same rows as the fused model: fit on train, threshold on validation
+        X_train, X_val, _, Y_train, Y_val, _ = predictor.split_data(X, Y)
+        X_train_imputed = predictor.imputer.transform(X_train)
+        X_val_imputed = predictor.imputer.transform(X_val)
+        
+        forests = []
+        for col in predictor.target_columns:
+            print(f"Fitting per-condition comparison model for {col}...")
+            single = ChronicConditionPredictor(enable_plotting=False)
+            if not single.analyze_class_balance(Y_train[col].values):
+                continue
+            forest = single.build_forest(single.class_weights)
+            forest.fit(X_train_imputed, Y_train[col].values)
+            forests.append(forest)
+            
+            threshold, _ = search_optimal_threshold(
+                Y_val[col].values, forest.predict_proba(X_val_imputed)[:, 1]
+            )
+            per_condition[col] = (forest.predict_proba(X_test)[:, 1], threshold)
+        
+        per_condition_latency = measure_predict_latency(
+            lambda row: [forest.predict_proba(row) for forest in forests], X_test[:1]
+        )
+    
+    def scores(y_true, proba, threshold):
+        y_pred = (proba >= threshold).astype(int)
+        auc = roc_auc_score(y_true, proba) if len(set(y_true)) > 1 else 0
+        return f1_score(y_true, y_pred, zero_division=0), accuracy_score(y_true, y_pred), auc
+    
+    print(f"\n{'='*80}")
+    print("FUSED vs PER-CONDITION COMPARISON")
+    print(f"{'='*80}")
+    print(f"{'Condition':<12} {'Fused F1':<10} {'Fused Acc':<10} {'Fused AUC':<10} "
+          f"{'Single F1':<10} {'Single Acc':<11} {'Single AUC':<10}")
+    print(f"{'-'*80}")
+    
+    for i, col in enumerate(predictor.target_columns):
+        y_true = Y_test[col].values
+        f1, accuracy, auc = scores(y_true, fused_proba[:, i], predictor.optimal_thresholds[col])
+        line = f"{col:<12} {f1:<10.3f} {accuracy:<10.3f} {auc:<10.3f} "
+        if col in per_condition:
+            proba, threshold = per_condition[col]
+            f1, accuracy, auc = scores(y_true, proba, threshold)
+            line += f"{f1:<10.3f} {accuracy:<11.3f} {auc:<10.3f}"
+        else:
+            line += f"{'-':<10} {'-':<11} {'-':<10}"
+        print(line)
+    
+    print(f"\n⏱️  Single-row predict latency:")
+    print(f"   Fused model ({len(predictor.target_columns)} targets): {fused_latency:.2f} ms")
+    if per_condition_latency is not None:
+        print(f"   Per-condition models ({len(per_condition)} forests): {per_condition_latency:.2f} ms")
+    print(f"   Serve the fused model with MEDINATOR_SERVING_MODEL=fused")
+    
+    return True
+
 def load_and_test_model(model_path):
     """Test loading a saved model and making a prediction."""
     
@@ -158,6 +325,28 @@ def load_and_test_model(model_path):
         print(f"   Probability: {probabilities[0]:.3f}")
         print(f"   Prediction: {'Has condition' if predictions[0] == 1 else 'No condition'}")
         
+        # Check the compiled NumPy engine against sklearn
+        from ML_Model.forest_engine import CompiledForest
+        engine = CompiledForest.from_predictor(predictor)
+        sample = X.iloc[:1000][predictor.feature_names].to_numpy(dtype=float)
+        drift = engine.max_drift(predictor, sample)
+        sklearn_latency = measure_predict_latency(
+            lambda row: predictor.predict_proba_imputed(predictor.imputer.transform(row)), sample[:1]
+        )
+        engine_latency = measure_predict_latency(engine.predict_proba, sample[:1])
+        print(f"⚙️  Compiled engine: {engine.n_trees} trees, {engine.n_nodes} nodes, depth {engine.depth}")
+        print(f"   Max probability drift vs sklearn: {drift:.2e}")
+        print(f"   Single-row latency: sklearn {sklearn_latency:.2f} ms, compiled {engine_latency:.2f} ms")
+        
+        # Reduced-precision node storage used by the model bundle
+        from ML_Model.forest_engine import compact_verified
+        compacted, compact_drift, kept = compact_verified(predictor, rows=sample, engine=engine)
+        compact_latency = measure_predict_latency(compacted.predict_proba, sample[:1])
+        print(f"🗜️  Compact engine{'' if kept else ' (rejected, full precision)'}: "
+              f"{engine.nbytes / (1024 * 1024):.1f} MB -> {compacted.nbytes / (1024 * 1024):.1f} MB "
+              f"({', '.join(f'{k}={v}' for k, v in compacted.dtypes.items())})")
+        print(f"   Max probability drift vs sklearn: {compact_drift:.2e}, single-row latency {compact_latency:.2f} ms")
+        
         return True
     
     return False
@@ -168,15 +357,53 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Train and save ML models for chronic conditions')
     parser.add_argument('--test-model', type=str, help='Path to a saved model to test loading')
     parser.add_argument('--condition', type=str, help='Train only a specific condition (e.g., CCC_035)')
+    parser.add_argument('--keep-versions', type=int, default=2,
+                        help='Artifacts to keep per condition, older ones are deleted (0 keeps all)')
+    parser.add_argument('--rebuild-manifest', action='store_true',
+                        help='Rebuild the model manifest from the artifacts on disk and exit')
+    parser.add_argument('--multilabel', action='store_true',
+                        help='Train one fused multi-label model for all conditions')
+    parser.add_argument('--no-compare', action='store_true',
+                        help='With --multilabel, skip the per-condition comparison report')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='Keep the full 200-tree, depth-15 forests')
+    parser.add_argument('--f1-tolerance', type=float, default=DEFAULT_F1_TOLERANCE,
+                        help='Largest holdout F1 loss accepted when compressing a forest')
+    parser.add_argument('--auc-tolerance', type=float, default=DEFAULT_AUC_TOLERANCE,
+                        help='Largest holdout AUC loss accepted when compressing a forest')
+    parser.add_argument('--bundle', action='store_true',
+                        help='Also write the memory-mappable model bundle after training (an existing bundle is always rebuilt)')
     
     args = parser.parse_args()
     
-    if args.test_model:
+    if args.rebuild_manifest:
+        from ML_Model.model_manifest import rebuild_manifest
+        models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_models")
+        manifest = rebuild_manifest(models_dir)
+        print(f"Manifest rebuilt with {len(manifest['conditions'])} conditions: {sorted(manifest['conditions'])}")
+    elif args.multilabel:
+        if train_and_save_multilabel_model(keep_versions=args.keep_versions, compare=not args.no_compare):
+            print(f"\n🎉 Fused model training completed successfully!")
+        else:
+            print(f"\n⚠️  Fused model training failed.")
+    elif args.test_model:
         # Test loading a specific model
         load_and_test_model(args.test_model)
     else:
         # Train and save all models
-        success = train_and_save_all_models()
+        success = train_and_save_all_models(
+            keep_versions=args.keep_versions,
+            conditions=[args.condition] if args.condition else None,
+            compress=not args.no_compress,
+            f1_tolerance=args.f1_tolerance,
+            auc_tolerance=args.auc_tolerance
+        )
+        
+        models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_models")
+        from ML_Model.model_bundle import convert_artifacts, get_bundle_path
+        # An existing bundle would otherwise keep pointing at the superseded artifacts
+        if success and (args.bundle or os.path.exists(get_bundle_path(models_dir))):
+            convert_artifacts(models_dir)
         
         if success:
             print(f"\n🎉 Training completed successfully!")
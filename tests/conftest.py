@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# BackEnd modules import each other by flat name, ML_Model is a package at the root
+for path in (ROOT, os.path.join(ROOT, 'BackEnd')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Several BackEnd modules read their settings once at import time, and any test
+# module may be the first to import them: set the defaults before collection.
+# No Gemini calls, no training on startup, in-memory analysis cache and jobs.
+os.environ.setdefault('MEDINATOR_LLM_BACKEND', 'stub')
+os.environ.setdefault('MEDINATOR_TRAIN_ON_STARTUP', '0')
+os.environ.setdefault('MEDINATOR_ANALYSIS_CACHE', '')
+os.environ.setdefault('MEDINATOR_ANALYSIS_JOBS', '')
+
+
+@pytest.fixture
+def trained_models_dir(tmp_path, monkeypatch):
+    """
+    Two small real condition models saved to a temporary models directory,
+    which ml_utils then serves as its default.
+    """
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("sklearn")
+    from sklearn.ensemble import RandomForestClassifier
+
+    import ml_utils
+    from feature_mapping import GENERATED_FEATURES
+    from ML_Model.Model import ChronicConditionPredictor
+
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 4, size=(300, len(GENERATED_FEATURES))).astype(float)
+    for seed, condition in enumerate(('CCC_035', 'CCC_065')):
+        y = (X[:, seed] + X[:, seed + 1] + rng.random(300) > 3).astype(int)
+        predictor = ChronicConditionPredictor(enable_plotting=False)
+        predictor.feature_names = list(GENERATED_FEATURES)
+        predictor.target_column = condition
+        predictor.model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=seed).fit(
+            predictor.imputer.fit_transform(X), y
+        )
+        predictor.save_model(model_dir=str(tmp_path))
+
+    monkeypatch.setattr(ml_utils, 'get_default_models_dir', lambda: str(tmp_path))
+    ml_utils.get_prediction_cache().clear()
+    yield tmp_path
+    ml_utils.get_prediction_cache().clear()
@@ -0,0 +1,142 @@
+import json
+
+from analysis_cache import AnalysisCache, make_analysis_cache_key
+
+ASSESSMENT = {'age': 45, 'gender': 'Female', 'question4': 'Former smoker'}
+PREDICTIONS = {'CCC_035': {'probability': 0.34, 'risk_level': 'Moderate'},
+               'CCC_065': {'probability': 0.12, 'risk_level': 'Low'}}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_cache(tmp_path, **kwargs):
+    clock = Clock()
+    cache = AnalysisCache(str(tmp_path / 'analysis_cache.sqlite3'), clock=clock, **kwargs)
+    return cache, clock
+
+
+def analysis(text):
+    return {'summary': text}
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    assert cache.get('a') is None
+    cache.put('a', analysis('first'))
+    assert cache.get('a') == analysis('first')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+    assert stats['entries'] == 1
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache, clock = make_cache(tmp_path, ttl_seconds=60)
+    cache.put('a', analysis('first'))
+
+    clock.advance(59)
+    assert cache.get('a') == analysis('first')
+    clock.advance(2)
+    assert cache.get('a') is None
+
+    stats = cache.stats()
+    assert stats['expired'] == 1
+    assert stats['entries'] == 0
+
+
+def test_expired_entries_are_dropped_on_write(tmp_path):
+    cache, clock = make_cache(tmp_path, ttl_seconds=60)
+    cache.put('old', analysis('old'))
+    clock.advance(61)
+    cache.put('new', analysis('new'))
+
+    assert cache.stats()['entries'] == 1
+    assert cache.expired == 1
+
+
+def test_least_recently_used_entry_is_evicted_first(tmp_path):
+    cache, clock = make_cache(tmp_path, max_entries=2)
+    cache.put('a', analysis('a'))
+    clock.advance(1)
+    cache.put('b', analysis('b'))
+    clock.advance(1)
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get('a') is not None
+    clock.advance(1)
+    cache.put('c', analysis('c'))
+
+    assert cache.get('b') is None
+    assert cache.get('a') == analysis('a')
+    assert cache.get('c') == analysis('c')
+    assert cache.evictions == 1
+
+
+def test_size_cap_evicts_until_the_total_fits(tmp_path):
+    entry_size = len(json.dumps(analysis('x' * 100)))
+    cache, clock = make_cache(tmp_path, max_bytes=entry_size * 2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, analysis('x' * 100))
+        clock.advance(1)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= entry_size * 2
+    assert cache.get('a') is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnalysisCache('')
+    cache.put('a', analysis('a'))
+    assert cache.get('a') is None
+    assert cache.stats()['enabled'] is False
+
+
+def test_cache_survives_a_new_instance(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    cache.put('a', analysis('a'))
+    reopened, _ = make_cache(tmp_path)
+    assert reopened.get('a') == analysis('a')
+
+
+def test_key_ignores_ordering_and_formatting():
+    key = make_analysis_cache_key(ASSESSMENT, PREDICTIONS, 'gemini')
+
+    reordered = {'CCC_065': {'risk_level': 'Low', 'probability': 0.12},
+                 'CCC_035': {'risk_level': 'Moderate', 'probability': 0.34}}
+    assert make_analysis_cache_key(ASSESSMENT, reordered, 'gemini') == key
+
+    reformatted = {'question4': '  Former   smoker ', 'gender': 'Female', 'age': '45'}
+    assert make_analysis_cache_key(reformatted, PREDICTIONS, 'gemini') == key
+
+    # Below the 4-decimal precision of the key
+    jittered = {'CCC_035': {'probability': 0.340001, 'risk_level': 'Moderate'},
+                'CCC_065': {'probability': 0.12, 'risk_level': 'Low'}}
+    assert make_analysis_cache_key(ASSESSMENT, jittered, 'gemini') == key
+
+
+def test_key_changes_with_the_inputs():
+    key = make_analysis_cache_key(ASSESSMENT, PREDICTIONS, 'gemini')
+    changed = dict(PREDICTIONS, CCC_035={'probability': 0.35, 'risk_level': 'Moderate'})
+
+    assert make_analysis_cache_key(ASSESSMENT, changed, 'gemini') != key
+    assert make_analysis_cache_key(dict(ASSESSMENT, age=46), PREDICTIONS, 'gemini') != key
+    assert make_analysis_cache_key(ASSESSMENT, PREDICTIONS, 'other-model') != key
+
+
+def test_prompt_version_bump_invalidates_old_entries(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    old_key = make_analysis_cache_key(ASSESSMENT, PREDICTIONS, 'gemini', prompt_version=1)
+    cache.put(old_key, analysis('old prompt'))
+
+    new_key = make_analysis_cache_key(ASSESSMENT, PREDICTIONS, 'gemini', prompt_version=2)
+    assert new_key != old_key
+    assert cache.get(new_key) is None
@@ -0,0 +1,82 @@
+import time
+import threading
+
+from analysis_jobs import AnalysisJobQueue, DONE, FAILED
+from llm_client import PooledLLMClient, StubBackend
+
+
+def analyze(client, prompt):
+    return {"analysis": client.generate_content(prompt).text, "status": "success"}
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job is not None and job['status'] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_poll_done(tmp_path):
+    queue = AnalysisJobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=2)
+    client = PooledLLMClient(StubBackend(latency=0.05))
+
+    job_id = queue.submit(analyze, client, "Summarise these predictions")
+    assert queue.get(job_id)['status'] in ('queued', 'running')
+
+    job = wait_for(queue, job_id)
+    assert job['status'] == DONE
+    assert job['result']['status'] == 'success'
+    assert job['result']['analysis'].startswith('Stub analysis')
+    assert job['finished_at'] >= job['started_at'] >= job['created_at']
+    assert queue.stats()['completed'] == 1
+
+
+def test_failed_job_reports_error(tmp_path):
+    queue = AnalysisJobQueue(str(tmp_path / 'jobs.sqlite3'))
+    client = PooledLLMClient(StubBackend(error_rate=1.0), max_retries=0)
+
+    job = wait_for(queue, queue.submit(analyze, client, "prompt"))
+    assert job['status'] == FAILED
+    assert 'Stub backend failure' in job['error']
+    assert job['result'] is None
+    assert queue.stats()['failed'] == 1
+
+
+def test_another_worker_can_answer_the_poll(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    running = AnalysisJobQueue(path)
+    polled = AnalysisJobQueue(path)
+
+    job_id = running.submit(analyze, PooledLLMClient(StubBackend()), "prompt")
+    wait_for(running, job_id)
+    job = polled.get(job_id)
+    assert job['status'] == DONE
+    assert job['result']['analysis']
+    assert polled.get('unknown') is None
+
+
+def test_full_queue_rejects_and_results_expire(tmp_path):
+    queue = AnalysisJobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1, max_pending=1, result_ttl=0.1)
+
+    first = queue.submit(time.sleep, 0.1)
+    assert queue.submit(time.sleep, 0) is None
+    assert queue.stats()['rejected'] == 1
+
+    # Running longer than result_ttl does not expire an unfinished job
+    wait_for(queue, first)
+    time.sleep(0.15)
+    assert queue.get(first) is None
+
+
+def test_jobs_that_never_finish_are_forgotten(tmp_path):
+    queue = AnalysisJobQueue(str(tmp_path / 'jobs.sqlite3'), max_workers=1, result_ttl=60, orphan_ttl=0.1)
+    release = threading.Event()
+
+    job_id = queue.submit(release.wait, 5)
+    assert queue.get(job_id)['status'] in ('queued', 'running')
+    time.sleep(0.15)
+    assert queue.get(job_id) is None
+    release.set()
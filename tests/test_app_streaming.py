@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("pandas")
+
+import app as medinator  # noqa: E402
+
+DIAGNOSIS = {'diabetes': {'risk_probability': 0.8}, 'kidney': {'risk_probability': 0.2}}
+
+
+def events(response):
+    return [block.split('\n')[0][len('event: '):] for block in response.get_data(as_text=True).split('\n\n') if block]
+
+
+def test_streamed_turns_update_the_stored_session():
+    client = medinator.app.test_client()
+    response = client.post('/start-detective', json={
+        'diagnosis_data': DIAGNOSIS, 'user_assessment': {'age': 45}, 'stream': True
+    })
+    assert response.mimetype == 'text/event-stream'
+    assert events(response)[-1] == 'question'
+
+    session_id = next(iter(medinator.detective_sessions._sessions))
+    size_after_start = medinator.detective_sessions._sessions[session_id][2]
+    detective = medinator.detective_sessions.get(session_id)
+    assert detective.questions_asked == 1
+
+    response = client.post('/continue-detective', json={
+        'session_id': session_id, 'answer': 'Sometimes', 'stream': True
+    })
+    assert events(response)[-1] == 'question'
+    assert detective.questions_asked == 2
+    # Re-measured after the stream, not left at the size stored before the turn
+    assert medinator.detective_sessions._sessions[session_id][2] > size_after_start
+
+    client.post('/stop-detective', json={'session_id': session_id})
+    assert medinator.detective_sessions.get(session_id) is None
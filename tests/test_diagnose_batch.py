@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import app as medinator  # noqa: E402
+import ml_utils  # noqa: E402
+
+ANSWERS = [
+    {'age': 52, 'question1': '50-59', 'question4': 'Former smoker'},
+    {'age': 30, 'question4': 'Never smoked', 'question6': 'Active (5-6 days/week)'},
+]
+
+
+def post_batch(payload):
+    return medinator.app.test_client().post('/diagnose-batch', json=payload)
+
+
+def test_invalid_rows_are_reported_without_failing_the_batch(trained_models_dir):
+    response = post_batch({'assessments': [
+        {'answers': ANSWERS[0]}, 'not an object', {'answers': [1]}, {'answers': 'x'},
+        {'answers': {'age': 'forty'}}, ANSWERS[1]
+    ]})
+    assert response.status_code == 200
+
+    body = response.get_json()
+    assert body['scored_assessments'] == 2
+    assert body['failed_assessments'] == 4
+    results = body['results']
+    assert [row['index'] for row in results] == list(range(6))
+    for index in (1, 2, 3, 4):
+        assert results[index]['error'].startswith('Invalid assessment')
+    for index in (0, 5):
+        assert set(results[index]['predictions']) == {'CCC_035', 'CCC_065'}
+
+
+def test_batch_rows_match_single_diagnoses(trained_models_dir):
+    batch = post_batch({'assessments': [{'answers': answers} for answers in ANSWERS]}).get_json()
+
+    for answers, row in zip(ANSWERS, batch['results']):
+        ml_utils.get_prediction_cache().clear()
+        single = medinator.app.test_client().post('/diagnose', json={'answers': answers}).get_json()
+        assert row['total_conditions_analyzed'] == single['total_conditions_analyzed']
+        for condition, prediction in single['predictions'].items():
+            assert row['predictions'][condition]['probability'] == pytest.approx(prediction['probability'])
+            assert row['predictions'][condition]['prediction'] == prediction['prediction']
+
+
+def test_oversized_batches_are_rejected(monkeypatch):
+    monkeypatch.setattr(medinator, 'MAX_BATCH_SIZE', 3)
+    monkeypatch.setattr(medinator, 'MAX_BATCH_ANALYSES', 2)
+
+    response = post_batch({'assessments': [ANSWERS[0]] * 4})
+    assert response.status_code == 413
+    assert 'max 3' in response.get_json()['error']
+
+    response = post_batch({'assessments': [ANSWERS[0]] * 3, 'include_analysis': True})
+    assert response.status_code == 413
+    assert 'include_analysis' in response.get_json()['error']
+
+
+def test_empty_batch_is_a_bad_request():
+    assert post_batch({'assessments': []}).status_code == 400
+    assert post_batch({}).status_code == 400
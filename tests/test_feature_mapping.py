@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from feature_mapping import (AGE_CAP, AGE_FEATURE, DEFAULT_AGE, GENERATED_FEATURES, build_feature_row,  # noqa: E402
+                             build_feature_rows, canonical_answer_key, coerce_age, get_feature_template,
+                             is_column_table)
+
+ANSWERS = {'question1': '50-59', 'question2': 'Female', 'question4': 'Former smoker', 'age': 52}
+
+
+@pytest.mark.parametrize('raw, expected', [
+    (30, 30.0), ('30', 30.0), (52, AGE_CAP), (None, DEFAULT_AGE), ('', DEFAULT_AGE),
+    ('unknown', DEFAULT_AGE), (float('nan'), DEFAULT_AGE),
+])
+def test_coerce_age(raw, expected):
+    assert coerce_age(raw) == expected
+
+
+@pytest.mark.parametrize('age', ['33', None, 'not a number', 61])
+def test_single_row_and_matrix_agree_on_age(age):
+    template = get_feature_template(GENERATED_FEATURES)
+    answers = dict(ANSWERS, age=age)
+    row = template.build_row(answers)
+    matrix = template.build_matrix([answers])
+    np.testing.assert_array_equal(row, matrix[0])
+    assert row[GENERATED_FEATURES.index(AGE_FEATURE)] == coerce_age(age)
+
+
+def test_canonical_key_accepts_string_and_missing_ages():
+    assert canonical_answer_key(dict(ANSWERS, age='30')) == canonical_answer_key(dict(ANSWERS, age=30))
+    assert canonical_answer_key(dict(ANSWERS, age=None))['age'] == DEFAULT_AGE
+
+
+def test_single_user_with_a_list_answer_is_one_row():
+    answers = dict(ANSWERS, concerns=['sleep', 'energy'], question4=['Former smoker'])
+    assert not is_column_table(answers)
+    rows = build_feature_rows(answers, GENERATED_FEATURES)
+    assert rows.shape == (1, len(GENERATED_FEATURES))
+    # An unrecognised (list) answer falls back to the defaults
+    expected = build_feature_row(dict(ANSWERS, question4=''), GENERATED_FEATURES)
+    np.testing.assert_array_equal(rows, expected)
+
+
+def test_column_table_is_one_row_per_user():
+    table = {'question1': ['18-29', '60+', '40-49'], 'age': [25, '70', None]}
+    assert is_column_table(table)
+    rows = build_feature_rows(table, GENERATED_FEATURES)
+    assert rows.shape == (3, len(GENERATED_FEATURES))
+    assert list(rows[:, GENERATED_FEATURES.index(AGE_FEATURE)]) == [25, AGE_CAP, DEFAULT_AGE]
+
+
+def test_build_feature_row_rejects_tables():
+    with pytest.raises(TypeError):
+        build_feature_row([ANSWERS], GENERATED_FEATURES)
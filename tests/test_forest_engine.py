@@ -0,0 +1,151 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import RandomForestClassifier  # noqa: E402
+from sklearn.impute import SimpleImputer  # noqa: E402
+
+from ML_Model.forest_engine import CompiledForest, DEFAULT_MAX_DRIFT, compact_verified  # noqa: E402
+
+
+class Predictor:
+    """The parts of ChronicConditionPredictor the engine reads."""
+
+    def __init__(self, model, imputer):
+        self.model = model
+        self.imputer = imputer
+
+    def predict_proba_imputed(self, X_imputed):
+        proba = self.model.predict_proba(X_imputed)
+        if isinstance(proba, list):
+            return np.column_stack([p[:, 1] for p in proba])
+        return proba[:, 1]
+
+
+def make_data(rows=400, features=6, integer=True, seed=0):
+    rng = np.random.default_rng(seed)
+    if integer:
+        # Small integer codes like the CCHS answers, so splits fall on x.5
+        X = rng.integers(0, 6, size=(rows, features)).astype(np.float64)
+    else:
+        X = rng.normal(size=(rows, features))
+    y = ((X[:, 0] + X[:, 1] > X[:, 2] + 2) ^ (rng.random(rows) < 0.1)).astype(int)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+def make_predictor(X, y, **forest_options):
+    options = dict(n_estimators=20, max_depth=6, random_state=0)
+    options.update(forest_options)
+    imputer = SimpleImputer(strategy='median')
+    X_imputed = imputer.fit_transform(X)
+    forest = RandomForestClassifier(**options).fit(X_imputed, y)
+    return Predictor(forest, imputer)
+
+
+def sklearn_proba(predictor, X):
+    return predictor.predict_proba_imputed(predictor.imputer.transform(X))
+
+
+def test_engine_matches_sklearn_with_missing_values():
+    X, y = make_data()
+    predictor = make_predictor(X, y)
+    engine = CompiledForest.from_predictor(predictor)
+
+    rows = np.vstack([X, engine.sample_rows(500)])
+    np.testing.assert_allclose(engine.predict_proba(rows), sklearn_proba(predictor, rows), atol=1e-12)
+    np.testing.assert_allclose(engine.predict_proba(rows[0]), sklearn_proba(predictor, rows[:1]), atol=1e-12)
+
+
+def test_multi_output_engine_matches_sklearn():
+    X, y = make_data()
+    Y = np.column_stack([y, 1 - y, (np.nan_to_num(X[:, 3]) > 2).astype(int)])
+    predictor = make_predictor(X, Y)
+    engine = CompiledForest.from_predictor(predictor)
+
+    assert engine.n_outputs == 3
+    np.testing.assert_allclose(engine.predict_proba(X), sklearn_proba(predictor, X), atol=1e-12)
+
+
+def test_int16_thresholds_round_trip_as_doubled_half_integers():
+    X, y = make_data()
+    predictor = make_predictor(X, y)
+    engine = CompiledForest.from_predictor(predictor)
+    compacted = engine.compact(threshold_dtype='int16')
+
+    assert compacted.threshold.dtype == np.int16
+    assert compacted.threshold_scale == 2
+    np.testing.assert_array_equal(compacted.threshold / 2, engine.threshold)
+    assert compacted.nbytes < engine.nbytes
+
+    rows = engine.sample_rows()
+    assert compacted.max_drift(predictor, rows) <= DEFAULT_MAX_DRIFT
+    # Rows are scaled, not thresholds: every branch still goes the same way
+    np.testing.assert_array_equal(compacted._leaf_nodes(compacted.prepare(rows)),
+                                  engine._leaf_nodes(engine.prepare(rows)))
+
+    restored = CompiledForest.from_arrays(compacted.to_arrays())
+    assert restored.threshold_scale == 2
+    np.testing.assert_array_equal(restored.predict_proba(rows), compacted.predict_proba(rows))
+
+
+def test_int16_falls_back_to_float32_for_continuous_thresholds():
+    X, y = make_data(integer=False)
+    predictor = make_predictor(X, y)
+    compacted = CompiledForest.from_predictor(predictor).compact(threshold_dtype='int16')
+
+    assert compacted.threshold.dtype == np.float32
+    assert compacted.threshold_scale == 1
+    assert compacted.max_drift(predictor, X) <= DEFAULT_MAX_DRIFT
+
+
+@pytest.mark.parametrize('threshold_dtype,leaf_dtype', [('int16', 'float32'), ('float32', 'float16')])
+def test_compact_verified_stays_within_tolerance(threshold_dtype, leaf_dtype):
+    X, y = make_data()
+    predictor = make_predictor(X, y)
+
+    engine, drift, kept = compact_verified(predictor, threshold_dtype=threshold_dtype, leaf_dtype=leaf_dtype)
+
+    assert kept
+    assert drift <= DEFAULT_MAX_DRIFT
+    assert engine.value.dtype == np.dtype(leaf_dtype)
+    np.testing.assert_allclose(engine.predict_proba(X), sklearn_proba(predictor, X), atol=DEFAULT_MAX_DRIFT)
+
+
+def test_compact_verified_keeps_full_precision_when_drift_is_too_large():
+    X, y = make_data()
+    predictor = make_predictor(X, y)
+
+    engine, drift, kept = compact_verified(predictor, leaf_dtype='float16', max_drift=0.0, rows=X)
+
+    assert not kept
+    assert engine.threshold.dtype == np.float64
+    assert drift <= 1e-12
+
+
+def test_leaves_at_maximum_depth_are_reached():
+    X, y = make_data(rows=800)
+    # Unbalanced trees: some leaves sit at max_depth, others far above it
+    predictor = make_predictor(X, y, max_depth=8, min_samples_leaf=1)
+    engine = CompiledForest.from_predictor(predictor)
+    assert engine.depth == max(e.tree_.max_depth for e in predictor.model.estimators_) == 8
+
+    for compacted in (engine, engine.compact(threshold_dtype='int16')):
+        leaves = compacted._leaf_nodes(compacted.prepare(X))
+        # Every row ends on a leaf, including those that needed all depth steps
+        assert np.all(np.asarray(compacted.left)[leaves] == leaves)
+        np.testing.assert_allclose(compacted.predict_proba(X), sklearn_proba(predictor, X),
+                                   atol=DEFAULT_MAX_DRIFT)
+
+
+def test_single_leaf_trees_score_their_root():
+    X, y = make_data()
+    # No split is allowed, every tree is a lone leaf of depth 0
+    predictor = make_predictor(X, y, min_samples_split=len(X) + 1)
+    engine = CompiledForest.from_predictor(predictor)
+
+    assert engine.depth == 0
+    np.testing.assert_allclose(engine.predict_proba(X), sklearn_proba(predictor, X), atol=1e-12)
+    np.testing.assert_allclose(engine.compact(threshold_dtype='int16').predict_proba(X),
+                               sklearn_proba(predictor, X), atol=DEFAULT_MAX_DRIFT)
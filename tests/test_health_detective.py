@@ -0,0 +1,201 @@
+import pytest
+
+from health_detective import HealthDetective, Turn
+from llm_client import PooledLLMClient, StubBackend
+
+DIAGNOSIS = {
+    'diabetes': {'risk_probability': 0.9, 'risk_level': 'High'},
+    'cardiovascular': {'risk_probability': 0.5, 'risk_level': 'Moderate'},
+    'kidney': {'risk_probability': 0.1, 'risk_level': 'Low'},
+}
+PROFILE = {'age': 52, 'gender': 'Female'}
+
+
+@pytest.fixture
+def detective():
+    detective = HealthDetective('test', PooledLLMClient(StubBackend()))
+    detective.begin_investigation(DIAGNOSIS, PROFILE)
+    # Fixed order, begin_investigation jitters close risks
+    detective.conditions_to_investigate = ['diabetes', 'cardiovascular', 'kidney']
+    detective.current_condition = 'diabetes'
+    return detective
+
+
+def test_turn_index_matches_history(detective):
+    first = detective.ask_next_question()
+    assert first['current_condition'] == 'diabetes'
+    for _ in range(2):
+        assert 'question' in detective.process_answer('Yes, definitely')
+
+    result = detective.process_answer('No, never')
+    assert result['moving_to_next']
+    assert result['next_question']['current_condition'] == 'cardiovascular'
+    detective.process_answer('Sometimes')
+
+    for condition in ('diabetes', 'cardiovascular'):
+        expected = [turn for turn in detective.conversation_history if turn.condition == condition]
+        assert detective.turns_by_condition[condition] == expected
+        assert detective.condition_turn_count(condition) == len(expected)
+    assert detective.condition_turn_count('diabetes') == 3
+    assert detective.condition_turn_count() == 2
+    assert detective.condition_turn_count('kidney') == 0
+
+
+def test_move_to_next_condition_skips_investigated_and_wraps(detective):
+    detective.conditions_investigated['cardiovascular'] = True
+    detective.conditions_investigated['diabetes'] = True
+    detective.move_to_next_condition()
+    assert detective.current_condition == 'kidney'
+
+    detective.conditions_investigated['kidney'] = True
+    detective.move_to_next_condition()
+    assert detective.current_condition == 'diabetes'
+    assert list(detective.conditions_investigated) == ['cardiovascular', 'diabetes', 'kidney']
+
+
+def test_turns_are_slotted():
+    turn = Turn("Do you feel thirsty?", condition='diabetes')
+    assert not hasattr(turn, '__dict__')
+    assert turn.with_answer('Yes').to_dict() == {
+        'question': "Do you feel thirsty?", 'answer': 'Yes', 'condition': 'diabetes'
+    }
+    assert not hasattr(HealthDetective('s', None), '__dict__')
+
+
+class BrokenStreamBackend(StubBackend):
+    """Streams part of a question, then fails."""
+
+    def _stream(self, text):
+        yield from list(super()._stream(text))[:6]
+        raise RuntimeError("stream dropped")
+
+
+def stream(detective):
+    return list(detective.stream_next_question())
+
+
+def test_stream_sends_tokens_then_the_question(detective):
+    events = stream(detective)
+
+    assert [event for event, _ in events[-1:]] == ['question']
+    tokens = "".join(payload['text'] for event, payload in events if event == 'token')
+    question = events[-1][1]
+    assert tokens.strip() == question['question']
+    assert 'Options' not in tokens
+    assert question['served_by'] == 'llm_stream'
+    assert len(question['options']) == 5
+
+
+def test_stream_falls_back_when_the_prompt_cannot_be_built(detective, monkeypatch):
+    def broken_prompt(*args, **kwargs):
+        raise RuntimeError("prompt failed")
+
+    monkeypatch.setattr(HealthDetective, 'build_question_prompt', broken_prompt)
+    events = stream(detective)
+
+    assert [event for event, _ in events] == ['token', 'question']
+    assert events[-1][1]['served_by'] == 'fallback'
+
+
+def test_stream_failure_after_tokens_reports_an_error(detective):
+    detective.llm = PooledLLMClient(BrokenStreamBackend())
+    events = stream(detective)
+
+    assert events[0][0] == 'token'
+    assert events[-1][0] == 'error'
+    assert detective.questions_asked == 0
+
+
+def test_stream_answer_sends_assessment_before_next_question(detective):
+    stream(detective)
+    for _ in range(2):
+        detective.process_answer('Yes, definitely')
+
+    events = list(detective.stream_answer('Yes, definitely'))
+    kinds = [event for event, _ in events]
+    assert kinds[-2:] == ['assessment', 'question']
+    assert events[-1][1]['moving_to_next']
+    assert events[-1][1]['next_question']['current_condition'] == 'cardiovascular'
+    assert detective.condition_confidence['diabetes']['risk_level'] == 'low'
+
+
+def make_prefetching_detective(generate, latency=0.5):
+    from question_prefetch import QuestionPrefetcher
+
+    prefetcher = QuestionPrefetcher(generate, fan_out=5, budget=5)
+    detective = HealthDetective('prefetch', PooledLLMClient(StubBackend(latency=latency)), prefetcher)
+    detective.begin_investigation(DIAGNOSIS, PROFILE)
+    detective.record_question("Do you get thirsty at night?\nOptions: Yes|No")
+    return detective, prefetcher
+
+
+def test_prefetched_question_is_served():
+    detective, prefetcher = make_prefetching_detective(lambda prompt: "Prefetched?\nOptions: Yes|No")
+
+    result = detective.process_answer('Yes')
+    assert result['served_by'] == 'prefetch'
+    assert result['question'] == 'Prefetched?'
+    assert prefetcher.stats()['hits'] == 1
+
+
+def test_slow_prefetch_is_bounded_by_the_turn_deadline(monkeypatch):
+    import time
+    import health_detective
+
+    monkeypatch.setattr(health_detective, 'TURN_DEADLINE', 0.2)
+
+    def slow(prompt):
+        time.sleep(1.0)
+        return "Too late?\nOptions: Yes|No"
+
+    detective, prefetcher = make_prefetching_detective(slow)
+    started = time.monotonic()
+    result = detective.process_answer('Yes')
+
+    assert time.monotonic() - started < 0.6
+    assert result['served_by'] == 'fallback'
+    assert prefetcher.stats()['timeouts'] == 1
+
+
+def test_speculative_prompts_leave_the_detective_unchanged():
+    from prompt_builder import prompt_stats
+
+    prompts = []
+    detective, _ = make_prefetching_detective(lambda prompt: prompts.append(prompt) or "Next?\nOptions: Yes|No", latency=0)
+    # Long turns, so a prompt has to fold the oldest ones into the summary
+    for _ in range(4):
+        detective.process_answer('Yes, I notice it after every meal ' + 'and in the evening ' * 40)
+    folded = detective.history_summary.folded
+    counts = {condition: dict(kinds) for condition, kinds in detective.history_summary.counts.items()}
+    before = prompt_stats.stats().get('speculative_question', {}).get('prompts', 0)
+
+    detective.start_prefetch(['Yes', 'No'])
+    detective.discard_prefetch()
+
+    assert detective.history_summary.folded == folded
+    assert detective.history_summary.counts == counts
+    assert prompt_stats.stats()['speculative_question']['prompts'] == before + 2
+
+
+def test_assessment_and_next_question_run_concurrently():
+    import time
+
+    detective = HealthDetective('concurrent', PooledLLMClient(StubBackend(latency=0.3)))
+    detective.begin_investigation(DIAGNOSIS, PROFILE)
+    for _ in range(2):
+        detective.record_question("Do you get thirsty at night?\nOptions: Yes|No")
+        detective.record_answer('Yes')
+    detective.record_question("Do you get thirsty at night?\nOptions: Yes|No")
+    assessed = detective.current_condition
+
+    started = time.monotonic()
+    result = detective.process_answer('Yes')
+    elapsed = time.monotonic() - started
+
+    # Two 0.3s calls back to back would take 0.6s
+    assert elapsed < 0.5
+    assert result['assessment']['risk_level'] == 'low'
+    assert result['next_question']['served_by'] == 'llm'
+    assert result['next_question']['current_condition'] != assessed
+    assert detective.condition_confidence[assessed] is result['assessment']
+    assert assessed in detective.conditions_investigated
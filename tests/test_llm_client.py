@@ -0,0 +1,127 @@
+import time
+
+import pytest
+
+from llm_client import (
+    CircuitBreaker, CircuitOpenError, LLMError, LLMTimeoutError, PooledLLMClient, StubBackend
+)
+
+
+def make_client(backend, threshold=2, reset_timeout=30, **kwargs):
+    kwargs.setdefault('max_retries', 2)
+    kwargs.setdefault('backoff', 0)
+    return PooledLLMClient(backend, breaker=CircuitBreaker(threshold, reset_timeout), **kwargs)
+
+
+def test_retries_count_as_one_breaker_failure():
+    backend = StubBackend(fail_next=3)
+    client = make_client(backend, threshold=2)
+
+    with pytest.raises(LLMError):
+        client.generate_content("prompt")
+
+    assert backend.calls == 3
+    assert client.breaker.failures == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_threshold_logical_calls():
+    backend = StubBackend(error_rate=1.0)
+    client = make_client(backend, threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.generate_content("prompt")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    calls = backend.calls
+    with pytest.raises(CircuitOpenError):
+        client.generate_content("prompt")
+    assert backend.calls == calls
+    assert client.stats()['rejected_circuit_open'] == 1
+
+
+def test_half_open_trial_success_closes_breaker():
+    backend = StubBackend(fail_next=2)
+    client = make_client(backend, threshold=2, reset_timeout=0.05, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.generate_content("prompt")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert client.generate_content("prompt").text
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.breaker.failures == 0
+
+
+def test_half_open_trial_failure_reopens_breaker():
+    backend = StubBackend(fail_next=3)
+    client = make_client(backend, threshold=2, reset_timeout=0.05, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.generate_content("prompt")
+
+    time.sleep(0.06)
+    with pytest.raises(LLMError):
+        client.generate_content("prompt")
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.times_opened == 2
+
+
+def test_half_open_lets_a_single_trial_through():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_retries_within_a_half_open_trial_do_not_reject_themselves():
+    backend = StubBackend(fail_next=2)
+    client = make_client(backend, threshold=1, reset_timeout=0, max_retries=2)
+    client.breaker.record_failure()
+
+    assert client.generate_content("prompt").text
+    assert backend.calls == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_bounds_a_slow_call():
+    client = make_client(StubBackend(latency=0.5))
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        client.generate_content("prompt", timeout=0.1)
+    assert time.monotonic() - started < 0.4
+    assert client.stats()['timeouts'] == 1
+
+
+def test_submit_deadline_counts_time_spent_queued():
+    backend = StubBackend(latency=0.3)
+    # One upstream slot and two background threads, the third call queues
+    client = make_client(backend, max_concurrency=1)
+
+    first = client.submit("prompt", timeout=5)
+    second = client.submit("prompt", timeout=5)
+    third = client.submit("prompt", timeout=0.2)
+
+    with pytest.raises(LLMTimeoutError):
+        third.result(timeout=5)
+    assert first.result(timeout=5).text
+    assert second.result(timeout=5).text
+    assert backend.calls == 2
+
+
+def test_hedge_shares_the_callers_deadline():
+    client = make_client(StubBackend(latency=0.5))
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        client.generate_hedged("prompt", hedge_after=0.05, timeout=0.2)
+    assert time.monotonic() - started < 0.45
+    assert client.stats()['hedges_sent'] == 1
@@ -0,0 +1,110 @@
+import threading
+
+from model_bootstrap import ModelBootstrap, DONE, FAILED, TRAINING
+
+
+class FakeModels:
+    """Models directory stand-in that records the phase seen by each step."""
+
+    def __init__(self, available=(), trainable=()):
+        self.available = {condition: f'{condition}.joblib' for condition in available}
+        self.trainable = set(trainable)
+        self.phases = []
+        self.bootstrap = None
+
+    def locate(self):
+        self.phases.append(('locate', self.bootstrap.phase))
+        return dict(self.available)
+
+    def train(self, conditions, progress):
+        self.phases.append(('train', self.bootstrap.phase))
+        for condition in conditions or sorted(self.trainable):
+            progress(condition, TRAINING)
+            if condition in self.trainable:
+                self.available[condition] = f'{condition}.joblib'
+                progress(condition, DONE)
+            else:
+                progress(condition, FAILED, 'training failed')
+
+    def load(self, conditions):
+        self.phases.append(('load', self.bootstrap.phase))
+        return {condition: object() for condition in conditions}
+
+
+def make_bootstrap(models, **kwargs):
+    bootstrap = ModelBootstrap(models.locate, models.train, models.load, **kwargs)
+    models.bootstrap = bootstrap
+    return bootstrap
+
+
+def test_ready_without_training_when_models_exist():
+    models = FakeModels(available=['CCC_035', 'CCC_185'])
+    bootstrap = make_bootstrap(models)
+    assert bootstrap.status()['phase'] == 'idle'
+
+    bootstrap.run()
+
+    assert models.phases == [('locate', 'checking'), ('load', 'loading')]
+    status = bootstrap.status()
+    assert status['ready'] and status['phase'] == 'ready'
+    assert status['loaded_conditions'] == ['CCC_035', 'CCC_185']
+    assert status['finished_at'] is not None
+
+
+def test_missing_required_models_are_trained_then_loaded():
+    models = FakeModels(available=['CCC_035'], trainable=['CCC_185'])
+    bootstrap = make_bootstrap(models, required_conditions=['CCC_035', 'CCC_185'])
+
+    bootstrap.run()
+
+    assert [step for step, _ in models.phases] == ['locate', 'train', 'locate', 'load']
+    assert ('train', 'training') in models.phases
+    status = bootstrap.status()
+    assert status['ready']
+    assert status['conditions']['CCC_185']['status'] == DONE
+
+
+def test_fails_when_a_required_model_cannot_be_made():
+    models = FakeModels(available=['CCC_035'])
+    bootstrap = make_bootstrap(models, required_conditions=['CCC_035', 'CCC_185'], train_missing=False)
+
+    bootstrap.run()
+
+    status = bootstrap.status()
+    assert status['phase'] == 'failed' and not bootstrap.is_ready()
+    assert 'CCC_185' in status['error']
+    assert status['conditions']['CCC_185']['status'] == FAILED
+
+
+def test_loader_errors_fail_the_bootstrap():
+    models = FakeModels(available=['CCC_035'])
+
+    def broken_load(conditions):
+        raise RuntimeError("corrupt artifact")
+
+    bootstrap = ModelBootstrap(models.locate, models.train, broken_load)
+    models.bootstrap = bootstrap
+    bootstrap.run()
+    assert bootstrap.status()['phase'] == 'failed'
+    assert bootstrap.status()['error'] == 'corrupt artifact'
+
+
+def test_start_runs_in_the_background_once():
+    release = threading.Event()
+    models = FakeModels(available=['CCC_035'])
+
+    def slow_locate():
+        release.wait(5)
+        return models.locate()
+
+    bootstrap = ModelBootstrap(slow_locate, models.train, models.load)
+    models.bootstrap = bootstrap
+    bootstrap.start()
+    bootstrap.start()
+    assert not bootstrap.is_ready()
+    assert bootstrap.status()['phase'] in ('idle', 'checking')
+
+    release.set()
+    bootstrap._thread.join(5)
+    assert bootstrap.is_ready()
+    assert models.phases.count(('locate', 'checking')) == 1
@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+joblib = pytest.importorskip("joblib")
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import RandomForestClassifier  # noqa: E402
+from sklearn.impute import SimpleImputer  # noqa: E402
+
+from ML_Model.forest_engine import DEFAULT_MAX_DRIFT  # noqa: E402
+from ML_Model.model_bundle import load_bundle, write_bundle  # noqa: E402
+
+
+class Predictor:
+    """The parts of a loaded ServingPredictor the bundle writer reads."""
+
+    feature_names = [f'f{i}' for i in range(5)]
+    optimal_threshold = 0.4
+    model_version = "1.0"
+    training_date = None
+
+    def __init__(self, seed):
+        rng = np.random.default_rng(seed)
+        X = rng.integers(0, 5, size=(300, 5)).astype(float)
+        y = (X[:, 0] + X[:, 1] + rng.random(300) > 4).astype(int)
+        self.imputer = SimpleImputer(strategy='median')
+        self.model = RandomForestClassifier(n_estimators=5, max_depth=5, random_state=seed).fit(
+            self.imputer.fit_transform(X), y
+        )
+
+    def predict_proba_imputed(self, X_imputed):
+        return self.model.predict_proba(X_imputed)[:, 1]
+
+
+@pytest.fixture
+def predictors():
+    return {'CCC_035': Predictor(0), 'CCC_065': Predictor(1)}
+
+
+def rewrite_drift(path, condition, drift):
+    bundle = joblib.load(path)
+    bundle['conditions'][condition]['max_drift'] = drift
+    joblib.dump(bundle, path, compress=0)
+
+
+def test_compacted_bundle_records_drift_and_loads(tmp_path, predictors):
+    path = write_bundle(predictors, str(tmp_path / 'model_bundle.joblib'), sources={'CCC_035': 'a.joblib'})
+    loaded = load_bundle(path)
+
+    assert sorted(loaded) == ['CCC_035', 'CCC_065']
+    assert loaded['CCC_035'].engine.is_compact
+    assert loaded['CCC_035'].source_artifact == 'a.joblib'
+    rows = loaded['CCC_035'].engine.sample_rows(200)
+    expected = predictors['CCC_035'].predict_proba_imputed(predictors['CCC_035'].imputer.transform(rows))
+    _, proba = loaded['CCC_035'].predict_new_sample(rows)
+    np.testing.assert_allclose(proba, expected, atol=DEFAULT_MAX_DRIFT)
+
+
+@pytest.mark.parametrize('drift', [None, DEFAULT_MAX_DRIFT * 10])
+def test_compacted_forest_without_acceptable_drift_is_refused(tmp_path, predictors, drift):
+    path = write_bundle(predictors, str(tmp_path / 'model_bundle.joblib'))
+    rewrite_drift(path, 'CCC_035', drift)
+
+    loaded = load_bundle(path)
+    assert sorted(loaded) == ['CCC_065']
+    # A looser tolerance on load accepts a recorded drift, never a missing one
+    assert ('CCC_035' in load_bundle(path, max_drift=1.0)) == (drift is not None)
+
+
+def test_full_precision_forest_needs_no_drift(tmp_path, predictors):
+    path = write_bundle(predictors, str(tmp_path / 'model_bundle.joblib'), compact=False)
+
+    loaded = load_bundle(path)
+    assert sorted(loaded) == ['CCC_035', 'CCC_065']
+    assert not loaded['CCC_035'].engine.is_compact
@@ -0,0 +1,59 @@
+import os
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ML_Model.model_manifest import (
+    ARTIFACT_PREFIX, get_current_artifacts, read_manifest, record_artifact
+)
+
+
+def save_artifact(model_dir, condition, stamp):
+    path = os.path.join(str(model_dir), f"{ARTIFACT_PREFIX}{condition}_{stamp}.joblib")
+    with open(path, "wb") as f:
+        f.write(b"model")
+    return path
+
+
+def record_conditions(model_dir, conditions):
+    for condition in conditions:
+        record_artifact(str(model_dir), condition, save_artifact(model_dir, condition, "20240101_120000"))
+
+
+def test_previous_artifact_moves_to_history_and_old_ones_are_removed(tmp_path):
+    paths = []
+    for day in range(1, 4):
+        paths.append(save_artifact(tmp_path, "CCC_035", f"2024010{day}_120000"))
+        removed = record_artifact(str(tmp_path), "CCC_035", paths[-1], keep_versions=2)
+
+    entry = read_manifest(str(tmp_path))['conditions']['CCC_035']
+    assert entry['artifact'] == os.path.basename(paths[2])
+    assert [r['artifact'] for r in entry['history']] == [os.path.basename(paths[1])]
+    assert removed == [os.path.basename(paths[0])]
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[1])
+
+
+def test_concurrent_threads_keep_every_condition(tmp_path):
+    conditions = [f"CCC_{n:03d}" for n in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda c: record_conditions(tmp_path, [c]), conditions))
+
+    assert sorted(get_current_artifacts(str(tmp_path))) == conditions
+
+
+def test_concurrent_processes_keep_every_condition(tmp_path):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork")
+    context = multiprocessing.get_context("fork")
+    batches = [[f"CCC_{worker}{n:02d}" for n in range(10)] for worker in range(1, 5)]
+    processes = [context.Process(target=record_conditions, args=(tmp_path, batch)) for batch in batches]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    expected = sorted(c for batch in batches for c in batch)
+    assert sorted(get_current_artifacts(str(tmp_path))) == expected
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("joblib")
+
+from model_registry import ModelRegistry, estimate_predictor_bytes  # noqa: E402
+
+
+class FakeEngine:
+    nbytes = 4096
+
+
+class BundledLike:
+    model = None
+    engine = FakeEngine()
+
+
+def make_registry(tmp_path, conditions):
+    index = {}
+    for condition in conditions:
+        path = tmp_path / f'{condition}.joblib'
+        path.write_text(condition)
+        index[condition] = str(path)
+
+    loads = []
+
+    def loader(path, condition):
+        loads.append(condition)
+        return BundledLike()
+
+    registry = ModelRegistry(lambda: dict(index), check_interval=0, loader=loader)
+    return registry, index, loads
+
+
+def test_bundled_predictors_are_sized_from_their_engine():
+    assert estimate_predictor_bytes(BundledLike()) == 4096
+    assert estimate_predictor_bytes(object()) == 0
+
+
+def test_memory_cap_counts_bundled_predictors(tmp_path):
+    registry, _, _ = make_registry(tmp_path, ['CCC_035', 'CCC_065'])
+    registry._max_bytes = 5000
+    registry.preload()
+    assert len(registry.stats()['loaded_models']) == 1
+    assert registry.stats()['evictions'] == 1
+
+
+def test_condition_removed_from_index_is_evicted_and_announced(tmp_path):
+    registry, index, _ = make_registry(tmp_path, ['CCC_035', 'CCC_065'])
+    changes = []
+    registry.add_listener(lambda condition, path: changes.append((condition, path)))
+    registry.preload()
+
+    del index['CCC_065']
+    assert registry.get('CCC_065') is None
+    assert 'CCC_065' not in registry.stats()['loaded_models']
+    assert changes == [('CCC_065', None)]
+    assert registry.get('CCC_035') is not None
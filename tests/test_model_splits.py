@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("joblib")
+pytest.importorskip("sklearn")
+
+from ML_Model.Model import ChronicConditionPredictor, MultiConditionPredictor  # noqa: E402
+from ML_Model.forest_compression import tune_forest_size  # noqa: E402
+
+
+def make_data(rows=200):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'a': rng.random(rows), 'b': rng.random(rows)})
+    Y = pd.DataFrame({'CCC_035': rng.integers(0, 2, rows), 'CCC_065': rng.integers(0, 2, rows)})
+    return X, Y
+
+
+def test_validation_rows_are_carved_from_training_only():
+    X, Y = make_data()
+    X_train, X_val, X_test, Y_train, Y_val, Y_test = MultiConditionPredictor().split_data(X, Y)
+
+    train, val, test = set(X_train.index), set(X_val.index), set(X_test.index)
+    assert not (train & val) and not (train & test) and not (val & test)
+    assert len(train | val | test) == len(X)
+    assert list(Y_val.index) == list(X_val.index)
+
+
+def test_test_split_does_not_depend_on_validation_size():
+    X, Y = make_data()
+    predictor = MultiConditionPredictor()
+    _, _, small, *_ = predictor.split_data(X, Y, validation_size=0.1)
+    _, _, large, *_ = predictor.split_data(X, Y, validation_size=0.3)
+    assert list(small.index) == list(large.index)
+
+
+def test_single_condition_split_keeps_the_test_rows_out_of_tuning():
+    X, Y = make_data()
+    y = Y['CCC_035']
+    X_train, X_val, X_test, y_train, y_val, y_test = ChronicConditionPredictor(enable_plotting=False).split_data(X, y)
+
+    assert not (set(X_val.index) & set(X_test.index))
+    assert not (set(X_train.index) & set(X_test.index))
+    # Stratified: every split keeps both classes
+    assert set(y_val) == set(y_test) == {0, 1}
+
+    again = ChronicConditionPredictor(enable_plotting=False).split_data(X, y)
+    assert list(again[1].index) == list(X_val.index)
+
+
+def test_single_condition_model_trains_on_every_training_row():
+    X, Y = make_data()
+    y = Y['CCC_035']
+    predictor = ChronicConditionPredictor(enable_plotting=False)
+    X_test, y_test = predictor.train_model(X, y)
+
+    # The validation rows are not held out: 80% train, 20% test
+    assert predictor.model.oob_decision_function_.shape[0] == len(X) - len(y_test)
+    X_train, X_val, X_test_split, *_ = predictor.split_data(X, y)
+    assert len(y_test) == len(X_test_split)
+    assert len(X_train) + len(X_val) == predictor.model.oob_decision_function_.shape[0]
+    assert 0.0 < predictor.optimal_threshold < 1.0
+
+
+def test_tuned_forest_size_is_used_for_the_served_model():
+    X, Y = make_data()
+    y = Y['CCC_035']
+    predictor = ChronicConditionPredictor(enable_plotting=False)
+
+    # Labels are noise, so any size is within a generous tolerance
+    forest_size = tune_forest_size(predictor, X, y, f1_tolerance=1.0, auc_tolerance=1.0)
+    assert forest_size == {'n_estimators': 10, 'max_depth': 4}
+
+    predictor.train_model(X, y, **forest_size)
+    assert len(predictor.model.estimators_) == 10
+    assert max(e.tree_.max_depth for e in predictor.model.estimators_) <= 4
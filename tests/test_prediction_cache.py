@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from prediction_cache import PredictionCache, make_prediction_cache_key  # noqa: E402
+
+ANSWERS = {'question1': '50-59', 'question4': 'Former smoker', 'age': 52, 'concerns': 'none'}
+FINGERPRINT = {'serving_model': 'per_condition', 'models': [('CCC_035', 'CCC_035_20240101.joblib')]}
+
+
+def test_key_ignores_inputs_that_do_not_reach_the_features():
+    key = make_prediction_cache_key(ANSWERS, FINGERPRINT)
+    # Free text, an age past the cap and an unknown option change nothing
+    same = dict(ANSWERS, concerns='headaches', age='60', question2='Other')
+    assert make_prediction_cache_key(same, FINGERPRINT) == key
+    assert make_prediction_cache_key(dict(ANSWERS, question4='Never smoked'), FINGERPRINT) != key
+
+
+def test_new_model_artifact_invalidates_the_key():
+    cache = PredictionCache(max_entries=10)
+    cache.put(make_prediction_cache_key(ANSWERS, FINGERPRINT), {'CCC_035': {'probability': 0.4}})
+
+    retrained = {**FINGERPRINT, 'models': [('CCC_035', 'CCC_035_20250101.joblib')]}
+    assert cache.get(make_prediction_cache_key(ANSWERS, retrained)) is None
+    assert cache.get(make_prediction_cache_key(ANSWERS, FINGERPRINT)) == {'CCC_035': {'probability': 0.4}}
+
+
+def test_cached_results_are_copies():
+    cache = PredictionCache(max_entries=10)
+    cache.put('key', {'CCC_035': {'probability': 0.4}})
+    cache.get('key')['CCC_035']['display_name'] = 'Hypertension'
+    assert cache.get('key') == {'CCC_035': {'probability': 0.4}}
+
+
+def test_lru_ttl_and_clear():
+    cache = PredictionCache(max_entries=2, ttl_seconds=0.05)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    time.sleep(0.06)
+    assert cache.get('c') is None
+
+    cache.put('d', 4)
+    cache.clear()
+    assert cache.get('d') is None
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,40 @@
+import gc
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import ml_utils  # noqa: E402
+
+
+@pytest.fixture
+def unfreeze():
+    yield
+    gc.unfreeze()
+
+
+def test_every_model_is_loaded_and_the_heap_frozen(trained_models_dir, unfreeze):
+    gc.unfreeze()
+    loaded = ml_utils.preload_models_for_fork(models_dir=str(trained_models_dir))
+
+    assert sorted(loaded) == ['CCC_035', 'CCC_065']
+    assert all(predictor.model is not None for predictor in loaded.values())
+    # Served from the registry afterwards, not loaded again
+    registry = ml_utils.get_model_registry(str(trained_models_dir))
+    assert all(registry.get(condition) is predictor for condition, predictor in loaded.items())
+    # The loaded forests moved to the permanent generation, out of the collector's reach
+    assert gc.get_freeze_count() > 0
+    tracked = {id(obj) for obj in gc.get_objects()}
+    for predictor in loaded.values():
+        assert id(predictor.model) not in tracked
+        assert id(predictor.model.estimators_[0]) not in tracked
+
+
+def test_compiled_backend_compiles_engines_before_the_fork(trained_models_dir, unfreeze, monkeypatch):
+    monkeypatch.setattr(ml_utils, 'INFERENCE_BACKEND', 'compiled')
+    loaded = ml_utils.preload_models_for_fork(['CCC_035'], models_dir=str(trained_models_dir))
+
+    assert list(loaded) == ['CCC_035']
+    assert loaded['CCC_035'] in ml_utils._inference_engines
@@ -0,0 +1,87 @@
+from prompt_builder import (ConversationSummary, PromptStats, build_history, count_tokens,
+                            encode_prediction, encode_turn)
+
+
+class Turn:
+    __slots__ = ('question', 'answer', 'condition')
+
+    def __init__(self, question, answer=None, condition='diabetes'):
+        self.question = question
+        self.answer = answer
+        self.condition = condition
+
+
+def make_turns(count, words=30):
+    filler = ' '.join(['often'] * words)
+    return [Turn(f"Question {i}: do you feel {filler}?", 'Yes' if i % 2 else 'No, never') for i in range(count)]
+
+
+def test_history_stays_within_budget():
+    summary = ConversationSummary()
+    turns = []
+    for turn in make_turns(40):
+        turns.append(turn)
+        history = build_history(turns, summary, budget_tokens=200)
+        verbatim = [line for line in history.split('\n') if line.startswith('Q: ')]
+        assert sum(count_tokens(line) for line in verbatim) <= 200
+
+    # The summary itself is bounded by the number of conditions, not turns
+    assert count_tokens(summary.render()) < 150
+    assert summary.folded > 30
+
+
+def test_folding_keeps_latest_turns_verbatim():
+    turns = make_turns(12)
+    summary = ConversationSummary()
+    history = build_history(turns, summary, budget_tokens=200)
+
+    kept = turns[summary.folded:]
+    assert kept
+    assert history.endswith('\n'.join(encode_turn(turn) for turn in kept))
+    assert history.startswith(f"Earlier ({summary.folded} answers)")
+    assert 'Question 0:' not in history
+
+
+def test_turns_are_folded_once():
+    turns = make_turns(12)
+    summary = ConversationSummary()
+    build_history(turns, summary, budget_tokens=200)
+    folded = summary.folded
+    build_history(turns, summary, budget_tokens=200)
+    assert summary.folded == folded
+    assert sum(summary.counts['diabetes'].values()) == folded
+
+
+def test_latest_turn_is_kept_even_over_budget():
+    turns = make_turns(3, words=400)
+    summary = ConversationSummary()
+    history = build_history(turns, summary, budget_tokens=50)
+    assert history.endswith(encode_turn(turns[-1]))
+    assert summary.folded == 2
+
+
+def test_last_replaces_the_final_turn_without_changing_turns():
+    turns = make_turns(2, words=1)
+    turns[-1].answer = None
+    history = build_history(turns, ConversationSummary(), last=Turn(turns[-1].question, 'Sometimes'))
+    assert history.endswith('A: Sometimes')
+    assert turns[-1].answer is None
+
+
+def test_summary_copy_is_independent():
+    summary = ConversationSummary()
+    build_history(make_turns(12), summary, budget_tokens=200)
+    clone = summary.copy()
+    clone.add(Turn('Extra?', 'Yes'))
+    assert clone.folded == summary.folded + 1
+    assert clone.counts != summary.counts
+
+
+def test_prediction_encoding_and_stats():
+    line = encode_prediction('diabetes', {'display_name': 'Type 2 Diabetes', 'probability': 0.34,
+                                          'risk_level': 'Moderate', 'prediction': 1})
+    assert line == 'Type 2 Diabetes: 34% (Moderate), flagged'
+
+    stats = PromptStats()
+    assert stats.record('question', 'x' * 400) == 'x' * 400
+    assert stats.stats()['question'] == {'prompts': 1, 'avg_tokens': 100.0, 'max_tokens': 100, 'last_tokens': 100}
@@ -0,0 +1,66 @@
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from feature_mapping import GENERATED_FEATURES  # noqa: E402
+from risk_table import RiskTableService, artifact_fingerprint, build_risk_table  # noqa: E402
+
+
+class FakePredictor:
+    feature_names = GENERATED_FEATURES[:10]
+    optimal_threshold = 0.5
+    model_version = "1.0"
+    training_date = None
+
+
+def make_workers(tmp_path, count):
+    artifact = tmp_path / 'chronic_condition_model_CCC_035_20240101_120000.joblib'
+    artifact.write_bytes(b'model')
+    available = {'CCC_035': str(artifact)}
+    builds = []
+
+    def build():
+        builds.append(threading.get_ident())
+        return build_risk_table(
+            {'CCC_035': FakePredictor()},
+            lambda predictor, matrix: np.full(len(matrix), 0.25),
+            str(tmp_path), artifact_fingerprint(available)
+        )
+
+    workers = [
+        RiskTableService(str(tmp_path), locate_models=lambda: dict(available), build=build)
+        for _ in range(count)
+    ]
+    return workers, builds
+
+
+def test_workers_share_one_build(tmp_path):
+    workers, builds = make_workers(tmp_path, 3)
+    threads = [threading.Thread(target=worker._rebuild) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert sum(worker.rebuilds for worker in workers) == 1
+    for worker in workers:
+        probability, info = worker.lookup({'age': 52})['CCC_035']
+        assert probability == pytest.approx(0.25)
+        assert info['condition'] == 'CCC_035'
+
+
+def test_bundle_rebuild_changes_the_fingerprint(tmp_path):
+    bundle = tmp_path / 'model_bundle.joblib'
+    bundle.write_bytes(b'v1')
+    before = artifact_fingerprint({'CCC_035': str(bundle), 'CCC_065': str(bundle)})
+
+    stat = bundle.stat()
+    os.utime(bundle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    after = artifact_fingerprint({'CCC_035': str(bundle), 'CCC_065': str(bundle)})
+
+    assert before != after
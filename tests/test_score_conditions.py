@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("joblib")
+
+import ml_utils  # noqa: E402
+from feature_mapping import GENERATED_FEATURES  # noqa: E402
+
+ANSWERS = {'question1': '50-59', 'question4': 'Former smoker', 'age': 52}
+
+
+class FakePredictor:
+    def __init__(self, feature_names, probability=0.7):
+        self.feature_names = list(feature_names)
+        self.probability = probability
+        self.optimal_threshold = 0.5
+        self.model_version = "1.0"
+        self.training_date = None
+
+
+def test_each_feature_layout_is_built_once(monkeypatch):
+    built = []
+    original = ml_utils.build_feature_row
+
+    def counting_build(user_inputs, feature_names):
+        built.append(tuple(feature_names))
+        return original(user_inputs, feature_names)
+
+    def fake_predict(predictor, rows, imputed_rows=None):
+        assert rows.shape == (1, len(predictor.feature_names))
+        return np.array([predictor.probability])
+
+    monkeypatch.setattr(ml_utils, 'build_feature_row', counting_build)
+    monkeypatch.setattr(ml_utils, 'predict_aligned_rows', fake_predict)
+
+    shared = GENERATED_FEATURES[:20]
+    predictors = {
+        'CCC_035': FakePredictor(shared, 0.7),
+        'CCC_065': FakePredictor(shared, 0.2),
+        'CCC_075': FakePredictor(GENERATED_FEATURES, 0.9),
+    }
+    results = ml_utils.score_conditions(ANSWERS, predictors)
+
+    assert sorted(built) == sorted([tuple(shared), tuple(GENERATED_FEATURES)])
+    assert results['CCC_035']['prediction'] == 1
+    assert results['CCC_065']['prediction'] == 0
+    assert results['CCC_075']['probability'] == pytest.approx(0.9)
+
+
+def test_one_failing_model_does_not_fail_the_others(monkeypatch):
+    def fake_predict(predictor, rows, imputed_rows=None):
+        if predictor.probability is None:
+            raise ValueError("broken model")
+        return np.array([predictor.probability])
+
+    monkeypatch.setattr(ml_utils, 'predict_aligned_rows', fake_predict)
+    results = ml_utils.score_conditions(ANSWERS, {
+        'CCC_035': FakePredictor(GENERATED_FEATURES, 0.3),
+        'CCC_065': FakePredictor(GENERATED_FEATURES, None),
+    })
+    assert results['CCC_035']['error'] is None
+    assert 'broken model' in results['CCC_065']['error']
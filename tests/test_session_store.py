@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from session_store import SessionStore, approximate_size
+
+
+class Session:
+    __slots__ = ('answers', 'pending')
+
+    def __init__(self, answers, pending=None):
+        self.answers = answers
+        self.pending = pending
+
+
+def make_store(**kwargs):
+    evicted = []
+    kwargs.setdefault('sweep_interval', 0)
+    store = SessionStore(on_evict=evicted.append, **kwargs)
+    return store, evicted
+
+
+def test_idle_sessions_expire_on_get_and_sweep():
+    store, evicted = make_store(idle_ttl=0.05)
+    store.put('a', 'session a')
+    store.put('b', 'session b')
+    assert store.get('a') == 'session a'
+
+    time.sleep(0.06)
+    assert store.get('a') is None
+    assert store.sweep() == 1
+    assert evicted == ['session a', 'session b']
+    assert store.stats()['expired'] == 2
+    assert store.stats()['active_sessions'] == 0
+
+
+def test_least_recently_used_session_is_evicted():
+    store, evicted = make_store(max_sessions=2)
+    store.put('a', 'session a')
+    store.put('b', 'session b')
+    store.get('a')
+    store.put('c', 'session c')
+
+    assert evicted == ['session b']
+    assert 'a' in store and 'c' in store and 'b' not in store
+    assert store.stats()['evicted'] == 1
+
+
+def test_byte_cap_evicts_oldest_sessions():
+    store, evicted = make_store(max_bytes=250, sizeof=lambda session: 100)
+    for name in 'abc':
+        store.put(name, f'session {name}')
+
+    assert evicted == ['session a']
+    assert store.stats()['approx_bytes'] == 200
+
+
+def test_pop_is_not_an_eviction():
+    store, evicted = make_store()
+    store.put('a', 'session a')
+    assert store.pop('a') == 'session a'
+    assert store.pop('a') is None
+    assert evicted == []
+
+
+def test_size_grows_with_session_data():
+    small = approximate_size(Session(['yes'] * 2))
+    large = approximate_size(Session([f'answer {i}' for i in range(200)]))
+    assert large > small * 10
+
+
+def test_size_does_not_follow_futures_or_shared_attributes():
+    executor = ThreadPoolExecutor(max_workers=1)
+    # Data reachable only through the executor must not count
+    executor.payload = ['x' * 10000 for _ in range(100)]
+    future = executor.submit(lambda: 'done')
+    future.result()
+
+    plain = approximate_size(Session(['yes']))
+    with_future = approximate_size(Session(['yes'], pending={'Yes': future}))
+    assert with_future - plain < 2000
+
+    class SharedSession(Session):
+        __slots__ = ('client',)
+        shared_attributes = ('client',)
+
+    session = SharedSession(['yes'])
+    session.client = executor.payload
+    assert approximate_size(session) < 2000
+    executor.shutdown()
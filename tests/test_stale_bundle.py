@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("joblib")
+
+import ml_utils  # noqa: E402
+
+BUNDLE = '/models/model_bundle.joblib'
+
+
+class Bundled:
+    def __init__(self, source_artifact):
+        self.source_artifact = source_artifact
+
+
+def locate(monkeypatch, bundled, index):
+    monkeypatch.setattr(ml_utils, 'open_bundle', lambda path: bundled)
+    monkeypatch.setattr(ml_utils, '_read_model_index', lambda models_dir: index)
+    return ml_utils._locate_bundled_models('/models', BUNDLE)
+
+
+def entry(artifact):
+    return {'artifact': artifact, 'path': f'/models/{artifact}'}
+
+
+def test_retrained_conditions_fall_back_to_their_artifact(monkeypatch):
+    located = locate(
+        monkeypatch,
+        {'CCC_035': Bundled('a_v1.joblib'), 'CCC_065': Bundled('b_v1.joblib')},
+        {'CCC_035': entry('a_v1.joblib'), 'CCC_065': entry('b_v2.joblib'), 'CCC_075': entry('c_v1.joblib')}
+    )
+    assert located == {
+        'CCC_035': BUNDLE,
+        'CCC_065': '/models/b_v2.joblib',
+        'CCC_075': '/models/c_v1.joblib',
+    }
+
+
+def test_bundle_without_artifacts_is_served_whole(monkeypatch):
+    located = locate(monkeypatch, {'CCC_035': Bundled('a_v1.joblib')}, {})
+    assert located == {'CCC_035': BUNDLE}